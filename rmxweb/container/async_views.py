@@ -0,0 +1,42 @@
+"""
+The async views of the containers, served under ASGI (see ASYNC_VIEWS in
+rmxweb.config). The event streams wait for redis without holding a thread.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+
+from .models import Container
+from .views import event_stream_response, sse
+from metrics.events import ContainerEvents
+from metrics.readiness import readiness
+from rmxweb import config
+
+
+async def events(request, pk):
+    """Streams the events of a container as server-sent events: the status
+       of the container when the client connects ("status"), then the
+       transitions of its stages ("stage"; see metrics.events).
+    :param request:
+    :param pk:
+    :return:
+    """
+    if not await Container.objects.filter(pk=pk).aexists():
+        raise Http404(pk)
+
+    async def stream():
+        deadline = time.time() + config.SSE_MAX_DURATION
+        pubsub = await ContainerEvents(pk).subscribe_async()
+        try:
+            yield f'retry: {config.SSE_RETRY}\n\n'
+            status = await sync_to_async(readiness)({pk: ()})
+            yield sse('status', status[pk])
+            async for event in ContainerEvents.listen_async(
+                    pubsub, timeout=config.SSE_KEEPALIVE):
+                yield sse('stage', event)
+                if time.time() > deadline:
+                    break
+        finally:
+            await pubsub.aclose()
+    return event_stream_response(stream())
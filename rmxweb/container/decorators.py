@@ -1,7 +1,13 @@
-
+import asyncio
 from functools import wraps
 
+from asgiref.sync import sync_to_async
+
 from .models import Container
+from metrics.config import LANE_INTERACTIVE
+from metrics.lanes import Lane
+from metrics.semaphore import NlpSemaphore, admission
+from metrics.single_flight import MatrixFlight
 from rmxweb.celery import celery
 from rmxweb import config
 
@@ -20,15 +26,15 @@ def feats_available(func):
        api.
 
        This decorates functions and not django's views.
-    """
-    @wraps(func)
-    def wrapped_view(containerid: int = None, words: int = 10,
-                     features: int = 10, docsperfeat: int = 5,
-                     featsperdoc: int = 3, **kwds):
 
-        container = Container.get_object(pk=containerid)
-        availability = container.features_availability(feature_number=features)
-        out = {
+       Identical requests that arrive while the matrices are being generated
+       attach to the computation in flight instead of sending another one.
+
+       Coroutine functions are decorated with a coroutine function that
+       checks the availability with the asyncio clients (see the async views).
+    """
+    def busy(container, features):
+        return {
             'busy': True,
             'retry': True,
             'success': False,
@@ -36,29 +42,76 @@ def feats_available(func):
             'features': features,
             'containerid': container.pk
         }
-        if availability.get('busy'):
-            return out
-        if availability.get('available'):
-            out = {
-                'words': words,
-                'feats': features,
-                'docs_per_feat': docsperfeat,
-                'feats_per_doc': featsperdoc,
-                'container': container,
-                'containerid': container.pk
-            }
-            out.update(kwds)
-            return func(**out)
-        celery.send_task(
-            config.RMXWEB_TASKS['generate_matrix_remote'],
-            kwargs={
-                'containerid': container.pk,
-                'features': features,
-                'words': words,
-                'docs_per_feat': docsperfeat,
-                'feats_per_doc': featsperdoc
-            }
-        )
+
+    def params(container, words, features, docsperfeat, featsperdoc, kwds):
+        out = {
+            'words': words,
+            'feats': features,
+            'docs_per_feat': docsperfeat,
+            'feats_per_doc': featsperdoc,
+            'container': container,
+            'containerid': container.pk
+        }
+        out.update(kwds)
+        return out
+
+    def generate(container, availability, words, features, docsperfeat,
+                 featsperdoc):
+        out = busy(container, features)
+        flight = MatrixFlight(containerid=container.pk, features=features)
+        if flight.claim(words, docsperfeat, featsperdoc):
+            celery.send_task(
+                config.RMXWEB_TASKS['generate_matrix_remote'],
+                kwargs={
+                    'containerid': container.pk,
+                    'features': features,
+                    'words': words,
+                    'docs_per_feat': docsperfeat,
+                    'feats_per_doc': featsperdoc
+                },
+                **Lane(LANE_INTERACTIVE, container.pk).options()
+            )
+        else:
+            out['in_flight'] = flight.started(
+                words, docsperfeat, featsperdoc)
+        out['admission'] = admission(
+            NlpSemaphore.token(container.pk, features),
+            jobs=config.MATRIX_JOBS)
         out.update(availability)
         return out
+
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def wrapped_coroutine(containerid: int = None, words: int = 10,
+                                    features: int = 10, docsperfeat: int = 5,
+                                    featsperdoc: int = 3, **kwds):
+
+            container = await Container.objects.aget(pk=containerid)
+            availability = await container.features_availability_async(
+                feature_number=features)
+            if availability.get('busy'):
+                return busy(container, features)
+            if availability.get('available'):
+                return await func(**params(
+                    container, words, features, docsperfeat, featsperdoc,
+                    kwds))
+            return await sync_to_async(generate)(
+                container, availability, words, features, docsperfeat,
+                featsperdoc)
+        return wrapped_coroutine
+
+    @wraps(func)
+    def wrapped_view(containerid: int = None, words: int = 10,
+                     features: int = 10, docsperfeat: int = 5,
+                     featsperdoc: int = 3, **kwds):
+
+        container = Container.get_object(pk=containerid)
+        availability = container.features_availability(feature_number=features)
+        if availability.get('busy'):
+            return busy(container, features)
+        if availability.get('available'):
+            return func(**params(
+                container, words, features, docsperfeat, featsperdoc, kwds))
+        return generate(container, availability, words, features, docsperfeat,
+                        featsperdoc)
     return wrapped_view
@@ -2,11 +2,17 @@
    celery/redis.
 """
 
-from metrics.config import CRAWL_RUN_PREFIX
+from celery.utils import uuid
+
+from metrics.cancellation import Cancellation
+from metrics.config import CRAWL_RUN_PREFIX, TASK_CRAWL
+from metrics.crawl_activity import CrawlActivity
+from metrics.crawl_job import CrawlJob
 from metrics.decorator import register_metrics
+from metrics.lanes import QUEUES
 from rmxweb.celery import celery
+from rmxweb.remote import remote_call, remote_call_async
 from rmxweb.config import (
-    CRAWL_START_MONITOR_COUNTDOWN,
     NLP_TASKS,
     SCRASYNC_TASKS,
     RMXWEB_TASKS
@@ -15,39 +21,63 @@ from rmxweb.config import (
 
 def get_available_features(containerid: int = None, folder_path: str = None):
     """Retrieves available features from nlp"""
-    return celery.send_task(
+    return remote_call(
+        NLP_TASKS['available_features'],
+        kwargs={
+            'containerid': containerid,
+            'path': folder_path
+        }
+    )
+
+
+async def get_available_features_async(containerid: int = None,
+                                       folder_path: str = None):
+    """Retrieves available features from nlp, in the async views"""
+    return await remote_call_async(
         NLP_TASKS['available_features'],
         kwargs={
             'containerid': containerid,
             'path': folder_path
         }
-    ).get()
+    )
 
 
 @register_metrics(CRAWL_RUN_PREFIX)
-def crawl_async(url_list: list = None, container=None, depth=1):
-    """Starting the crawler in scrasync. Starting the task that will monitor
-       the crawler.
+def crawl_async(url_list: list = None, container=None, depth=1) -> str:
+    """Sending the crawl to scrasync without waiting for it. The crawlid
+       comes to crawl_launched, linked to launch_crawl, that starts the task
+       monitoring the crawler; crawl_launch_failed is called if the launch
+       fails. The callbacks are sent by scrasync's worker: their queue is
+       set on their signatures.
+
+       :return: the id of the crawl job (see metrics.crawl_job)
     """
-    crawlid = celery.send_task(
+    # a crawl that writes no page ends SECONDS_AFTER_LAST_CALL seconds after
+    # it started.
+    CrawlActivity(containerid=container.pk).start()
+    jobid = uuid()
+    CrawlJob(jobid=jobid).create(containerid=container.pk)
+    Cancellation(containerid=container.pk).track(TASK_CRAWL, jobid)
+    celery.send_task(
         SCRASYNC_TASKS['launch_crawl'],
         kwargs={
             'endpoint': url_list,
             'containerid': container.pk,
             'depth': depth
-        }
-    ).get()
-    # the countdown argument is here to make sure that this task does not
-    # start immediately as the metrics db may be empty.
-    celery.send_task(
-        RMXWEB_TASKS['monitor_crawl'],
-        kwargs={
-            'containerid': container.pk,
-            'crawlid': crawlid
         },
-        countdown=CRAWL_START_MONITOR_COUNTDOWN
+        task_id=jobid,
+        link=celery.signature(
+            RMXWEB_TASKS['crawl_launched'],
+            kwargs={'containerid': container.pk, 'jobid': jobid},
+            **QUEUES(RMXWEB_TASKS['crawl_launched'])
+        ),
+        link_error=celery.signature(
+            RMXWEB_TASKS['crawl_launch_failed'],
+            kwargs={'containerid': container.pk, 'jobid': jobid},
+            **QUEUES(RMXWEB_TASKS['crawl_launch_failed'])
+        )
     )
-    return crawlid
+    return jobid
 
 
 def get_features(feats: int = 10,
@@ -59,7 +89,26 @@ def get_features(feats: int = 10,
     """ Getting the features from nlp. This will call a view method that
         will retrieve or generate the requested data.
     """
-    return celery.send_task(
+    return remote_call(
+        NLP_TASKS['features_and_docs'], kwargs={
+            'path': path,
+            'feats': feats,
+            'containerid': containerid,
+            'words': words,
+            'docs_per_feat': docs_per_feat,
+            'feats_per_doc': feats_per_doc
+        }
+    )
+
+
+async def get_features_async(feats: int = 10,
+                             words: int = 6,
+                             containerid: int = None,
+                             path: str = None,
+                             docs_per_feat: int = 0,
+                             feats_per_doc: int = 3):
+    """ The async version of get_features. """
+    return await remote_call_async(
         NLP_TASKS['features_and_docs'], kwargs={
             'path': path,
             'feats': feats,
@@ -68,4 +117,4 @@ def get_features(feats: int = 10,
             'docs_per_feat': docs_per_feat,
             'feats_per_doc': feats_per_doc
         }
-    ).get()
+    )
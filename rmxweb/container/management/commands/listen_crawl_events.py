@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from metrics.crawl_activity import CrawlActivity
+from rmxweb.celery import celery
+from rmxweb.config import RMXWEB_TASKS
+
+
+class Command(BaseCommand):
+    help = ('Listens to the redis notifications sent when crawls quiesce and '
+            'sends the crawl_finished task for every container.')
+
+    def handle(self, *args, **options):
+        for containerid in CrawlActivity.listen():
+            celery.send_task(
+                RMXWEB_TASKS['crawl_finished'],
+                kwargs={'containerid': containerid}
+            )
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('container', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='container',
+            name='storage',
+            field=models.CharField(default='file', max_length=10),
+        ),
+    ]
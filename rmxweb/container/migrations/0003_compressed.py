@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('container', '0002_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='container',
+            name='compressed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('container', '0003_compressed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='container',
+            name='stale',
+            field=models.BooleanField(default=False),
+        ),
+    ]
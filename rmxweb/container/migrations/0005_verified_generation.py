@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('container', '0004_stale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='container',
+            name='verified_generation',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('container', '0005_verified_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='container',
+            name='manifest_generation',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -10,11 +10,23 @@ import uuid
 
 from django.db import models
 
-from .emit import get_available_features, get_features
+from .emit import (
+    get_available_features,
+    get_available_features_async,
+    get_features,
+    get_features_async,
+)
+from data.blob import BlobStore
+from data.boilerplate import BoilerplateFilter
+from data.bloom import UrlBloomFilter
+from data.orphans import OrphanedFiles
+from metrics.cancellation import Cancellation
 from metrics.crawl_ready import CrawlReady
 from metrics.dataset_ready import DatasetReady
+from metrics.eta import CRAWL, INTEGRITY_CHECK, estimate
 from metrics.graph import GraphReady
 from metrics.integrity_check import IntegrityCheckReady
+from metrics.semaphore import drop_container
 from rmxweb import config
 
 
@@ -26,6 +38,17 @@ class Container(models.Model):
 
     uid = models.UUIDField(default=uuid.uuid4, unique=True)
 
+    # the storage used for texts; see STORAGE_MODE in rmxweb.config
+    storage = models.CharField(max_length=10, default=config.STORAGE_FILE)
+    # if True texts are compressed with zstandard
+    compressed = models.BooleanField(default=False)
+    # if True the dataset changed since the last integrity check
+    stale = models.BooleanField(default=False)
+    # the last generation of the manifest verified by an integrity check and
+    # the last generation recorded; see data.models.ManifestChange
+    verified_generation = models.BigIntegerField(default=0)
+    manifest_generation = models.BigIntegerField(default=0)
+
     @classmethod
     def get_object(cls, pk: int = None, uid: (str, uuid.UUID) = None):
         """Retrieves an object for a given pk (container id)."""
@@ -50,9 +73,12 @@ class Container(models.Model):
         :param the_name:
         :return:
         """
-        obj = cls(name=the_name)
+        obj = cls(name=the_name,
+                  storage=config.STORAGE_MODE,
+                  compressed=config.COMPRESS_TEXTS)
         obj.save()
         obj.create_folder()
+        Cancellation(containerid=obj.pk).reset()
         return obj
 
     @property
@@ -65,6 +91,11 @@ class Container(models.Model):
         return os.path.exists(self.matrix_path) and os.listdir(
             self.matrix_path)
 
+    @property
+    def pack_path(self):
+        """Returns the path to the pack files of the container."""
+        return os.path.join(self.get_folder_path(), config.PACK_FOLDER)
+
     @property
     def wf_path(self): return os.path.join(self.matrix_path, 'wf')
 
@@ -75,6 +106,14 @@ class Container(models.Model):
         """
         return self.uid.hex
 
+    def mark_stale(self):
+        """Flags the container after its dataset changed; the integrity check
+           runs when the crawl finishes only for stale containers.
+        """
+        if not self.stale:
+            type(self).objects.filter(pk=self.pk).update(stale=True)
+            self.stale = True
+
     def get_dataids(self):
         """Returns the data ids. This method queries the data_set, Data objects
            associated with this container.
@@ -93,6 +132,14 @@ class Container(models.Model):
         out = DatasetReady(containerid=self.pk)()
         return out.get("ready", False)
 
+    def dataset_eta(self) -> dict:
+        """
+        Returns the estimate (see metrics.eta.estimate) of the crawl, or of
+        the integrity check once the crawl is finished.
+        """
+        stage = INTEGRITY_CHECK if self.crawl_is_ready() else CRAWL
+        return estimate(stage=stage, containerid=self.pk)
+
     def crawl_is_ready(self):
         """
         Returns True if scrasync finished crawling.
@@ -146,8 +193,11 @@ class Container(models.Model):
         if not os.path.isdir(path):
             os.makedirs(path, exist_ok=False)
             os.chmod(path, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)
-        for _path in [os.path.join(path, config.MATRIX_FOLDER),
-                      os.path.join(path, config.TEXT_FOLDER)]:
+        folders = [os.path.join(path, config.MATRIX_FOLDER),
+                   os.path.join(path, config.TEXT_FOLDER)]
+        if self.storage == config.STORAGE_PACK:
+            folders.append(self.pack_path)
+        for _path in folders:
             if not os.path.isdir(_path):
                 os.makedirs(_path, exist_ok=False)
                 os.chmod(_path, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)
@@ -185,8 +235,42 @@ class Container(models.Model):
         :param feature_number:
         :return:
         """
-        gstat = GraphReady(containerid=self.pk, features=feature_number)()
-        dstat = DatasetReady(containerid=self.pk)()
+        out = self.features_readiness(
+            feature_number,
+            GraphReady(containerid=self.pk, features=feature_number)(),
+            DatasetReady(containerid=self.pk)()
+        )
+        if out['ready']:
+            self.add_features_count(out, get_available_features(
+                containerid=self.pk,
+                folder_path=self.get_folder_path()
+            ))
+        return out
+
+    async def features_availability_async(self, feature_number: int = 10):
+        """ The async version of features_availability. """
+        out = self.features_readiness(
+            feature_number,
+            await GraphReady(containerid=self.pk, features=feature_number,
+                             prefetch=False).status_async(),
+            await DatasetReady(containerid=self.pk,
+                               prefetch=False).status_async()
+        )
+        if out['ready']:
+            self.add_features_count(out, await get_available_features_async(
+                containerid=self.pk,
+                folder_path=self.get_folder_path()
+            ))
+        return out
+
+    def features_readiness(self, feature_number: int = None,
+                           gstat: dict = None, dstat: dict = None) -> dict:
+        """
+        :param feature_number:
+        :param gstat: the status of the matrices (see GraphReady)
+        :param dstat: the status of the dataset (see DatasetReady)
+        :return:
+        """
         assert isinstance(gstat.get("ready"), bool)
         assert isinstance(dstat.get("ready"), bool)
         features_are_ready = bool(gstat.get("ready") and dstat.get("ready"))
@@ -196,23 +280,26 @@ class Container(models.Model):
             'ready': features_are_ready,
             'busy': not features_are_ready  # False
         }
-        if features_are_ready:
-            try:
-                _count = get_available_features(
-                    containerid=self.pk,
-                    folder_path=self.get_folder_path()
-                )
-                next(_ for _ in _count if
-                     int(_.get('featcount')) == feature_number)
-                _count = list(int(_.get('featcount')) for _ in _count)
-            except StopIteration:
-                out['available'] = False
-            else:
-                out['features_count'] = _count
-                out['feature_number'] = feature_number
-                out['available'] = True  # feature_number in _count
         return out
 
+    @staticmethod
+    def add_features_count(out: dict = None, _count: list = None):
+        """
+        Adds the available features returned by nlp to the output of
+        features_readiness.
+        """
+        feature_number = out['requested_features']
+        try:
+            next(_ for _ in _count if
+                 int(_.get('featcount')) == feature_number)
+            _count = list(int(_.get('featcount')) for _ in _count)
+        except StopIteration:
+            out['available'] = False
+        else:
+            out['features_count'] = _count
+            out['feature_number'] = feature_number
+            out['available'] = True  # feature_number in _count
+
     def get_features_count(self, verbose: bool = False):
         """ Returning the features count. """
         avl = get_available_features(containerid=self.pk,
@@ -239,17 +326,37 @@ class Container(models.Model):
             'docs_per_feat': docs_per_feat,
             'feats_per_doc': feats_per_doc,
         })
-        docs = resp['docs']
-        features = resp['features']
-        edges = resp['edges']
-        words = resp['feature_words']
-        data_set = self.data_set.all()
-        docs = self.docs_to_json(docs, data_set)
-        return {
-            'features': features,
+        return self.features_response(resp, self.data_set.all())
+
+    async def get_features_async(self,
+                                 feats: int = 10,
+                                 words: int = 6,
+                                 docs_per_feat: int = 0,
+                                 feats_per_doc: int = 3,
+                                 **_):
+        """ The async version of get_features. """
+        resp = await get_features_async(**{
+            'path': self.get_folder_path(),
+            'feats': feats,
+            'containerid': str(self.pk),
             'words': words,
-            'docs': docs,
-            'edges': edges
+            'docs_per_feat': docs_per_feat,
+            'feats_per_doc': feats_per_doc,
+        })
+        return self.features_response(
+            resp, [_ async for _ in self.data_set.all()])
+
+    def features_response(self, resp: dict = None, data_set=None):
+        """
+        :param resp: the features and docs returned by nlp
+        :param data_set: the data objects of the container
+        :return:
+        """
+        return {
+            'features': resp['features'],
+            'words': resp['feature_words'],
+            'docs': self.docs_to_json(resp['docs'], data_set),
+            'edges': resp['edges']
         }
 
     def data_mapping(self):
@@ -301,8 +408,18 @@ class Container(models.Model):
 
     def delete_container(self):
         """
-        Deleting the container and its directory on the server.
+        Deleting the container and its directory on the server. The texts
+        that are not referenced by other containers are dropped from the blob
+        store. The tasks of the container are cancelled first.
         :return:
         """
+        containerid = self.pk
+        Cancellation(containerid=containerid).cancel()
+        drop_container(containerid=containerid)
+        hashes = list(self.data_set.values_list('hash_text', flat=True))
         shutil.rmtree(self.get_folder_path())
         self.delete()
+        BlobStore().release_many(hashes)
+        UrlBloomFilter(containerid=containerid).delete()
+        BoilerplateFilter(containerid=containerid).delete()
+        OrphanedFiles(containerid=containerid).delete()
@@ -0,0 +1,126 @@
+"""
+The post-crawl pipeline of a container: integrity check, matrices for the
+first feature number, matrices for the other feature numbers (factorised from
+the vectors of the first), dendrogram.
+
+nlp reports the end of every stage with a callback task (integrity check,
+matrix, dendrogram callbacks); the callbacks advance the pipeline, so the
+artifacts are computed before they are requested. The feature numbers of a
+stage are sent as a group and joined with a set of pending feature numbers in
+redis; the next stage starts when the last of them calls back.
+"""
+import typing
+
+from celery import group
+
+from graph.emit import compute_dendrogram
+from metrics.redis import RedisConnect
+from metrics.single_flight import MatrixFlight
+from rmxweb.celery import celery
+from rmxweb.config import PIPELINE_FEATURES, PIPELINE_TIMEOUT, RMXWEB_TASKS
+
+INTEGRITY_CHECK = 'integrity_check'
+MATRIX = 'matrix'
+FEATURES = 'features'
+DENDROGRAM = 'dendrogram'
+
+STAGES = (INTEGRITY_CHECK, MATRIX, FEATURES, DENDROGRAM)
+
+# the parameters of the matrices computed by the pipeline; the defaults of
+# generate_matrix_remote.
+MATRIX_PARAMETERS = {'words': 6, 'docs_per_feat': 0, 'feats_per_doc': 3}
+
+
+class Pipeline(object):
+
+    def __init__(self, containerid: int = None):
+        """
+        Instantiating the Pipeline.
+
+        :param containerid:
+        """
+        self.containerid = containerid
+        self.key = f'pipeline_stage_containerid_{containerid}'
+        self.pending_key = f'pipeline_pending_containerid_{containerid}'
+        self.redis = RedisConnect().connection
+
+    @property
+    def stage(self) -> typing.Optional[str]:
+        """ Returns the stage in progress, or None. """
+        value = self.redis.get(self.key)
+        return value.decode('utf-8') if value else None
+
+    def start(self):
+        """ Starts the pipeline; called when the integrity check is sent. """
+        if not PIPELINE_FEATURES:
+            return
+        pipe = self.redis.pipeline()
+        pipe.set(self.key, INTEGRITY_CHECK, ex=PIPELINE_TIMEOUT)
+        pipe.delete(self.pending_key)
+        pipe.execute()
+
+    def stop(self):
+        """ Deletes the state of the pipeline. """
+        self.redis.delete(self.key, self.pending_key)
+
+    def advance(self, stage: str = None, features: int = None):
+        """
+        Handles the callback of a stage and starts the next one. Callbacks
+        that don't belong to the stage in progress (requests of users, older
+        runs) are ignored.
+
+        :param stage: the stage that called back
+        :param features: the feature number of a matrix callback
+        :return:
+        """
+        current = self.stage
+        if stage == MATRIX and current in (MATRIX, FEATURES):
+            if not self.join(features):
+                return
+            stage = current
+        elif stage != current:
+            return
+        idx = STAGES.index(stage) + 1
+        if idx < len(STAGES):
+            self.run(STAGES[idx])
+        else:
+            self.stop()
+
+    def join(self, features: int = None) -> bool:
+        """ Returns True if the callback is the last pending one. """
+        pipe = self.redis.pipeline()
+        pipe.srem(self.pending_key, features)
+        pipe.scard(self.pending_key)
+        removed, left = pipe.execute()
+        return bool(removed) and not left
+
+    def run(self, stage: str = None):
+        """ Starts a stage. """
+        if stage == DENDROGRAM:
+            self.redis.set(self.key, DENDROGRAM, ex=PIPELINE_TIMEOUT)
+            compute_dendrogram(containerid=self.containerid)
+            return
+        features = PIPELINE_FEATURES[:1] if stage == MATRIX else \
+            PIPELINE_FEATURES[1:]
+        if not features:
+            self.run(STAGES[STAGES.index(stage) + 1])
+            return
+        pipe = self.redis.pipeline()
+        pipe.set(self.key, stage, ex=PIPELINE_TIMEOUT)
+        pipe.delete(self.pending_key)
+        pipe.sadd(self.pending_key, *features)
+        pipe.expire(self.pending_key, PIPELINE_TIMEOUT)
+        pipe.execute()
+        # feature numbers in flight call back without being sent again.
+        group(
+            celery.signature(
+                RMXWEB_TASKS['generate_matrix_remote'],
+                kwargs={
+                    'containerid': self.containerid,
+                    'features': _,
+                    **MATRIX_PARAMETERS
+                }
+            ) for _ in features
+            if MatrixFlight(containerid=self.containerid, features=_).claim(
+                **MATRIX_PARAMETERS)
+        ).apply_async()
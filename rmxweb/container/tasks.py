@@ -2,17 +2,30 @@
 import os
 from typing import List
 
-from data.models import Data as DataModel
+from data.models import Data as DataModel, ManifestChange
 from .models import Container
+from .pipeline import INTEGRITY_CHECK, Pipeline
+from metrics.cancellation import Cancellation, cancellable
+from metrics.crawl_activity import CrawlActivity
+from metrics.crawl_job import CrawlJob
+from metrics.debounce import Debounce
 from metrics.config import (
     COMPUTE_MATRIX_RUN_PREFIX,
     CRAWL_CALLBACK_PREFIX,
     INTEGRITY_CHECK_CALLBACK_PREFIX,
-    INTEGRITY_CHECK_RUN_PREFIX
+    INTEGRITY_CHECK_RUN_PREFIX,
+    TASK_DENDROGRAM,
+    TASK_INTEGRITY_CHECK,
+    TASK_MONITOR_CRAWL,
 )
 from metrics.decorator import register_metrics
+from metrics.semaphore import NlpSemaphore
 from rmxweb.config import (
     CRAWL_MONITOR_COUNTDOWN,
+    CRAWL_MONITOR_COUNTDOWN_NO_LISTENER,
+    CRAWL_START_MONITOR_COUNTDOWN,
+    INTEGRITY_CHECK_DEBOUNCE,
+    MANIFEST_DIFF,
     NLP_TASKS,
     RMXWEB_TASKS,
 )
@@ -28,78 +41,238 @@ class __Error(Error):
 
 
 @celery.task
+@cancellable
 @register_metrics(INTEGRITY_CHECK_RUN_PREFIX)
 def integrity_check(containerid: str = None):
     """
-    Checks the integrity of the container after the crawler finishes.
+    Checks the integrity of the container after the crawler finishes. The
+    container is no longer stale once the check is sent. This starts the
+    post-crawl pipeline.
+
+    If MANIFEST_DIFF is enabled, the check receives the changes of the
+    manifest since the last verified generation (see ManifestChange.diff) and
+    echoes the generation in its callback.
     :param containerid:
     :return:
     """
     obj = Container.get_object(pk=containerid)
-    celery.send_task(
-        NLP_TASKS['integrity_check'],
-        kwargs={
-            'containerid': containerid,
-            'path': obj.get_folder_path(),
-        }
-    )
+    Container.objects.filter(pk=obj.pk).update(stale=False)
+    Pipeline(containerid=obj.pk).start()
+    kwds = {
+        'containerid': containerid,
+        'path': obj.get_folder_path(),
+    }
+    if MANIFEST_DIFF:
+        kwds.update(ManifestChange.diff(obj))
+    else:
+        ManifestChange.reset(obj)
+    result = celery.send_task(NLP_TASKS['integrity_check'], kwargs=kwds)
+    Cancellation(containerid=containerid).track(
+        TASK_INTEGRITY_CHECK, result.id, supersede=True)
 
 
 @celery.task
+@cancellable
 @register_metrics(INTEGRITY_CHECK_CALLBACK_PREFIX, CRAWL_CALLBACK_PREFIX)
-def integrity_check_callback(containerid: int = None, path: str = None):
+def integrity_check_callback(containerid: int = None, path: str = None,
+                             generation: int = None):
     """
-    Task called after the integrity check succeeds on the level of NLP. This
-    task is a placeholder for register_metrics.
+    Task called after the integrity check succeeds on the level of NLP. It
+    saves the verified generation of the manifest and advances the post-crawl
+    pipeline.
 
     :param containerid: the container id
     :param path: the path
+    :param generation: the generation of the manifest that was checked
     """
-    pass
+    if generation:
+        ManifestChange.verify(containerid=containerid, generation=generation)
+    Cancellation(containerid=containerid).clear(TASK_INTEGRITY_CHECK)
+    Pipeline(containerid=containerid).advance(INTEGRITY_CHECK)
+
+
+def integrity_check_debounce(containerid: int = None) -> Debounce:
+    """Returns the debounce of the integrity checks of a container."""
+    return Debounce(name='integrity_check',
+                    containerid=containerid,
+                    window=INTEGRITY_CHECK_DEBOUNCE)
 
 
 @celery.task
+@cancellable
+def request_integrity_check(containerid: int = None):
+    """
+    Requests an integrity check for a container. The requests made within
+    INTEGRITY_CHECK_DEBOUNCE seconds of each other are coalesced into one
+    check, that runs when the requests stop.
+    :param containerid:
+    :return:
+    """
+    if integrity_check_debounce(containerid).request():
+        celery.send_task(
+            RMXWEB_TASKS['debounced_integrity_check'],
+            kwargs={'containerid': containerid},
+            countdown=INTEGRITY_CHECK_DEBOUNCE
+        )
+
+
+@celery.task
+@cancellable
+def debounced_integrity_check(containerid: int = None):
+    """
+    Sends the integrity check once the debounce window of the container is
+    over and no other check is in progress; otherwise the task is sent again
+    for later.
+    :param containerid:
+    :return:
+    """
+    debounce = integrity_check_debounce(containerid)
+    container = Container.objects.filter(pk=containerid).first()
+    if not container:
+        debounce.clear()
+        return
+    wait = debounce.remaining()
+    if wait <= 0 and not container.integrity_check_is_ready():
+        wait = INTEGRITY_CHECK_DEBOUNCE
+    if wait > 0:
+        debounce.postpone()
+        celery.send_task(
+            RMXWEB_TASKS['debounced_integrity_check'],
+            kwargs={'containerid': containerid},
+            countdown=wait
+        )
+        return
+    debounce.clear()
+    celery.send_task(
+        RMXWEB_TASKS['integrity_check'],
+        kwargs={'containerid': containerid}
+    )
+
+
+@celery.task
+@cancellable
 def delete_data_from_container(
         containerid: str = None, data_ids: List[int] = None):
     """
+    Deleting data objects from a container. The request for an integrity
+    check is sent by delete_many once the texts are removed; checks requested
+    by successive deletions are coalesced.
     :param containerid:
     :param data_ids:
     :return:
     """
     container = Container.get_object(containerid)
-    DataModel.delete_many(data_ids=data_ids, containerid=containerid)
+    link = None
     if container.matrix_exists:
+        link = celery.signature(
+            RMXWEB_TASKS['request_integrity_check'],
+            kwargs={'containerid': containerid},
+            immutable=True
+        )
+    DataModel.delete_many(
+        data_ids=data_ids, containerid=containerid, link=link)
+
+
+@celery.task
+@cancellable
+def crawl_finished(containerid: int = None):
+    """This task takes care of the crawl callback.
+
+       It is sent by the listener of crawl events (listen_crawl_events) when
+       the crawl quiesces, and by monitor_crawl; the end of a crawl is handled
+       once.
+
+       When the crawl did not change the dataset, the crawl is closed without
+       an integrity check.
+    """
+    if not CrawlActivity(containerid=containerid).claim():
+        return
+    container = Container.get_object(pk=containerid)
+    if not container.stale:
+        integrity_check_callback(containerid=containerid)
+    # making sure that there is no integrity check in progress
+    elif container.integrity_check_is_ready():
         celery.send_task(
             RMXWEB_TASKS['integrity_check'],
-            kwargs={'containerid': containerid}
+            kwargs={
+                'containerid': containerid
+            }
         )
 
 
 @celery.task
+@cancellable
+def end_crawl(containerid: int = None, crawlid: str = None):
+    """Task sent by scrasync when a crawl has no more pages to fetch. The
+       crawl is finished once the pages in the queue are written.
+    """
+    CrawlActivity(containerid=containerid).finish()
+
+
+@celery.task
+@cancellable
+def crawl_launched(crawlid: str = None, containerid: int = None,
+                   jobid: str = None):
+    """Callback of launch_crawl, receiving the crawlid from scrasync. It
+       saves the crawlid in the crawl job and starts the task monitoring the
+       crawler.
+    """
+    CrawlJob(jobid=jobid).launched(crawlid)
+    # the countdown argument is here to make sure that this task does not
+    # start immediately as the metrics db may be empty. One monitor runs per
+    # container; it replaces the monitor of a previous crawl.
+    monitor = celery.send_task(
+        RMXWEB_TASKS['monitor_crawl'],
+        kwargs={
+            'containerid': containerid,
+            'crawlid': crawlid
+        },
+        countdown=CRAWL_START_MONITOR_COUNTDOWN
+    )
+    Cancellation(containerid=containerid).track(
+        TASK_MONITOR_CRAWL, monitor.id, supersede=True)
+
+
+@celery.task
+def crawl_launch_failed(*_, containerid: int = None, jobid: str = None):
+    """Error callback of launch_crawl. The crawl job fails and the crawl
+       activity of the container ends, so that the crawl is closed.
+    """
+    CrawlJob(jobid=jobid).failed()
+    CrawlActivity(containerid=containerid).finish()
+
+
+@celery.task
+@cancellable
 def monitor_crawl(containerid: int = None, crawlid: str = None):
-    """This task takes care of the crawl callback.
+    """Safety net for the events that signal the end of a crawl. This task
+       polls the crawl metrics every CRAWL_MONITOR_COUNTDOWN seconds, or
+       CRAWL_MONITOR_COUNTDOWN_NO_LISTENER seconds when no listener of the
+       crawl events runs, and calls crawl_finished when the crawl is ready.
+       It stops once the end of the crawl was claimed.
 
        The first parameter is empty becasue it is called as a linked task
        receiving a list of endpoints from the scrapper.
     """
     container = Container.get_object(pk=containerid)
     if container.crawl_is_ready():
-        # making sure that there is no integrity check in progress
-        if container.integrity_check_is_ready():
-            celery.send_task(
-                RMXWEB_TASKS['integrity_check'],
-                kwargs={
-                    'containerid': containerid
-                }
-            )
-    else:
-        celery.send_task(
+        crawl_finished(containerid=containerid)
+    if not CrawlActivity(containerid=containerid).is_finished():
+        # the crawl is not ready or the claim failed, as pages were still
+        # written; the crawl is polled again.
+        result = celery.send_task(
             RMXWEB_TASKS['monitor_crawl'],
             kwargs={
                 'containerid': containerid
             },
             countdown=CRAWL_MONITOR_COUNTDOWN
+            if CrawlActivity.listener_is_running()
+            else CRAWL_MONITOR_COUNTDOWN_NO_LISTENER
         )
+        # the next poll replaces this one
+        cancellation = Cancellation(containerid=containerid)
+        cancellation.clear(TASK_MONITOR_CRAWL)
+        cancellation.track(TASK_MONITOR_CRAWL, result.id)
 
 
 @celery.task
@@ -111,21 +284,27 @@ def test_task(a: int = None, b: int = None) -> dict:
 
 
 @celery.task
+@cancellable
 @register_metrics(COMPUTE_MATRIX_RUN_PREFIX)
 def generate_matrix_remote(
         containerid=None,
         features: int = 10,
         words: int = 6,
         docs_per_feat: int = 0,
-        feats_per_doc: int = 3):
+        feats_per_doc: int = 3,
+        admitted: bool = False):
     """
-    Generating matrices on the remote server.
+    Generating matrices on the remote server. The computation waits for its
+    turn in the semaphore of its job type (computation or factorisation of
+    the matrices); the task is sent again by the semaphore when it is
+    admitted.
 
     :param containerid:
     :param features:
     :param words:
     :param docs_per_feat:
     :param feats_per_doc:
+    :param admitted: True if the semaphore admitted the computation
     :return:
     """
     container = Container.get_object(pk=containerid)
@@ -137,7 +316,65 @@ def generate_matrix_remote(
         'feats_per_doc': int(feats_per_doc),
         'path': container.get_folder_path(),
     }
-    if os.path.isfile(container.get_vectors_path()):
-        celery.send_task(NLP_TASKS['factorize_matrices'], kwargs=kwds)
-    else:
-        celery.send_task(NLP_TASKS['compute_matrices'], kwargs=kwds)
+    job = 'factorize_matrices' if os.path.isfile(
+        container.get_vectors_path()) else 'compute_matrices'
+    if not admitted and not NlpSemaphore(job).acquire(
+            NlpSemaphore.token(containerid, features),
+            task=RMXWEB_TASKS['generate_matrix_remote'],
+            kwargs={
+                'containerid': containerid,
+                'features': features,
+                'words': words,
+                'docs_per_feat': docs_per_feat,
+                'feats_per_doc': feats_per_doc,
+            }):
+        return
+    result = celery.send_task(NLP_TASKS[job], kwargs=kwds)
+    Cancellation(containerid=containerid).track(
+        Cancellation.matrix_kind(features), result.id)
+
+
+@celery.task
+@cancellable
+def generate_dendrogram_remote(containerid: int = None,
+                               admitted: bool = False):
+    """
+    Computing the dendrogram on the remote server, once admitted by the
+    semaphore of the dendrograms, which sends the task again then. The
+    computation supersedes the computations of the dendrogram still running.
+
+    :param containerid:
+    :param admitted: True if the semaphore admitted the computation
+    :return:
+    """
+    if not admitted and not NlpSemaphore('compute_dendrogram').acquire(
+            NlpSemaphore.token(containerid),
+            task=RMXWEB_TASKS['generate_dendrogram_remote'],
+            kwargs={'containerid': containerid},
+            supersede=True):
+        return
+    result = celery.send_task(
+        NLP_TASKS['compute_dendrogram'],
+        kwargs={
+            'containerid': containerid
+        }
+    )
+    Cancellation(containerid=containerid).track(
+        TASK_DENDROGRAM, result.id, supersede=True)
+
+
+@celery.task
+def wake_nlp_jobs(job: str = None):
+    """
+    Safety net of the semaphore of a job type: the holders that didn't call
+    back in NLP_JOB_TIMEOUT seconds are dropped and the waiting jobs are
+    admitted. The task is sent again while jobs wait.
+    :param job: one of the keys of NLP_JOB_LIMITS
+    :return:
+    """
+    semaphore = NlpSemaphore(job)
+    semaphore.redis.delete(semaphore.wake_key)
+    semaphore.purge()
+    semaphore.wake()
+    if semaphore.is_waiting():
+        semaphore.schedule_wake()
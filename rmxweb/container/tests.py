@@ -1,3 +1,578 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import path, reverse
+from redis.asyncio.client import PubSub
+
+from . import async_views
+from .models import Container
+from .pipeline import (
+    DENDROGRAM,
+    FEATURES,
+    INTEGRITY_CHECK,
+    MATRIX,
+    MATRIX_PARAMETERS,
+    Pipeline,
+)
+from . import views
+from .tasks import (
+    crawl_launch_failed,
+    crawl_launched,
+    debounced_integrity_check,
+    delete_data_from_container,
+    integrity_check,
+    integrity_check_callback,
+    monitor_crawl,
+    request_integrity_check,
+)
+from data.models import Data
+from data.tasks import create_many_from_webpage
+from graph.receive import compute_dendrogram_callback, compute_matrix_callback
+from metrics.cancellation import Cancellation
+from metrics.config import (
+    CREATE_DATA_PREFIX,
+    ENTER,
+    TASK_INTEGRITY_CHECK,
+    TASK_MONITOR_CRAWL,
+)
+from metrics.crawl_activity import LISTENER_KEY, CrawlActivity
+from metrics.crawl_job import LAUNCHED, PENDING, CrawlJob
+from metrics.dataset_ready import DatasetReady
+from metrics.events import PROGRESS, ContainerEvents
+from metrics.eta import CRAWL
+from metrics.redis import AsyncRedisConnect
+from metrics.single_flight import MatrixFlight
+from metrics.tests import RedisTestCase, fakeredis
+from rmxweb import config
+from rmxweb.celery import celery
+
+# the async views are only routed under ASGI (see ASYNC_VIEWS)
+urlpatterns = [
+    path('container/<int:pk>/events/', async_views.events),
+]
+
+
+class MonitorCrawlTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.container = Container.objects.create(name='crawl')
+        self.activity = CrawlActivity(containerid=self.container.pk)
+        patcher = mock.patch.object(Container, 'crawl_is_ready')
+        self.crawl_is_ready = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('container.tasks.celery.send_task')
+        self.send_task = patcher.start()
+        self.send_task.return_value.id = 'monitor_crawl'
+        self.addCleanup(patcher.stop)
+
+    def countdown(self) -> int:
+        return self.send_task.call_args.kwargs['countdown']
+
+    def test_polls_until_ready(self):
+        self.crawl_is_ready.return_value = False
+        monitor_crawl(containerid=self.container.pk)
+        self.assertEqual(self.countdown(),
+                         config.CRAWL_MONITOR_COUNTDOWN_NO_LISTENER)
+        self.redis.set(LISTENER_KEY, 1)
+        monitor_crawl(containerid=self.container.pk)
+        self.assertEqual(
+            self.countdown(), config.CRAWL_MONITOR_COUNTDOWN)
+
+    @mock.patch('container.tasks.crawl_finished')
+    def test_polls_until_claimed(self, crawl_finished):
+        self.crawl_is_ready.return_value = True
+        monitor_crawl(containerid=self.container.pk)
+        crawl_finished.assert_called_once()
+        self.assertEqual(self.send_task.call_count, 1)
+        self.activity.claim()
+        self.send_task.reset_mock()
+        monitor_crawl(containerid=self.container.pk)
+        self.send_task.assert_not_called()
+
+
+class IntegrityCheckDebounceTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.container = Container.objects.create(name='debounce')
+        patcher = mock.patch.object(
+            Container, 'integrity_check_is_ready', return_value=True)
+        self.integrity_check_is_ready = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('container.tasks.celery.send_task')
+        self.send_task = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sent(self) -> list:
+        return [_.args[0] for _ in self.send_task.call_args_list]
+
+    def test_requests_are_coalesced(self):
+        for _ in range(3):
+            request_integrity_check(containerid=self.container.pk)
+        self.assertEqual(
+            self.sent(), [config.RMXWEB_TASKS['debounced_integrity_check']])
+
+    def test_check_waits_for_the_end_of_the_window(self):
+        request_integrity_check(containerid=self.container.pk)
+        self.send_task.reset_mock()
+        debounced_integrity_check(containerid=self.container.pk)
+        self.assertEqual(
+            self.sent(), [config.RMXWEB_TASKS['debounced_integrity_check']])
+        self.send_task.reset_mock()
+        with mock.patch('time.time',
+                        return_value=time.time() +
+                        config.INTEGRITY_CHECK_DEBOUNCE):
+            debounced_integrity_check(containerid=self.container.pk)
+        self.assertEqual(self.sent(), [config.RMXWEB_TASKS['integrity_check']])
+        # a new request schedules a new check.
+        self.send_task.reset_mock()
+        request_integrity_check(containerid=self.container.pk)
+        self.assertEqual(
+            self.sent(), [config.RMXWEB_TASKS['debounced_integrity_check']])
+
+    def test_check_waits_for_the_check_in_progress(self):
+        request_integrity_check(containerid=self.container.pk)
+        self.integrity_check_is_ready.return_value = False
+        self.send_task.reset_mock()
+        with mock.patch('time.time',
+                        return_value=time.time() +
+                        config.INTEGRITY_CHECK_DEBOUNCE):
+            debounced_integrity_check(containerid=self.container.pk)
+        self.assertEqual(
+            self.sent(), [config.RMXWEB_TASKS['debounced_integrity_check']])
+        self.assertEqual(self.send_task.call_args.kwargs['countdown'],
+                         config.INTEGRITY_CHECK_DEBOUNCE)
+
+
+@mock.patch('container.pipeline.PIPELINE_FEATURES', [10, 20, 30])
+class PipelineTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.container = Container.objects.create(name='pipeline')
+        self.pipeline = Pipeline(containerid=self.container.pk)
+        self.sent = []
+        patcher = mock.patch('container.pipeline.group',
+                             side_effect=self.group)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('container.pipeline.compute_dendrogram')
+        self.compute_dendrogram = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def group(self, signatures):
+        self.sent.append([_.kwargs['features'] for _ in signatures])
+        return mock.Mock()
+
+    def test_stages_run_in_order(self):
+        self.pipeline.start()
+        self.assertEqual(self.pipeline.stage, INTEGRITY_CHECK)
+        self.pipeline.advance(INTEGRITY_CHECK)
+        self.assertEqual(self.pipeline.stage, MATRIX)
+        self.assertEqual(self.sent, [[10]])
+        self.pipeline.advance(MATRIX, features=10)
+        self.assertEqual(self.pipeline.stage, FEATURES)
+        self.assertEqual(self.sent, [[10], [20, 30]])
+        self.pipeline.advance(MATRIX, features=30)
+        self.assertEqual(self.pipeline.stage, FEATURES)
+        self.compute_dendrogram.assert_not_called()
+        self.pipeline.advance(MATRIX, features=20)
+        self.assertEqual(self.pipeline.stage, DENDROGRAM)
+        self.compute_dendrogram.assert_called_once_with(
+            containerid=self.container.pk)
+        self.pipeline.advance(DENDROGRAM)
+        self.assertIsNone(self.pipeline.stage)
+        self.assertFalse(self.redis.exists(self.pipeline.pending_key))
+
+    def test_foreign_callbacks_are_ignored(self):
+        # no pipeline in progress: a dendrogram requested by a user.
+        self.pipeline.advance(DENDROGRAM)
+        self.pipeline.advance(MATRIX, features=10)
+        self.assertIsNone(self.pipeline.stage)
+        self.pipeline.start()
+        self.pipeline.advance(DENDROGRAM)
+        self.assertEqual(self.pipeline.stage, INTEGRITY_CHECK)
+        self.pipeline.advance(INTEGRITY_CHECK)
+        # a feature number that the stage didn't send, and a repeated
+        # callback, don't end the stage.
+        self.pipeline.advance(MATRIX, features=20)
+        self.assertEqual(self.pipeline.stage, MATRIX)
+        self.pipeline.advance(MATRIX, features=10)
+        self.pipeline.advance(MATRIX, features=10)
+        self.assertEqual(self.pipeline.stage, FEATURES)
+        self.assertEqual(self.sent, [[10], [20, 30]])
+
+    def test_restart_drops_the_previous_run(self):
+        self.pipeline.start()
+        self.pipeline.advance(INTEGRITY_CHECK)
+        self.pipeline.start()
+        self.assertEqual(self.pipeline.stage, INTEGRITY_CHECK)
+        self.assertFalse(self.redis.exists(self.pipeline.pending_key))
+        # the callback of the matrix of the previous run is ignored.
+        self.pipeline.advance(MATRIX, features=10)
+        self.assertEqual(self.pipeline.stage, INTEGRITY_CHECK)
+
+    def test_state_expires(self):
+        self.pipeline.start()
+        self.pipeline.advance(INTEGRITY_CHECK)
+        for key in [self.pipeline.key, self.pipeline.pending_key]:
+            self.assertGreater(self.redis.ttl(key), 0)
+            self.assertLessEqual(self.redis.ttl(key), config.PIPELINE_TIMEOUT)
+
+    def test_matrices_in_flight_are_joined(self):
+        MatrixFlight(containerid=self.container.pk, features=20).claim(
+            **MATRIX_PARAMETERS)
+        self.pipeline.start()
+        self.pipeline.advance(INTEGRITY_CHECK)
+        self.pipeline.advance(MATRIX, features=10)
+        self.assertEqual(self.sent, [[10], [30]])
+        self.pipeline.advance(MATRIX, features=30)
+        self.pipeline.advance(MATRIX, features=20)
+        self.assertEqual(self.pipeline.stage, DENDROGRAM)
+
+    def test_one_feature_number_skips_a_stage(self):
+        with mock.patch('container.pipeline.PIPELINE_FEATURES', [10]):
+            self.pipeline.start()
+            self.pipeline.advance(INTEGRITY_CHECK)
+            self.pipeline.advance(MATRIX, features=10)
+        self.assertEqual(self.sent, [[10]])
+        self.assertEqual(self.pipeline.stage, DENDROGRAM)
+        self.compute_dendrogram.assert_called_once()
+
+    def test_disabled(self):
+        with mock.patch('container.pipeline.PIPELINE_FEATURES', []):
+            self.pipeline.start()
+        self.assertIsNone(self.pipeline.stage)
+        self.pipeline.advance(INTEGRITY_CHECK)
+        self.assertEqual(self.sent, [])
+
+    @mock.patch.object(
+        Container, 'integrity_check_is_ready', return_value=True)
+    @mock.patch('container.tasks.celery.send_task')
+    def test_callbacks_advance_the_pipeline(self, send_task, _):
+        send_task.return_value.id = 'task'
+        # the integrity checks requested by deletions are debounced; the
+        # pipeline starts when the check is sent.
+        request_integrity_check(containerid=self.container.pk)
+        request_integrity_check(containerid=self.container.pk)
+        self.assertIsNone(self.pipeline.stage)
+        with mock.patch('time.time',
+                        return_value=time.time() +
+                        config.INTEGRITY_CHECK_DEBOUNCE):
+            debounced_integrity_check(containerid=self.container.pk)
+        self.assertEqual(
+            [_.args[0] for _ in send_task.call_args_list], [
+                config.RMXWEB_TASKS['debounced_integrity_check'],
+                config.RMXWEB_TASKS['integrity_check'],
+            ])
+        integrity_check(containerid=self.container.pk)
+        self.assertEqual(self.pipeline.stage, INTEGRITY_CHECK)
+        integrity_check_callback(containerid=self.container.pk)
+        self.assertEqual(self.pipeline.stage, MATRIX)
+        for features in [10, 20, 30]:
+            compute_matrix_callback(
+                containerid=self.container.pk, features=features)
+        self.assertEqual(self.pipeline.stage, DENDROGRAM)
+        compute_dendrogram_callback(containerid=self.container.pk)
+        self.assertIsNone(self.pipeline.stage)
+        self.assertEqual(self.sent, [[10], [20, 30]])
+
+
+class DeleteDataTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        for name in ['CONTAINER_ROOT', 'BLOB_ROOT']:
+            patcher = mock.patch.object(config, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            Container, 'matrix_exists', new_callable=mock.PropertyMock,
+            return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.container = Container.create(the_name='delete')
+        self.objs = [
+            Data.create(data=[f'the text of page {idx}'],
+                        containerid=self.container.pk,
+                        endpoint=f'http://example.com/{idx}')
+            for idx in range(2)
+        ]
+
+    def test_integrity_check_is_requested_once_the_texts_are_gone(self):
+        sent = []
+
+        def send_task(name, *args, **kwds):
+            sent.append((name, [
+                os.path.exists(obj.file_path) for obj in self.objs]))
+            return mock.Mock(id=name)
+
+        with mock.patch.object(celery, 'send_task', side_effect=send_task):
+            delete_data_from_container(
+                containerid=self.container.pk,
+                data_ids=[obj.pk for obj in self.objs])
+        self.assertEqual(sent, [
+            (config.RMXWEB_TASKS['request_integrity_check'], [False, False]),
+            (config.RMXWEB_TASKS['collect_garbage'], [False, False]),
+        ])
+
+
+class CancellationTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        for name in ['CONTAINER_ROOT', 'BLOB_ROOT']:
+            patcher = mock.patch.object(config, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(celery.control, 'revoke')
+        self.revoke = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.container = Container.create(the_name='cancel')
+        self.cancellation = Cancellation(containerid=self.container.pk)
+
+    def pages(self) -> list:
+        return [{'data': ['a text'], 'endpoint': 'http://example.com/'}]
+
+    def test_delete_container_revokes_its_tasks(self):
+        self.cancellation.track(TASK_INTEGRITY_CHECK, 'check')
+        self.cancellation.track(TASK_MONITOR_CRAWL, 'monitor')
+        Cancellation(containerid=0).track(TASK_MONITOR_CRAWL, 'other')
+        self.container.delete_container()
+        self.revoke.assert_called_once()
+        self.assertEqual(sorted(self.revoke.call_args.args[0]),
+                         ['check', 'monitor'])
+        self.assertTrue(self.revoke.call_args.kwargs['terminate'])
+        self.assertEqual(Cancellation(containerid=0).task_ids(), ['other'])
+
+    def test_cancelled_tasks_dont_write(self):
+        self.cancellation.cancel()
+        self.assertIsNone(create_many_from_webpage(
+            containerid=self.container.pk, pages=self.pages()))
+        self.assertFalse(self.container.data_set.exists())
+        self.assertEqual(os.listdir(self.container.container_path()), [])
+        with mock.patch('container.tasks.celery.send_task') as send_task:
+            monitor_crawl(containerid=self.container.pk)
+        send_task.assert_not_called()
+        # a new container with the same id is not cancelled.
+        self.cancellation.reset()
+        self.assertEqual(len(create_many_from_webpage(
+            containerid=self.container.pk, pages=self.pages())), 1)
+        self.assertTrue(self.container.data_set.exists())
+
+
+class CrawlJobTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        patcher = mock.patch.object(config, 'CONTAINER_ROOT', path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ['dataset_is_ready', 'crawl_is_ready']:
+            patcher = mock.patch.object(Container, name, return_value=False)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(celery, 'send_task')
+        self.send_task = patcher.start()
+        self.send_task.return_value.id = 'task'
+        self.addCleanup(patcher.stop)
+
+    def launch(self) -> tuple:
+        resp = self.client.post('/container/', {
+            'name': 'crawl', 'endpoint': 'http://example.com/'
+        }, content_type='application/json')
+        self.assertEqual(resp.status_code, 202)
+        params = resp.json()['task']['parameters']
+        self.assertEqual(resp['Location'], params['job'])
+        return resp.json()['task']['id'], params['jobid'], params['job']
+
+    def test_launch_doesnt_wait_for_scrasync(self):
+        containerid, jobid, _ = self.launch()
+        self.assertEqual(self.send_task.call_args.args,
+                         (config.SCRASYNC_TASKS['launch_crawl'],))
+        self.assertEqual(self.send_task.call_args.kwargs['task_id'], jobid)
+        self.assertEqual(CrawlJob(jobid).get()['state'], PENDING)
+        self.assertEqual(CrawlJob(jobid).get()['containerid'], containerid)
+
+    def test_job_states(self):
+        containerid, jobid, uri = self.launch()
+        resp = self.client.get(uri)
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.json()['task']['job']['state'], PENDING)
+        self.assertIn('Retry-After', resp)
+
+        self.send_task.reset_mock()
+        crawl_launched(crawlid='crawl', containerid=containerid, jobid=jobid)
+        self.assertEqual(self.send_task.call_args.args,
+                         (config.RMXWEB_TASKS['monitor_crawl'],))
+        self.assertEqual(
+            Cancellation(containerid).task_ids(TASK_MONITOR_CRAWL), ['task'])
+        resp = self.client.get(uri)
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.json()['task']['job']['crawlid'], 'crawl')
+        self.assertEqual(resp.json()['task']['job']['state'], LAUNCHED)
+
+        self.dataset_is_ready.return_value = True
+        resp = self.client.get(uri)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['job-status'], 'COMPLETED')
+
+    def test_launch_failed(self):
+        containerid, jobid, uri = self.launch()
+        CrawlActivity(containerid=containerid).start()
+        crawl_launch_failed(containerid=containerid, jobid=jobid)
+        resp = self.client.get(uri)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['job-status'], 'FAILED')
+        self.assertTrue(self.redis.hget(
+            CrawlActivity(containerid=containerid).arrivals_key, 'done'))
+
+    def test_unknown_job(self):
+        containerid, jobid, _ = self.launch()
+        self.assertEqual(self.client.get(
+            f'/container/{containerid}/crawl/other/').status_code, 404)
+        self.assertEqual(self.client.get(
+            f'/container/{containerid + 1}/crawl/{jobid}/').status_code, 404)
+
+
+class ContainerReadinessTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.containers = [
+            Container.objects.create(name=f'ready {_}') for _ in range(2)]
+        self.ids = [_.pk for _ in self.containers]
+        stats = DatasetReady(containerid=self.ids[0], prefetch=False).stats
+        self.redis.set(stats.run_n.enter_name, time.time())
+
+    def test_get(self):
+        missing = max(self.ids) + 1
+        resp = self.client.get(
+            reverse('container-readiness'),
+            {'containerid': f'{self.ids[0]},{self.ids[1]},{missing}',
+             'features': '10,20'})
+        self.assertEqual(resp.status_code, 200)
+        out = resp.json()['containers']
+        self.assertEqual([_['containerid'] for _ in out],
+                         self.ids + [missing])
+        self.assertEqual([_.get('ready') for _ in out], [False, True, None])
+        self.assertEqual(out[2], {'containerid': missing, 'exists': False})
+        self.assertEqual(set(out[0]['graph']), {'10', '20'})
+
+    def test_post(self):
+        resp = self.client.post(reverse('container-readiness'), {
+            'containers': [{'containerid': self.ids[1], 'features': [10]}]
+        }, content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        out = resp.json()['containers']
+        self.assertEqual(len(out), 1)
+        self.assertEqual(list(out[0]['graph']), ['10'])
+
+    def test_bad_requests(self):
+        url = reverse('container-readiness')
+        self.assertEqual(
+            self.client.get(url, {'containerid': 'a'}).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with mock.patch.object(config, 'READINESS_BATCH_LIMIT', 1):
+            self.assertEqual(self.client.get(
+                url, {'containerid': self.ids}).status_code, 404)
+        self.assertEqual(self.client.post(
+            url, {'containers': [{}]},
+            content_type='application/json').status_code, 404)
+
+
+class EventsTestCase(TestCase):
+
+    def test_wsgi_view_points_to_readiness(self):
+        container = Container.objects.create(name='events')
+        request = RequestFactory().get(f'/container/{container.pk}/events/')
+        resp = views.events(request, container.pk)
+        self.assertEqual(resp.status_code, 501)
+        self.assertEqual(
+            json.loads(resp.content)['readiness'],
+            f'/container/readiness/?containerid={container.pk}')
+
+    def test_missing_container(self):
+        with self.assertRaises(Http404):
+            views.events(RequestFactory().get('/'), 0)
+
+
+@override_settings(ROOT_URLCONF='container.tests')
+@mock.patch.object(config, 'SSE_KEEPALIVE', 0.01)
+class AsyncEventsTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.container = Container.objects.create(name='events')
+        # the events published by the workers reach the async connection.
+        self.async_redis = fakeredis.FakeAsyncRedis(server=self.server)
+        patcher = mock.patch.object(AsyncRedisConnect, 'get_connection',
+                                    return_value=self.async_redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def events(self) -> tuple:
+        resp = await self.async_client.get(
+            f'/container/{self.container.pk}/events/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'text/event-stream')
+        self.assertEqual(resp['Cache-Control'], 'no-cache')
+        return resp, aiter(resp.streaming_content)
+
+    def parse(self, chunk: bytes) -> dict:
+        self.assertTrue(chunk.endswith(b'\n\n'))
+        fields = dict(
+            _.split(': ', 1) for _ in chunk.decode('utf-8')[:-2].split('\n'))
+        if 'data' in fields:
+            fields['data'] = json.loads(fields['data'])
+        return fields
+
+    async def test_stream(self):
+        resp, chunks = await self.events()
+        self.assertEqual(self.parse(await anext(chunks)),
+                         {'retry': str(config.SSE_RETRY)})
+        status = self.parse(await anext(chunks))
+        self.assertEqual(status['event'], 'status')
+        self.assertEqual(status['data']['graph'], {})
+        self.assertTrue(status['data']['dataset']['ready'])
+        await sync_to_async(ContainerEvents(self.container.pk).publish)(
+            CREATE_DATA_PREFIX, ENTER, timestamp=1)
+        chunk = await anext(chunks)
+        while chunk == b': keepalive\n\n':
+            chunk = await anext(chunks)
+        stage = self.parse(chunk)
+        self.assertEqual(stage['event'], 'stage')
+        self.assertEqual((stage['data']['stage'], stage['data']['state']),
+                         (CRAWL, PROGRESS))
+        self.assertEqual(stage['data']['time'], 1)
+        # the stream is closed after SSE_MAX_DURATION, and so is the pubsub.
+        with mock.patch('time.time',
+                        return_value=time.time() + config.SSE_MAX_DURATION), \
+                mock.patch.object(PubSub, 'aclose', autospec=True,
+                                  side_effect=PubSub.aclose) as aclose:
+            with self.assertRaises(StopAsyncIteration):
+                await anext(chunks)
+        aclose.assert_awaited_once()
+
+    @mock.patch.object(config, 'SSE_MAX_DURATION', 0)
+    async def test_keepalive(self):
+        resp, chunks = await self.events()
+        self.assertEqual([_ async for _ in chunks][2:], [b': keepalive\n\n'])
+
+    async def test_missing_container(self):
+        resp = await self.async_client.get('/container/0/events/')
+        self.assertEqual(resp.status_code, 404)
@@ -2,12 +2,21 @@
 
 from django.urls import path
 
-from . import views
+from . import async_views, views
+from rmxweb.config import ASYNC_VIEWS
+
+
+events = async_views.events if ASYNC_VIEWS else views.events
 
 
 urlpatterns = [
 
     path('', views.ContainerList.as_view()),
+    path('readiness/', views.ContainerReadiness.as_view(),
+         name='container-readiness'),
     path('<int:pk>/', views.ContainerRecord.as_view()),
+    path('<int:pk>/crawl/<str:jobid>/', views.CrawlJobRecord.as_view(),
+         name='crawl-job'),
+    path('<int:pk>/events/', events),
 
 ]
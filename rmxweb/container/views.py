@@ -1,15 +1,64 @@
-from django.http import Http404, HttpResponse
+import json
+
+from django.http import (
+    Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+)
+from django.urls import reverse
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from data.models import Data
 from .emit import crawl_async
 from .models import Container
+from metrics.crawl_job import CrawlJob, FAILED, LAUNCHED
+from metrics.eta import CRAWL, estimate
+from metrics.readiness import readiness
 from serialisers import SerialiserFactory
 from .serializers import ContainerSerializer
 from rmxweb import config
 
 
+def job_path(containerid: int = None, jobid: str = None) -> str:
+    """Returns the path of a crawl job resource."""
+    return reverse('crawl-job', kwargs={'pk': containerid, 'jobid': jobid})
+
+
+def sse(event: str = None, data: dict = None) -> str:
+    """Returns a server-sent event; without data, a comment that keeps the
+       connection alive.
+    """
+    if data is None:
+        return ': keepalive\n\n'
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def event_stream_response(content) -> StreamingHttpResponse:
+    """The response streaming the server-sent events of a container."""
+    resp = StreamingHttpResponse(content, content_type='text/event-stream')
+    resp['Cache-Control'] = 'no-cache'
+    # disabling the buffering of nginx
+    resp['X-Accel-Buffering'] = 'no'
+    return resp
+
+
+def events(request, pk):
+    """The events of a container are streamed by container.async_views.events
+       under ASGI only: under WSGI, a stream would hold a worker for up to
+       SSE_MAX_DURATION seconds. This returns 501 with the readiness endpoint
+       that the client polls instead.
+    :param request:
+    :param pk:
+    :return:
+    """
+    if not Container.objects.filter(pk=pk).exists():
+        raise Http404(pk)
+    return JsonResponse({
+        'detail': 'The event stream is served with ASYNC_VIEWS only; poll '
+                  'the readiness of the container.',
+        'readiness': f"{reverse('container-readiness')}?containerid={pk}",
+    }, status=501)
+
+
 class ContainerList(APIView):
 
     def get(self, request, format=None):
@@ -47,8 +96,9 @@ class ContainerList(APIView):
 
         container = Container.create(the_name=the_name)
         depth = config.DEFAULT_CRAWL_DEPTH if crawl else 0
-        crawlid = crawl_async(
+        jobid = crawl_async(
             url_list=url_list, container=container, depth=depth)
+        job_uri = job_path(container.pk, jobid)
         return Response({
             'task': {
                 'href': request.get_full_path(),
@@ -56,10 +106,93 @@ class ContainerList(APIView):
                 'job-status': "INPROGRESS",
                 'id': container.pk,
                 'parameters': {
-                    'crawlid': crawlid
-                }
+                    'jobid': jobid,
+                    'job': job_uri,
+                },
+                'eta': estimate(stage=CRAWL, containerid=container.pk)
             }
-        }, status=202)
+        }, status=202, headers={'Location': job_uri})
+
+
+class ContainerReadiness(APIView):
+    """
+    The readiness of many containers in one request: the dataset, the
+    integrity check, the dendrogram and, optionally, the matrices of feature
+    numbers. The metrics are read from redis in one round trip.
+    """
+
+    @staticmethod
+    def int_list(values) -> list:
+        """ Parses ints given as lists, or as comma separated strings. """
+        if isinstance(values, (str, int)):
+            values = [values]
+        return [
+            int(_) for value in values or ()
+            for _ in (value.split(',') if isinstance(value, str) else [value])
+            if _ != ''
+        ]
+
+    def get(self, request, **_):
+        """
+        Returns the readiness of the containers given as
+        `?containerid=1,2,3&features=10,20`; the feature numbers are checked
+        for every container.
+        :param request:
+        :return:
+        """
+        try:
+            containerids = self.int_list(request.GET.getlist('containerid'))
+            features = self.int_list(request.GET.getlist('features'))
+        except (ValueError, TypeError):
+            raise Http404(request.GET.dict())
+        return self.respond({_: features for _ in containerids})
+
+    def post(self, request, **_):
+        """
+        Returns the readiness of the containers given with their feature
+        numbers: {"containers": [{"containerid": 1, "features": [10, 20]}]}.
+        :param request:
+        :return:
+        """
+        try:
+            containers = {
+                int(_['containerid']): self.int_list(_.get('features'))
+                for _ in request.data['containers']
+            }
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise Http404(request.data)
+        return self.respond(containers)
+
+    @staticmethod
+    def respond(containers: dict = None):
+        """
+        :param containers: container ids to feature numbers
+        :return:
+        """
+        if not containers or len(containers) > config.READINESS_BATCH_LIMIT:
+            raise Http404({
+                'error': True,
+                'containers': len(containers),
+                'limit': config.READINESS_BATCH_LIMIT
+            })
+        existing = set(Container.objects.filter(
+            pk__in=list(containers)).values_list('pk', flat=True))
+        status = readiness(
+            {k: v for k, v in containers.items() if k in existing})
+        out = []
+        for containerid in containers:
+            if containerid not in existing:
+                out.append({'containerid': containerid, 'exists': False})
+                continue
+            item = status[containerid]
+            out.append({
+                'containerid': containerid,
+                'exists': True,
+                # ready as in ContainerRecord.get
+                'ready': bool(item['dataset'].get('ready')),
+                **item
+            })
+        return Response({'containers': out})
 
 
 class ContainerRecord(APIView):
@@ -94,7 +227,8 @@ class ContainerRecord(APIView):
                     'name': 'Container not ready.',
                     'job-state': "STARTED",
                     'job-status': "INPROGRESS",
-                    'summary': container_serializer.data
+                    'summary': container_serializer.data,
+                    'eta': container.dataset_eta()
                 }
             }, status=202)
 
@@ -131,6 +265,7 @@ class ContainerRecord(APIView):
             raise Http404(request.data)
         container = Container.get_object(pk=pk)
         resp = {}
+        headers = {}
         if the_name:
             container.name = the_name
             container.save()
@@ -140,18 +275,21 @@ class ContainerRecord(APIView):
             }
         if endpoint:
             depth = config.DEFAULT_CRAWL_DEPTH if crawl else 0
-            crawlid = crawl_async(
+            jobid = crawl_async(
                 url_list=[endpoint], container=container, depth=depth)
+            headers['Location'] = job_path(container.pk, jobid)
             resp = {
                 'task': {
                     'href': request.get_full_path(),
                     'id': container.pk,
                     'parameters': {
-                        'crawlid': crawlid,
-                    }
+                        'jobid': jobid,
+                        'job': headers['Location'],
+                    },
+                    'eta': estimate(stage=CRAWL, containerid=container.pk)
                 }
             }
-        return Response(resp, status=202)
+        return Response(resp, status=202, headers=headers)
 
     def delete(self, request, pk, format=None):
         """
@@ -170,3 +308,34 @@ class ContainerRecord(APIView):
                 'name': 'Container deleted.',
             }
         }, status=202)
+
+
+class CrawlJobRecord(APIView):
+
+    def get(self, request, pk, jobid, **_):
+        """
+        Returns a crawl job of a container. The job is in progress (202) until
+        scrasync returned the crawlid and the crawl is finished.
+        :param request:
+        :param pk:
+        :param jobid:
+        :return:
+        """
+        job = CrawlJob(jobid=jobid).get()
+        if not job or job['containerid'] != pk:
+            raise Http404(jobid)
+        if job['state'] == FAILED:
+            return Response({'job': job, 'job-status': 'FAILED'})
+        container = ContainerRecord.get_object(pk)
+        if job['state'] == LAUNCHED and container.dataset_is_ready():
+            return Response({'job': job, 'job-status': 'COMPLETED'})
+        return Response({
+            'task': {
+                '@uri': request.get_full_path(),
+                'id': pk,
+                'job-state': "STARTED",
+                'job-status': "INPROGRESS",
+                'job': job,
+                'eta': container.dataset_eta()
+            }
+        }, status=202)
@@ -0,0 +1,126 @@
+"""
+Content-addressed store for the texts of Data objects.
+
+Every text is saved once, under its hash (`hash_text`), in the blob folder.
+The files in the text folder of a container are hard links to these blobs, so
+nlp and rmxgrep read them as before. The number of hard links of a blob is its
+reference count; a blob is dropped when the last text file that links to it is
+removed.
+"""
+import hashlib
+import os
+import stat
+import tempfile
+import typing
+
+from rmxweb import config
+
+
+class BlobStore(object):
+
+    def __init__(self, root: str = config.BLOB_ROOT):
+        """
+        Instantiating the BlobStore.
+
+        :param root: the path to the directory that holds the blobs
+        """
+        self.root = os.path.abspath(os.path.normpath(root))
+
+    @staticmethod
+    def makedirs(path: str):
+        """ Creates a directory with permissions 'read, write, execute' to
+            user, group and other (777).
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
+            os.chmod(path, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)
+
+    def blob_path(self, hash_text: str = None) -> str:
+        """ Returns the path of the blob for a given hash. """
+        return os.path.join(
+            self.root, hash_text[:2], hash_text[2:4], hash_text)
+
+    def write(self, path: str = None, payload: bytes = None,
+              hash_text: str = None):
+        """
+        Writes a text to the store and links it to `path`. If a blob with the
+        same hash exists, the text file becomes a link to it and nothing else
+        is written.
+
+        :param path: the path of the text file in the container
+        :param payload: the encoded text
+        :param hash_text: the hash of the payload
+        """
+        tmp_dir = os.path.join(self.root, 'tmp')
+        self.makedirs(tmp_dir)
+        blob_path = self.blob_path(hash_text)
+        try:
+            os.link(blob_path, path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # hard links are not supported; the text is not deduplicated.
+            self.write_file(path, payload)
+            return
+        else:
+            return
+        _fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        with os.fdopen(_fd, 'wb') as _file:
+            _file.write(payload)
+        # permissions 'read, write, execute' to user, group, other (777)
+        os.chmod(tmp_path, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)
+        # the text file is linked before the blob is moved into place, so the
+        # blob never exists without a reference.
+        try:
+            os.link(tmp_path, path)
+        except OSError:
+            os.replace(tmp_path, path)
+            return
+        self.makedirs(os.path.dirname(blob_path))
+        os.replace(tmp_path, blob_path)
+
+    @staticmethod
+    def write_file(path: str = None, payload: bytes = None):
+        """ Writes a text to a file that is not linked to the store. """
+        with open(path, 'wb') as _file:
+            _file.write(payload)
+        # permissions 'read, write, execute' to user, group, other (777)
+        os.chmod(path, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)
+
+    def release(self, hash_text: str = None):
+        """
+        Drops the blob for a given hash if no text file links to it. This is
+        called after the text file has been removed.
+
+        :param hash_text:
+        """
+        if not hash_text:
+            return
+        blob_path = self.blob_path(hash_text)
+        try:
+            if os.stat(blob_path).st_nlink <= 1:
+                os.remove(blob_path)
+        except FileNotFoundError:
+            pass
+
+    def remove(self, path: str = None):
+        """
+        Removes a text file and drops its blob if no other text file links to
+        it. The blob is found by hashing the content of the file.
+
+        :param path:
+        """
+        with open(path, 'rb') as _file:
+            hash_text = hashlib.blake2b(
+                _file.read(), digest_size=config.DIGEST_SIZE).hexdigest()
+        os.remove(path)
+        self.release(hash_text)
+
+    def release_many(self, hashes: typing.Iterable[str] = None):
+        """
+        Drops the blobs that lost their last reference for a list of hashes.
+
+        :param hashes:
+        """
+        for hash_text in set(hashes):
+            self.release(hash_text)
@@ -0,0 +1,91 @@
+"""
+Bloom filter, saved in redis, for the canonical urls of a container. It tells
+whether a url is certainly new to the container; urls that may exist are
+checked against the database.
+
+The filter is built from the database by one worker (see rebuild) and can be
+used once the build is complete: urls added by other workers during the build
+don't make it usable.
+"""
+import hashlib
+import typing
+
+from metrics.redis import RedisConnect
+from rmxweb import config
+
+
+class UrlBloomFilter(object):
+
+    def __init__(self, containerid: int = None):
+        """
+        Instantiating the UrlBloomFilter.
+
+        :param containerid:
+        """
+        self.key = f'url_bloom_filter_containerid_{containerid}'
+        # set when the filter holds all the urls of the container
+        self.ready_key = f'{self.key}_ready'
+        self.rebuild_key = f'{self.key}_rebuild'
+        self.redis = RedisConnect().connection
+
+    @staticmethod
+    def positions(url: str) -> typing.List[int]:
+        """ Returns the bits set for a url (double hashing). """
+        digest = hashlib.blake2b(bytes(url, 'utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [
+            (h1 + i * h2) % config.BLOOM_FILTER_BITS
+            for i in range(config.BLOOM_FILTER_HASHES)
+        ]
+
+    def exists(self) -> bool:
+        """ Returns True if the filter has been built for the container. """
+        return bool(self.redis.exists(self.ready_key))
+
+    def rebuild(self, urls: typing.Callable[[], typing.Iterable[str]] = None
+                ) -> bool:
+        """
+        Builds the filter with the urls of the container, and marks it as
+        ready. Only one worker builds the filter at a time.
+
+        :param urls: returns the urls of the container
+        :return: False if the filter is being built by another worker
+        """
+        if not self.redis.set(self.rebuild_key, 1, nx=True,
+                              ex=config.BLOOM_FILTER_REBUILD_TIMEOUT):
+            return False
+        try:
+            self.add_many(urls())
+            self.redis.set(self.ready_key, 1)
+        finally:
+            self.redis.delete(self.rebuild_key)
+        return True
+
+    def add_many(self, urls: typing.Iterable[str] = None):
+        """ Adds urls to the filter. """
+        pipe = self.redis.pipeline(transaction=False)
+        for url in urls:
+            for pos in self.positions(url):
+                pipe.setbit(self.key, pos, 1)
+        pipe.execute()
+
+    def might_contain_many(
+            self, urls: typing.List[str] = None) -> typing.List[bool]:
+        """
+        Returns for every url False if it is certainly not in the filter and
+        True if it may be. All urls are looked up in one round trip.
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for url in urls:
+            for pos in self.positions(url):
+                pipe.getbit(self.key, pos)
+        bits = pipe.execute()
+        size = config.BLOOM_FILTER_HASHES
+        return [
+            all(bits[idx * size:(idx + 1) * size]) for idx in range(len(urls))
+        ]
+
+    def delete(self):
+        """ Deletes the filter. """
+        self.redis.delete(self.key, self.ready_key)
@@ -0,0 +1,102 @@
+"""
+Counts, per hostname in a container, the pages that contain every paragraph.
+Paragraphs that appear on most pages of a host (navigation, cookie banners,
+footers) are boilerplate and are dropped before the texts are written.
+"""
+import hashlib
+import re
+import typing
+
+from metrics.redis import RedisConnect
+from rmxweb import config
+
+SPACE_RE = re.compile(r'\s+', re.UNICODE)
+
+
+class BoilerplateFilter(object):
+
+    def __init__(self, containerid: int = None):
+        """
+        Instantiating the BoilerplateFilter. The counters of a container are
+        saved in a single redis hash, with fields prefixed by the hostname.
+
+        :param containerid:
+        """
+        self.key = f'boilerplate_containerid_{containerid}'
+        self.redis = RedisConnect().connection
+
+    @staticmethod
+    def digest(paragraph: str) -> str:
+        """ Returns the digest of a paragraph with normalised whitespace. """
+        return hashlib.blake2b(
+            bytes(SPACE_RE.sub(' ', paragraph).strip().lower(), 'utf-8'),
+            digest_size=8
+        ).hexdigest()
+
+    def strip(self, hostname: str = None,
+              data: typing.List[str] = None,
+              count: bool = True) -> typing.List[str]:
+        """
+        Registers the paragraphs of a page and returns the paragraphs that are
+        not boilerplate. Nothing is dropped before the host has
+        BOILERPLATE_MIN_PAGES pages in the container.
+
+        :param hostname:
+        :param data: the paragraphs of the page
+        :param count: False for pages that were already registered; the
+         counters are only read.
+        :return:
+        """
+        if not data:
+            return data
+        digests = [self.digest(_) for _ in data]
+        unique = list(dict.fromkeys(digests))
+        fields = [f'{hostname}:pages'] + [
+            f'{hostname}:{digest}' for digest in unique]
+        if count:
+            pipe = self.redis.pipeline(transaction=False)
+            for field in fields:
+                pipe.hincrby(self.key, field, 1)
+            counts = pipe.execute()
+        else:
+            counts = [int(_ or 0) for _ in self.redis.hmget(self.key, fields)]
+        pages = counts[0]
+        if pages < config.BOILERPLATE_MIN_PAGES:
+            return data
+        frequent = set(
+            digest for digest, count in zip(unique, counts[1:])
+            if count / pages > config.BOILERPLATE_FREQUENCY
+        )
+        return [
+            txt for txt, digest in zip(data, digests)
+            if digest not in frequent
+        ]
+
+    def delete(self):
+        """ Deletes the counters of the container. """
+        self.redis.delete(self.key)
+
+
+def truncate(data: typing.List[str] = None,
+             max_size: int = None) -> typing.List[str]:
+    """
+    Returns the paragraphs of a text that fit in max_size bytes (utf-8); the
+    paragraph that crosses the limit is cut.
+
+    :param data:
+    :param max_size:
+    :return:
+    """
+    out = []
+    size = 0
+    for txt in data or []:
+        length = len(txt.encode('utf-8')) + 2
+        if size + length > max_size:
+            rest = max_size - size - 2
+            if rest > 0:
+                out.append(
+                    txt.encode('utf-8')[:rest].decode('utf-8', 'ignore'))
+            break
+        out.append(txt)
+        size += length
+    return out
@@ -0,0 +1,44 @@
+"""
+Canonicalisation of urls. Urls that point to the same page are reduced to one
+form: lowercase scheme and hostname, no default port, no fragment, no tracking
+parameters and a sorted query string.
+"""
+import re
+import urllib.parse
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+TRACKING_PARAMS = re.compile(
+    r'^(utm_[a-z]+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|_ga)$',
+    re.IGNORECASE
+)
+
+
+def canonicalise(url: str = None) -> str:
+    """
+    Returns the canonical form of a url.
+
+    :param url:
+    :return:
+    """
+    if not url:
+        return url
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    netloc = parts.hostname or ''
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{netloc}:{parts.port}'
+    if parts.username:
+        userinfo = parts.username
+        if parts.password:
+            userinfo = f'{userinfo}:{parts.password}'
+        netloc = f'{userinfo}@{netloc}'
+
+    path = parts.path or '/'
+    query = urllib.parse.urlencode(sorted(
+        (k, v) for k, v in urllib.parse.parse_qsl(
+            parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(k)
+    ))
+    return urllib.parse.urlunsplit((scheme, netloc, path, query, ''))
@@ -0,0 +1,93 @@
+"""
+Zstandard compression of texts.
+
+The zstandard package is only required by containers that compress their
+texts. Compressed texts are zstd frames; these are recognised by their magic
+number, so plain and compressed texts can be read by the same code. A frame
+carries the id of the dictionary it was compressed with.
+"""
+import typing
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from rmxweb import config
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# dictionaries are loaded once per process; a dictionary id never changes.
+_DICTIONARIES = {}
+
+
+def require_zstandard():
+    """Raises if the zstandard package is not installed."""
+    if zstandard is None:
+        raise RuntimeError(
+            'The zstandard package is required to compress texts.')
+
+
+def is_compressed(payload: bytes) -> bool:
+    """Returns True if the payload is a zstd frame."""
+    return payload[:4] == ZSTD_MAGIC
+
+
+def get_dictionary(dict_id: int = None,
+                   load_dictionary: typing.Callable[[int], bytes] = None):
+    """
+    Returns the dictionary for its id, loaded once per process.
+
+    :param dict_id:
+    :param load_dictionary: returns the content of a dictionary for its id
+    :return:
+    """
+    if dict_id not in _DICTIONARIES:
+        _DICTIONARIES[dict_id] = zstandard.ZstdCompressionDict(
+            load_dictionary(dict_id))
+    return _DICTIONARIES[dict_id]
+
+
+def compress(payload: bytes, dict_id: int = None,
+             load_dictionary: typing.Callable[[int], bytes] = None) -> bytes:
+    """
+    Compresses a payload, with a dictionary if its id is given.
+
+    :param payload:
+    :param dict_id: the id of a trained dictionary
+    :param load_dictionary: returns the content of a dictionary for its id
+    :return:
+    """
+    require_zstandard()
+    zdict = get_dictionary(dict_id, load_dictionary) if dict_id else None
+    return zstandard.ZstdCompressor(
+        level=config.ZSTD_LEVEL, dict_data=zdict).compress(payload)
+
+
+def decompress(payload: bytes,
+               load_dictionary: typing.Callable[[int], bytes]) -> bytes:
+    """
+    Decompresses a zstd frame. The dictionary is retrieved from the id that
+    is saved in the frame.
+
+    :param payload:
+    :param load_dictionary: returns the content of a dictionary for its id
+    :return:
+    """
+    require_zstandard()
+    dict_id = zstandard.get_frame_parameters(payload).dict_id
+    zdict = get_dictionary(dict_id, load_dictionary) if dict_id else None
+    return zstandard.ZstdDecompressor(dict_data=zdict).decompress(payload)
+
+
+def train_dictionary(
+        samples: typing.List[bytes]) -> typing.Tuple[int, bytes]:
+    """
+    Trains a dictionary on a list of texts.
+
+    :param samples:
+    :return: the id and the content of the dictionary
+    """
+    require_zstandard()
+    zdict = zstandard.train_dictionary(config.ZSTD_DICT_SIZE, samples)
+    return zdict.dict_id(), zdict.as_bytes()
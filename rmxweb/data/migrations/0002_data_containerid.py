@@ -0,0 +1,28 @@
+# Generated by Django 4.0.4 on 2026-10-18 12:44
+
+from django.db import migrations, models
+from django.db.models.functions import Cast
+
+
+def copy_container_id(apps, schema_editor):
+    """Sets the containerid of existing Data objects from their container."""
+    Data = apps.get_model('data', 'Data')
+    Data.objects.update(
+        containerid=Cast('container_id', output_field=models.CharField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='data',
+            name='containerid',
+            field=models.CharField(default='', max_length=250),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_container_id, migrations.RunPython.noop),
+    ]
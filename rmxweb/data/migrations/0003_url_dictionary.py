@@ -0,0 +1,122 @@
+# Generated by Django 4.0.4 on 2026-10-18 12:44
+
+import hashlib
+import urllib.parse
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+# the links are processed in chunks of this size
+BATCH_SIZE = 500
+
+
+def url_hash(url: str) -> str:
+    """Same digest as data.models.Url.hash at the time of this migration."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(bytes(url, 'utf-8'))
+    return digest.hexdigest()
+
+
+def populate_url_dictionary(apps, schema_editor):
+    """Moves the urls and hostnames of existing links to the dictionary and
+       points every link to its Url object. The Url objects of a chunk of
+       links are looked up by their unique hash.
+    """
+    Host = apps.get_model('data', 'Host')
+    Url = apps.get_model('data', 'Url')
+    Link = apps.get_model('data', 'Link')
+
+    # a link without url can't point to the dictionary (target is required);
+    # these rows are deleted.
+    Link.objects.filter(url__isnull=True).delete()
+    last = 0
+    while True:
+        chunk = list(Link.objects.filter(pk__gt=last).order_by('pk').only(
+            'pk', 'url')[:BATCH_SIZE])
+        if not chunk:
+            break
+        last = chunk[-1].pk
+        hashes = {_.url: url_hash(_.url) for _ in chunk}
+        hostnames = {_: urllib.parse.urlparse(_).hostname for _ in hashes}
+        names = set(_ for _ in hostnames.values() if _)
+        Host.objects.bulk_create(
+            [Host(name=_) for _ in names], ignore_conflicts=True)
+        hosts = dict(
+            Host.objects.filter(name__in=names).values_list('name', 'pk'))
+        Url.objects.bulk_create(
+            [
+                Url(url=_, url_hash=digest, host_id=hosts.get(hostnames[_]))
+                for _, digest in hashes.items()
+            ],
+            ignore_conflicts=True
+        )
+        urls = dict(Url.objects.filter(
+            url_hash__in=hashes.values()).values_list('url_hash', 'pk'))
+        for link in chunk:
+            link.target_id = urls[hashes[link.url]]
+        Link.objects.bulk_update(chunk, ['target'], batch_size=BATCH_SIZE)
+
+
+def restore_link_urls(apps, schema_editor):
+    """Copies the urls and hostnames from the dictionary back to the links."""
+    Data = apps.get_model('data', 'Data')
+    Link = apps.get_model('data', 'Link')
+    Url = apps.get_model('data', 'Url')
+
+    for url in Url.objects.select_related('host').iterator():
+        Link.objects.filter(target=url).update(
+            url=url.url, hostname=url.host.name if url.host_id else None)
+    Link.objects.update(created=models.Subquery(
+        Data.objects.filter(
+            pk=models.OuterRef('data_id')).values('created')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0002_data_containerid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Host',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=500, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Url',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.TextField(validators=[django.core.validators.URLValidator()])),
+                ('url_hash', models.CharField(max_length=32, unique=True)),
+                ('host', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='data.host')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='link',
+            name='target',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='data.url'),
+        ),
+        migrations.RunPython(populate_url_dictionary, restore_link_urls),
+        migrations.RemoveField(
+            model_name='link',
+            name='created',
+        ),
+        migrations.RemoveField(
+            model_name='link',
+            name='hostname',
+        ),
+        migrations.RemoveField(
+            model_name='link',
+            name='url',
+        ),
+        migrations.AlterField(
+            model_name='link',
+            name='target',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='data.url'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.4 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0003_url_dictionary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='data',
+            name='pack_length',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='data',
+            name='pack_offset',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='data',
+            name='pack_segment',
+            field=models.IntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.0.4 on 2026-10-18 12:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('container', '0003_compressed'),
+        ('data', '0004_pack_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextDictionary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('dict_id', models.BigIntegerField(db_index=True)),
+                ('content', models.BinaryField()),
+                ('container', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='container.container')),
+            ],
+        ),
+    ]
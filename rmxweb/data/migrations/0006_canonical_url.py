@@ -0,0 +1,117 @@
+# Generated by Django 4.0.4 on 2026-10-18 12:50
+
+import hashlib
+import re
+import urllib.parse
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# the data objects are processed in chunks of this size
+BATCH_SIZE = 500
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+TRACKING_PARAMS = re.compile(
+    r'^(utm_[a-z]+|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|_ga)$',
+    re.IGNORECASE
+)
+
+
+def canonicalise(url: str = None) -> str:
+    """Same form as data.canonical.canonicalise at the time of this
+       migration.
+    """
+    if not url:
+        return url
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    netloc = parts.hostname or ''
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{netloc}:{parts.port}'
+    if parts.username:
+        userinfo = parts.username
+        if parts.password:
+            userinfo = f'{userinfo}:{parts.password}'
+        netloc = f'{userinfo}@{netloc}'
+
+    path = parts.path or '/'
+    query = urllib.parse.urlencode(sorted(
+        (k, v) for k, v in urllib.parse.parse_qsl(
+            parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(k)
+    ))
+    return urllib.parse.urlunsplit((scheme, netloc, path, query, ''))
+
+
+def url_hash(url: str) -> str:
+    """Same digest as data.models.Url.hash at the time of this migration."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(bytes(url, 'utf-8'))
+    return digest.hexdigest()
+
+
+def populate_canonical_urls(apps, schema_editor):
+    """Sets the canonical url of existing Data objects. When a container holds
+       the same canonical url more than once, only the oldest object gets it.
+    """
+    Data = apps.get_model('data', 'Data')
+    Host = apps.get_model('data', 'Host')
+    Url = apps.get_model('data', 'Url')
+
+    seen = set()
+    rows = list(Data.objects.filter(url__isnull=False).order_by(
+        'pk').values_list('pk', 'container_id', 'url'))
+    for idx in range(0, len(rows), BATCH_SIZE):
+        chunk = []
+        for pk, container_id, url in rows[idx:idx + BATCH_SIZE]:
+            canonical = canonicalise(url)
+            if not canonical or (container_id, canonical) in seen:
+                continue
+            seen.add((container_id, canonical))
+            chunk.append((pk, canonical))
+        hostnames = {
+            _: urllib.parse.urlparse(_).hostname for _ in set(
+                canonical for _, canonical in chunk)
+        }
+        names = set(_ for _ in hostnames.values() if _)
+        Host.objects.bulk_create(
+            [Host(name=_) for _ in names], ignore_conflicts=True)
+        hosts = dict(
+            Host.objects.filter(name__in=names).values_list('name', 'pk'))
+        Url.objects.bulk_create(
+            [
+                Url(url=_, url_hash=url_hash(_),
+                    host_id=hosts.get(hostnames[_]))
+                for _ in hostnames
+            ],
+            ignore_conflicts=True
+        )
+        urls = dict(Url.objects.filter(
+            url_hash__in=[url_hash(_) for _ in hostnames]
+        ).values_list('url', 'pk'))
+        for pk, canonical in chunk:
+            Data.objects.filter(pk=pk).update(canonical_url_id=urls[canonical])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('container', '0003_compressed'),
+        ('data', '0005_textdictionary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='data',
+            name='canonical_url',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='data.url'),
+        ),
+        migrations.RunPython(
+            populate_canonical_urls, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='data',
+            constraint=models.UniqueConstraint(fields=('container', 'canonical_url'), name='unique_canonical_url_in_container'),
+        ),
+    ]
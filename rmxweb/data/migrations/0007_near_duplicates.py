@@ -0,0 +1,61 @@
+# Generated by Django 4.0.4 on 2026-10-18 12:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('container', '0003_compressed'),
+        ('data', '0006_canonical_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='data',
+            name='duplicate_of',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='near_duplicates', to='data.data'),
+        ),
+        migrations.AddField(
+            model_name='data',
+            name='simhash',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='data',
+            name='simhash_band_0',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='data',
+            name='simhash_band_1',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='data',
+            name='simhash_band_2',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='data',
+            name='simhash_band_3',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='data',
+            index=models.Index(fields=['container', 'simhash_band_0'], name='data_simhash_band_0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='data',
+            index=models.Index(fields=['container', 'simhash_band_1'], name='data_simhash_band_1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='data',
+            index=models.Index(fields=['container', 'simhash_band_2'], name='data_simhash_band_2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='data',
+            index=models.Index(fields=['container', 'simhash_band_3'], name='data_simhash_band_3_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.0.4 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('container', '0005_verified_generation'),
+        ('data', '0007_near_duplicates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='data',
+            name='text_size',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.CreateModel(
+            name='ManifestChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('file_id', models.UUIDField()),
+                ('hash_text', models.CharField(blank=True, max_length=128, null=True)),
+                ('size', models.IntegerField(null=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('container', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='container.container')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['container', 'id'], name='manifest_container_id_idx')],
+            },
+        ),
+    ]
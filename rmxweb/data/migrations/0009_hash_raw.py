@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0008_manifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='data',
+            name='hash_raw',
+            field=models.CharField(blank=True, max_length=128, null=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.0.4 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+def set_generations(apps, schema_editor):
+    """
+    The generation of the existing changes is their pk, as before; the
+    counter of every container starts after its last generation.
+    """
+    Container = apps.get_model('container', 'Container')
+    ManifestChange = apps.get_model('data', 'ManifestChange')
+    ManifestChange.objects.update(generation=models.F('id'))
+    last = ManifestChange.objects.values('container').annotate(
+        generation=models.Max('id')).values_list('container', 'generation')
+    for containerid, generation in last:
+        Container.objects.filter(pk=containerid).update(
+            manifest_generation=generation)
+    Container.objects.filter(
+        manifest_generation__lt=models.F('verified_generation')
+    ).update(manifest_generation=models.F('verified_generation'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('container', '0006_manifest_generation'),
+        ('data', '0009_hash_raw'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manifestchange',
+            name='generation',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(set_generations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='manifestchange',
+            name='generation',
+            field=models.BigIntegerField(),
+        ),
+        migrations.RemoveIndex(
+            model_name='manifestchange',
+            name='manifest_container_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='manifestchange',
+            index=models.Index(fields=['container', 'generation'], name='manifest_container_gen_idx'),
+        ),
+    ]
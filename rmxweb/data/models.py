@@ -1,17 +1,29 @@
 """ Models for the Data Objects. """
 
 import hashlib
+import io
 import os
-import stat
+import time
 import typing
 import urllib.parse
 import uuid
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Max, Q, Sum
 from django.core import validators
+from . import compression
+from . import simhash as signatures
+from .blob import BlobStore
+from .boilerplate import BoilerplateFilter, truncate
+from .bloom import UrlBloomFilter
+from .canonical import canonicalise
 from .errors import DuplicateUrlError
+from .orphans import OrphanedFiles
+from .pack import PackStore
 from container.models import Container
+from metrics.redis import RedisConnect
 from rmxweb import config
+from rmxweb.celery import celery
 
 
 class Data(models.Model):
@@ -26,6 +38,9 @@ class Data(models.Model):
 
     url = models.TextField(validators=[validators.URLValidator()], null=True)
     hostname = models.CharField(max_length=500, null=True)
+    # the canonical form of the url; it is unique in a container.
+    canonical_url = models.ForeignKey(
+        'Url', on_delete=models.PROTECT, null=True, related_name='+')
 
     # if True the data object is a crawl seed
     seed = models.BooleanField(default=False)
@@ -37,6 +52,30 @@ class Data(models.Model):
 
     hash_text = models.CharField(
         max_length=config.HEXDIGEST_SIZE, blank=True, null=True)
+    # the hash of the text as it was crawled, before the boilerplate is
+    # dropped; re-crawls of a page are compared with it.
+    hash_raw = models.CharField(
+        max_length=config.HEXDIGEST_SIZE, blank=True, null=True)
+    # the size in bytes of the text before compression
+    text_size = models.IntegerField(null=True)
+
+    # the location of the text in the pack files of the container; these are
+    # only set for containers that use the pack storage.
+    pack_segment = models.IntegerField(null=True)
+    pack_offset = models.BigIntegerField(null=True)
+    pack_length = models.IntegerField(null=True)
+
+    # the simhash of the text and its bands; the bands are indexed to look up
+    # the near-duplicates of a text in the container.
+    simhash = models.BigIntegerField(null=True)
+    simhash_band_0 = models.IntegerField(null=True)
+    simhash_band_1 = models.IntegerField(null=True)
+    simhash_band_2 = models.IntegerField(null=True)
+    simhash_band_3 = models.IntegerField(null=True)
+    # the page that this page is a near-duplicate of.
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True,
+        related_name='near_duplicates')
 
     # todo(): review the link field.
     # links = UrlListField()
@@ -45,6 +84,20 @@ class Data(models.Model):
     # text_url = models.TextField()
     # checked = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['container', 'canonical_url'],
+                name='unique_canonical_url_in_container'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['container', f'simhash_band_{idx}'],
+                name=f'data_simhash_band_{idx}_idx'
+            ) for idx in range(signatures.BANDS)
+        ]
+
     @classmethod
     def get_object(cls, pk: int = None):
         """Retrieves an object for a given pk."""
@@ -57,50 +110,483 @@ class Data(models.Model):
         return obj
 
     @classmethod
-    def create(
+    def instantiate(
             cls,
-            data: (str, list,) = None,
+            container: Container = None,
             containerid: int = None,
-            links: list = None,
             title: str = None,
             endpoint: str = None,
-            seed: bool = False):
+            seed: bool = False,
+            canonical_url: 'Url' = None):
         """
-        Create and save a Data object with all the urls that make it.
+        Returns an unsaved Data object with its file path set.
 
-        :param data:
+        :param container:
         :param containerid:
-        :param links:
         :param title:
         :param endpoint:
         :param seed:
+        :param canonical_url:
         :return:
         """
-        container_obj = Container.get_object(containerid)
         url_parse = urllib.parse.urlparse(endpoint)
         obj = cls(title=title,
-                  container=container_obj,
+                  container=container,
                   containerid=containerid,
                   url=endpoint,
+                  canonical_url=canonical_url,
                   seed=seed,
                   hostname=url_parse.hostname)
+        if container.storage != config.STORAGE_PACK:
+            obj.file_path = obj.get_file_path(container=container)
+        return obj
+
+    @classmethod
+    def find_duplicates(
+            cls,
+            container: Container = None,
+            urls: typing.List[str] = None) -> typing.Dict[str, 'Data']:
+        """
+        Returns a mapping between the canonical urls that already exist in a
+        container and their Data objects. The urls that the bloom filter of
+        the container doesn't know are new; the others are looked up in the
+        database. All the urls are looked up in the database while the filter
+        is being built by another worker.
+
+        :param container:
+        :param urls: canonical urls
+        :return:
+        """
+        urls = [_ for _ in urls if _]
+        if not urls:
+            return {}
+        bloom = UrlBloomFilter(containerid=container.pk)
+        if bloom.exists() or bloom.rebuild(
+                lambda: cls.objects.filter(
+                    container=container, canonical_url__isnull=False
+                ).values_list('canonical_url__url', flat=True).iterator()):
+            maybe = [
+                url for url, found in zip(
+                    urls, bloom.might_contain_many(urls))
+                if found
+            ]
+        else:
+            maybe = urls
+        if not maybe:
+            return {}
+        hashes = {Url.hash(_): _ for _ in maybe}
+        return {
+            hashes[_.canonical_url.url_hash]: _ for _ in cls.objects.filter(
+                container=container, canonical_url__url_hash__in=hashes
+            ).select_related('canonical_url')
+        }
+
+    @classmethod
+    def find_near_duplicates(
+            cls,
+            container: Container = None,
+            simhashes: typing.List[int] = None,
+            exclude: typing.List[int] = None) -> typing.List[int]:
+        """
+        Returns for every simhash the pk of the closest page of the container
+        that is a near-duplicate, or None. Candidates share at least one band
+        with the simhash; only pages that are not themselves near-duplicates
+        are returned, so that every cluster has one original.
+
+        :param container:
+        :param simhashes:
+        :param exclude: the pks of pages that are not candidates
+        :return:
+        """
+        out = [None] * len(simhashes)
+        lookup = Q()
+        for value in simhashes:
+            if value is None:
+                continue
+            for idx, band in enumerate(signatures.bands(value)):
+                lookup |= Q(**{f'simhash_band_{idx}': band})
+        if not lookup:
+            return out
+        candidates = list(cls.objects.filter(
+            lookup, container=container, duplicate_of__isnull=True
+        ).exclude(pk__in=exclude or []).values_list('pk', 'simhash'))
+        for idx, value in enumerate(simhashes):
+            if value is None:
+                continue
+            out[idx] = cls.nearest(value, candidates)
+        return out
+
+    @staticmethod
+    def nearest(value: int, candidates: typing.Iterable[tuple]):
+        """
+        Returns the key of the candidate closest to a simhash within the
+        near-duplicate distance, or None.
+        :param value:
+        :param candidates: (key, simhash) tuples
+        :return:
+        """
+        best = None
+        for key, other in candidates:
+            dist = signatures.distance(value, other)
+            if dist <= config.NEAR_DUPLICATE_DISTANCE and (
+                    best is None or dist < best[0]):
+                best = (dist, key)
+        return best[1] if best else None
+
+    def set_simhash(self, value: int = None):
+        """Sets the simhash of the object and its bands."""
+        self.simhash = value
+        values = signatures.bands(value) if value is not None else [
+            None] * signatures.BANDS
+        for idx, band in enumerate(values):
+            setattr(self, f'simhash_band_{idx}', band)
+
+    @classmethod
+    def duplicate_clusters(cls, containerid: int = None):
+        """
+        Returns the near-duplicate pages of a container ordered by the page
+        they duplicate.
+        :param containerid:
+        :return:
+        """
+        return cls.objects.filter(
+            container__pk=containerid, duplicate_of__isnull=False
+        ).select_related('duplicate_of').order_by('duplicate_of_id', 'pk')
+
+    @staticmethod
+    def clean_text(boilerplate: BoilerplateFilter = None,
+                   endpoint: str = None,
+                   data: typing.List[str] = None,
+                   count: bool = True) -> typing.List[str]:
+        """
+        Returns the paragraphs of a page without the boilerplate of its host,
+        cut to DOCUMENT_MAX_SIZE.
+        :param boilerplate:
+        :param endpoint:
+        :param data:
+        :param count: False for pages that are stored in the container; these
+         are not counted again by the boilerplate filter.
+        :return:
+        """
+        hostname = urllib.parse.urlparse(endpoint).hostname
+        return truncate(
+            boilerplate.strip(
+                hostname=hostname, data=list(data or []), count=count),
+            max_size=config.DOCUMENT_MAX_SIZE
+        )
+
+    @classmethod
+    def hash_raw_text(cls, data: (str, list,) = None) -> str:
+        """ Returns the hash of a text as it was crawled. """
+        return cls.encode_text(list(data or []))[1]
+
+    @classmethod
+    def create(
+            cls,
+            data: (str, list,) = None,
+            containerid: int = None,
+            links: list = None,
+            title: str = None,
+            endpoint: str = None,
+            seed: bool = False):
+        """
+        Create and save a Data object with all the urls that make it. The
+        boilerplate paragraphs of the host are dropped from the text first.
 
-        file_path = obj.get_file_path(container=container_obj)
-        obj.file_path = file_path
+        If the canonical url of the endpoint exists in the container, the
+        existing object is returned; its text, title and links are replaced
+        only if the crawled text changed. Near-duplicates of the pages in the
+        container are flagged or skipped, depending on NEAR_DUPLICATE_ACTION.
+
+        :param data:
+        :param containerid:
+        :param links:
+        :param title:
+        :param endpoint:
+        :param seed:
+        :return:
+        """
+        container_obj = Container.get_object(containerid)
+        canonical = canonicalise(endpoint)
+        hash_raw = cls.hash_raw_text(data)
+        boilerplate = BoilerplateFilter(containerid=container_obj.pk)
+        existing = cls.find_duplicates(container_obj, [canonical])
+        if canonical in existing:
+            obj = existing[canonical]
+            if obj.hash_raw == hash_raw:
+                return obj
+            data = cls.clean_text(boilerplate, endpoint, data, count=False)
+            if obj.refresh(data=data, hash_raw=hash_raw,
+                           simhash=signatures.simhash(data), title=title,
+                           links=links, seed=seed, container=container_obj):
+                container_obj.mark_stale()
+                cls.schedule_compaction(container_obj)
+            return obj
+        data = cls.clean_text(boilerplate, endpoint, data)
+        simhash = signatures.simhash(data)
+        original = cls.find_near_duplicates(container_obj, [simhash])[0]
+        if original and config.NEAR_DUPLICATE_ACTION == \
+                config.NEAR_DUPLICATE_SKIP:
+            return None
+        obj = cls.instantiate(container=container_obj,
+                              containerid=containerid,
+                              title=title,
+                              endpoint=endpoint,
+                              seed=seed,
+                              canonical_url=Url.get_many(
+                                  [canonical]).get(canonical))
+        obj.set_simhash(simhash)
+        obj.duplicate_of_id = original
+        obj.hash_raw = hash_raw
         try:
-            hash_text = obj.write_data_to_file(
-                path=file_path,
-                data=data
-            )
+            hash_text = obj.write_text(data=data, container=container_obj)
         except DuplicateUrlError as _:
             return None
         else:
             obj.hash_text = hash_text
-        obj.save()
-        for item in links:
-            Link.create(url=item, data=obj)
+        try:
+            with transaction.atomic():
+                obj.save()
+                Link.create_many([(obj, item) for item in links or []])
+                ManifestChange.record(container_obj, [obj])
+        except IntegrityError as _:
+            # the url was saved by another worker in the meantime.
+            obj.discard_text()
+            return None
+        container_obj.mark_stale()
+        if canonical:
+            UrlBloomFilter(containerid=container_obj.pk).add_many([canonical])
+        if container_obj.compressed:
+            TextDictionary.schedule_training(container_obj)
         return obj
 
+    @classmethod
+    def create_many(
+            cls,
+            containerid: int = None,
+            pages: typing.List[dict] = None) -> typing.List['Data']:
+        """
+        Create and save Data objects for a batch of web pages. The texts are
+        written to disk first, then all the Data and Link rows are inserted
+        with bulk_create inside one transaction. The boilerplate paragraphs of
+        every host are dropped from the texts first.
+
+        Pages whose canonical url exists in the container are refreshed as in
+        `create`; pages whose canonical url appears earlier in the batch are
+        skipped. Near-duplicates of the pages in the container or earlier in
+        the batch are flagged or skipped, depending on NEAR_DUPLICATE_ACTION.
+
+        Every page is a dict holding the parameters of `create`: data, links,
+        title, endpoint and seed.
+
+        :param containerid:
+        :param pages:
+        :return: a list that matches `pages`; None for every page that was
+         not saved.
+        """
+        container_obj = Container.get_object(containerid)
+        canonicals = [canonicalise(_.get('endpoint')) for _ in pages]
+        existing = cls.find_duplicates(container_obj, canonicals)
+        urls = Url.get_many(_ for _ in canonicals if _ not in existing)
+        boilerplate = BoilerplateFilter(containerid=container_obj.pk)
+        hashes_raw = [cls.hash_raw_text(_.get('data')) for _ in pages]
+        # the texts of pages that are unchanged or repeated in the batch are
+        # not cleaned, so that the boilerplate filter counts every page once.
+        texts = []
+        seen = set()
+        for page, canonical, hash_raw in zip(pages, canonicals, hashes_raw):
+            if canonical in seen or (
+                    canonical in existing and
+                    existing[canonical].hash_raw == hash_raw):
+                texts.append(None)
+                continue
+            if canonical:
+                seen.add(canonical)
+            texts.append(cls.clean_text(
+                boilerplate, page.get('endpoint'), page.get('data'),
+                count=canonical not in existing))
+        simhashes = [
+            None if _ is None else signatures.simhash(_) for _ in texts]
+        originals = cls.find_near_duplicates(container_obj, [
+            None if canonical in existing else simhash
+            for canonical, simhash in zip(canonicals, simhashes)
+        ])
+        skip_near = config.NEAR_DUPLICATE_ACTION == config.NEAR_DUPLICATE_SKIP
+        out = []
+        saved = []
+        seen = set()
+        changed = False
+        # near-duplicates of pages of this batch; these are linked once the
+        # pages are saved.
+        batch_originals = []
+        in_batch = []
+        for page, canonical, hash_raw, text, simhash, original in zip(
+                pages, canonicals, hashes_raw, texts, simhashes, originals):
+            if canonical in seen:
+                out.append(None)
+                continue
+            if canonical:
+                seen.add(canonical)
+            if canonical in existing:
+                obj = existing[canonical]
+                if text is not None and obj.refresh(
+                        data=text,
+                        hash_raw=hash_raw,
+                        simhash=simhash,
+                        title=page.get('title'),
+                        links=page.get('links'),
+                        seed=page.get('seed', False),
+                        container=container_obj):
+                    changed = True
+                out.append(obj)
+                continue
+            batch_original = None
+            if not original and simhash is not None:
+                batch_original = cls.nearest(simhash, in_batch)
+            if skip_near and (original or batch_original):
+                out.append(None)
+                continue
+            obj = cls.instantiate(container=container_obj,
+                                  containerid=containerid,
+                                  title=page.get('title'),
+                                  endpoint=page.get('endpoint'),
+                                  seed=page.get('seed', False),
+                                  canonical_url=urls.get(canonical))
+            obj.set_simhash(simhash)
+            obj.duplicate_of_id = original
+            obj.hash_raw = hash_raw
+            try:
+                obj.hash_text = obj.write_text(
+                    data=text, container=container_obj)
+            except DuplicateUrlError as _:
+                out.append(None)
+                continue
+            if batch_original:
+                batch_originals.append((len(out), obj, batch_original))
+            elif not original and simhash is not None:
+                in_batch.append((obj, simhash))
+            saved.append((len(out), obj, page.get('links') or []))
+            out.append(obj)
+        if changed:
+            container_obj.mark_stale()
+            cls.schedule_compaction(container_obj)
+        if not saved:
+            return out
+        try:
+            with transaction.atomic():
+                objs = cls.objects.bulk_create(
+                    [_[1] for _ in saved],
+                    batch_size=config.BULK_CREATE_BATCH_SIZE
+                )
+                if any(_.pk is None for _ in objs):
+                    # the database backend doesn't return primary keys.
+                    pks = dict(cls.objects.filter(
+                        file_id__in=[_.file_id for _ in objs]
+                    ).values_list('file_id', 'pk'))
+                    for obj in objs:
+                        obj.pk = pks[obj.file_id]
+                Link.create_many(
+                    [(obj, url) for _, obj, links in saved for url in links]
+                )
+                ManifestChange.record(container_obj, objs)
+        except IntegrityError as _:
+            # urls of this batch were saved by another worker in the
+            # meantime; the pages are saved one by one.
+            for idx, obj, links in saved:
+                obj.pk = None
+                obj._state.adding = True
+                try:
+                    with transaction.atomic():
+                        obj.save()
+                        Link.create_many([(obj, url) for url in links])
+                        ManifestChange.record(container_obj, [obj])
+                except IntegrityError as _:
+                    obj.discard_text()
+                    out[idx] = None
+        except Exception as _:
+            for _idx, obj, _links in saved:
+                obj.discard_text()
+            raise
+        flagged = []
+        for idx, obj, original in batch_originals:
+            if out[idx] and original.pk is not None:
+                obj.duplicate_of = original
+                flagged.append(obj)
+        if flagged:
+            cls.objects.bulk_update(
+                flagged, ['duplicate_of'],
+                batch_size=config.BULK_CREATE_BATCH_SIZE)
+        if any(out[idx] for idx, _, _ in saved):
+            container_obj.mark_stale()
+        UrlBloomFilter(containerid=container_obj.pk).add_many(
+            out[idx].canonical_url.url for idx, _, _ in saved
+            if out[idx] and out[idx].canonical_url
+        )
+        if container_obj.compressed:
+            TextDictionary.schedule_training(container_obj)
+        return out
+
+    def refresh(
+            self,
+            data: typing.List[str] = None,
+            hash_raw: str = None,
+            simhash: int = None,
+            title: str = None,
+            links: list = None,
+            seed: bool = False,
+            container: Container = None) -> bool:
+        """
+        Refreshes a page that was crawled again. Nothing is written if the
+        hash of the crawled text, or of the cleaned text, is unchanged;
+        otherwise the text, title, links and simhash of the object are
+        replaced in place.
+
+        :param data: the cleaned text
+        :param hash_raw: the hash of the text as it was crawled
+        :param simhash:
+        :param title:
+        :param links:
+        :param seed:
+        :param container:
+        :return: True if the page changed
+        """
+        if hash_raw and hash_raw == self.hash_raw:
+            return False
+        if self.encode_text(data)[1] == self.hash_text:
+            if hash_raw != self.hash_raw:
+                self.hash_raw = hash_raw
+                self.save(update_fields=['hash_raw'])
+            return False
+        if self.file_path:
+            # the new text is written next to the old one and renamed over
+            # it; the old text is kept if the write fails.
+            tmp_path = f'{self.file_path}.{uuid.uuid4().hex}'
+            try:
+                hash_text = self.write_text(
+                    data=data, container=container, path=tmp_path)
+                os.replace(tmp_path, self.file_path)
+            except Exception as _:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                    BlobStore().release(self.encode_text(data)[1])
+                raise
+            BlobStore().release(self.hash_text)
+            self.hash_text = hash_text
+        else:
+            self.hash_text = self.write_text(data=data, container=container)
+        self.hash_raw = hash_raw
+        self.title = title
+        self.seed = self.seed or seed
+        self.set_simhash(simhash)
+        self.duplicate_of_id = self.find_near_duplicates(
+            container, [simhash], exclude=[self.pk])[0]
+        with transaction.atomic():
+            self.save()
+            self.link_set.all().delete()
+            Link.create_many([(self, item) for item in links or []])
+            ManifestChange.record(container, [self])
+        return True
+
     @classmethod
     def filter_seed_data(cls, cids: typing.List[int]):
         """
@@ -123,53 +609,244 @@ class Data(models.Model):
             os.path.join(container.container_path(), self.dataid)
         )
 
-    def write_data_to_file(self, path, data) -> (str, str):
-        """ Writing data into a file in the container folder. """
+    @staticmethod
+    def encode_text(data) -> typing.Tuple[bytes, str]:
+        """ Returns the payload that is written for a text and its hash. """
+        payload = ''.join(f'{txt}\n\n' for txt in data).encode('utf-8')
+        return payload, hashlib.blake2b(
+            payload, digest_size=config.DIGEST_SIZE).hexdigest()
+
+    def write_text(self, data, container: Container = None,
+                   path: str = None) -> str:
+        """ Writing the text to the storage used by the container; files are
+            written to `path` when given, otherwise to file_path.
+            Returns the hash of the text.
+        """
+        payload, hash_text = self.encode_text(data)
+        self.text_size = len(payload)
+        if container.compressed:
+            payload = TextDictionary.compress(payload, container=container)
+        if container.storage == config.STORAGE_PACK:
+            self.write_data_to_pack(payload=payload, container=container)
+        else:
+            self.write_data_to_file(path=path or self.file_path,
+                                    payload=payload, hash_text=hash_text)
+        return hash_text
+
+    def write_data_to_pack(self, payload: bytes, container: Container = None):
+        """ Appending data to the pack files of the container. """
+        self.pack_segment, self.pack_offset, self.pack_length = PackStore(
+            container.pack_path).append(payload)
+
+    def write_data_to_file(self, path, payload: bytes, hash_text: str = None):
+        """ Writing data into a file in the container folder. Plain texts are
+            saved in the blob store and the file links to it; compressed texts
+            are written to the file.
+        """
 
         if os.path.isfile(path):
             raise DuplicateUrlError(path)
-        self.save()
-        hash = hashlib.blake2b(digest_size=config.DIGEST_SIZE)
-
-        with open(path, 'a+') as _file:
-            for txt in data:
-                hash.update(bytes(txt, 'utf-8'))
-                _file.write(txt)
-                _file.write('\n\n')
-        # permissions 'read, write, execute' to user, group, other (777)
-        os.chmod(path, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)
-        return hash.hexdigest()
+        if compression.is_compressed(payload):
+            BlobStore.write_file(path=path, payload=payload)
+        else:
+            BlobStore().write(path=path, payload=payload, hash_text=hash_text)
+
+    def discard_text(self):
+        """ Removes the text of an object that could not be saved. Texts
+            appended to pack files are left to the compaction.
+        """
+        if self.file_path and os.path.exists(self.file_path):
+            os.remove(self.file_path)
+            BlobStore().release(self.hash_text)
 
     def get_all_links(self):
         """Returns all the links for a given container id."""
-        return self.link_set.all()
+        return self.link_set.select_related('data', 'target__host')
 
     def get_text(self):
         """Retrieves the text from the file save don disk.
         :return:
         """
-        out = []
-        with open(self.get_file_path(), 'r') as _file:
-            for line in _file.readlines():
-                out.append(line)
-        return out
+        if self.pack_segment is not None:
+            payload = self.read_from_pack()
+        else:
+            with open(self.get_file_path(), 'rb') as _file:
+                payload = _file.read()
+        return self.decode_text(payload)
+
+    @staticmethod
+    def decode_text(payload: bytes):
+        """Returns the lines of a stored text; compressed texts are
+           decompressed.
+        :param payload:
+        :return:
+        """
+        if compression.is_compressed(payload):
+            payload = compression.decompress(
+                payload, TextDictionary.get_content)
+        return io.TextIOWrapper(
+            io.BytesIO(payload), encoding='utf-8').readlines()
+
+    def read_from_pack(self) -> bytes:
+        """Reads the text from the pack files of the container. The index is
+           reloaded once if the segment was removed by a compaction.
+        :return:
+        """
+        store = PackStore(self.container.pack_path)
+        try:
+            return store.read(
+                self.pack_segment, self.pack_offset, self.pack_length)
+        except FileNotFoundError:
+            self.refresh_from_db(
+                fields=['pack_segment', 'pack_offset', 'pack_length'])
+            return store.read(
+                self.pack_segment, self.pack_offset, self.pack_length)
 
     @classmethod
-    def delete_many(cls, data_ids: typing.List[int], containerid: int = None):
+    def delete_many(cls, data_ids: typing.List[int], containerid: int = None,
+                    link=None):
         """
         Delete many objects for a given containerid and a list of data ids.
+        The rows are deleted with one query and their texts are removed right
+        after; the garbage collector is sent for the files that no row owns.
         :param data_ids:
         :param containerid:
+        :param link: a signature called when the texts are removed
         :return:
         """
         container = Container.get_object(pk=containerid)
-        for obj in cls.objects.filter(pk__in=data_ids):
-            if container != obj.container:
-                continue
-            _path = obj.file_path
-            if os.path.exists(_path):
-                os.remove(_path)
-            obj.delete()
+        queryset = cls.objects.filter(container=container, pk__in=data_ids)
+        with transaction.atomic():
+            ManifestChange.record(
+                container, queryset.only('file_id', 'hash_text', 'text_size'),
+                deleted=True
+            )
+            texts = list(queryset.values_list('file_id', 'hash_text'))
+            deleted, _ = queryset.delete()
+        if deleted:
+            container.mark_stale()
+        path = container.container_path()
+        if path:
+            for file_id, _ in texts:
+                try:
+                    os.remove(os.path.join(path, file_id.hex))
+                except FileNotFoundError:
+                    pass
+            BlobStore().release_many(
+                hash_text for _, hash_text in texts if hash_text)
+        if link:
+            link.apply_async()
+        celery.send_task(
+            config.RMXWEB_TASKS['collect_garbage'],
+            kwargs={'containerid': container.pk}
+        )
+
+    @classmethod
+    def collect_garbage(cls, containerid: int = None) -> bool:
+        """
+        Removes the files of the text folder of a container that don't belong
+        to a Data object, and drops their blobs when unreferenced; the texts
+        of deleted objects are removed by delete_many. Files are removed
+        GC_GRACE seconds after a run first found them orphaned, as their
+        objects may not be committed yet (see OrphanedFiles). The pack files
+        of the container are compacted.
+        :param containerid:
+        :return: True if orphaned files were kept for a later run
+        """
+        container = Container.objects.filter(pk=containerid).first()
+        if not container:
+            return False
+        pending = False
+        path = container.container_path()
+        if path:
+            blob_store = BlobStore()
+            live = set(
+                _.hex for _ in container.data_set.values_list(
+                    'file_id', flat=True)
+            )
+            orphaned = OrphanedFiles(containerid=container.pk)
+            found = orphaned.update(
+                entry.name for entry in os.scandir(path)
+                if entry.name not in live and entry.is_file()
+            )
+            cutoff = time.time() - config.GC_GRACE
+            removed = []
+            for name, first_found in found.items():
+                if first_found > cutoff:
+                    pending = True
+                    continue
+                try:
+                    blob_store.remove(os.path.join(path, name))
+                except FileNotFoundError:
+                    pass
+                removed.append(name)
+            orphaned.forget(removed)
+        if container.storage == config.STORAGE_PACK:
+            cls.compact_pack(containerid=container.pk)
+        return pending
+
+    @staticmethod
+    def schedule_compaction(container: Container = None):
+        """
+        Sends the task that compacts the pack files of a container after
+        texts were deleted or replaced.
+        :param container:
+        :return:
+        """
+        if container.storage == config.STORAGE_PACK:
+            celery.send_task(
+                config.RMXWEB_TASKS['compact_pack'],
+                kwargs={'containerid': container.pk}
+            )
+
+    @classmethod
+    def compact_pack(cls, containerid: int = None):
+        """
+        Compacting the pack files of a container. The live texts of segments
+        that are mostly garbage are copied to new segments and the index is
+        updated. A location is only updated if it didn't change during the
+        copy: a text refreshed in the meantime keeps its new location.
+        :param containerid:
+        :return: the compacted segments
+        """
+        container = Container.get_object(pk=containerid)
+        store = PackStore(container.pack_path)
+        queryset = cls.objects.filter(
+            container=container, pack_segment__isnull=False)
+        with store.lock():
+            live = dict(
+                queryset.values('pack_segment').annotate(
+                    live=Sum('pack_length')
+                ).values_list('pack_segment', 'live')
+            )
+            segments = store.segments_to_compact(live)
+            if not segments:
+                return []
+            entries = list(
+                queryset.filter(pack_segment__in=segments).values_list(
+                    'pk', 'pack_segment', 'pack_offset', 'pack_length'
+                ).order_by('pack_segment', 'pack_offset')
+            )
+            moved = store.compact(entries)
+            with transaction.atomic():
+                for pk, segment, offset, length in entries:
+                    new_segment, new_offset, new_length = moved[pk]
+                    cls.objects.filter(
+                        pk=pk, pack_segment=segment, pack_offset=offset,
+                        pack_length=length
+                    ).update(pack_segment=new_segment, pack_offset=new_offset,
+                             pack_length=new_length)
+            store.remove_segments(segments)
+        return segments
+
+    @property
+    def duplicate_distance(self):
+        """Returns the number of bits that differ between the simhash of a
+        near-duplicate and the simhash of the page it duplicates.
+        """
+        if not self.duplicate_of_id:
+            return 0
+        return signatures.distance(self.simhash, self.duplicate_of.simhash)
 
     @property
     def dataid(self):
@@ -177,12 +854,301 @@ class Data(models.Model):
         return self.file_id.hex
 
 
-class Link(models.Model):
-    """ Model for every link that appears in a web page (Data model). """
+class ManifestChange(models.Model):
+    """ Change of the manifest of a container: a text that was added, replaced
+    or deleted. The integrity check of a container only receives the changes
+    made after the last verified generation (Container.verified_generation).
+
+    The generations of a container are taken from a counter on its row
+    (Container.manifest_generation), which stays locked until the changes
+    commit; the changes commit in the order of their generations, unlike
+    primary keys.
+    """
     created = models.DateTimeField(auto_now_add=True)
-    url = models.TextField(validators=[validators.URLValidator()], null=True)
+    container = models.ForeignKey(Container, on_delete=models.CASCADE)
+    generation = models.BigIntegerField()
+    file_id = models.UUIDField()
+    hash_text = models.CharField(
+        max_length=config.HEXDIGEST_SIZE, blank=True, null=True)
+    size = models.IntegerField(null=True)
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['container', 'generation'],
+                name='manifest_container_gen_idx'),
+        ]
+
+    @classmethod
+    def record(cls, container: Container = None,
+               objs: typing.Iterable[Data] = None, deleted: bool = False):
+        """
+        Records the changes for a list of Data objects, under a new
+        generation of the container. Nothing is recorded if MANIFEST_DIFF is
+        disabled.
+        :param container:
+        :param objs:
+        :param deleted: True if the objects are being deleted
+        :return:
+        """
+        if not config.MANIFEST_DIFF:
+            return
+        objs = list(objs)
+        if not objs:
+            return
+        with transaction.atomic():
+            # the update locks the row of the container until the end of the
+            # outer transaction.
+            Container.objects.filter(pk=container.pk).update(
+                manifest_generation=F('manifest_generation') + 1)
+            generation = Container.objects.values_list(
+                'manifest_generation', flat=True).get(pk=container.pk)
+            cls.objects.bulk_create(
+                [
+                    cls(container=container, generation=generation,
+                        file_id=_.file_id, hash_text=_.hash_text,
+                        size=_.text_size, deleted=deleted)
+                    for _ in objs
+                ],
+                batch_size=config.BULK_CREATE_BATCH_SIZE
+            )
+
+    @classmethod
+    def diff(cls, container: Container = None) -> dict:
+        """
+        Returns the changes of a container since its last verified generation,
+        with the last change of every text. A full check is requested for
+        containers that were never verified or when there are more than
+        MANIFEST_DIFF_MAX changes.
+        :param container:
+        :return:
+        """
+        changes = cls.objects.filter(
+            container=container,
+            generation__gt=container.verified_generation)
+        generation = changes.aggregate(
+            generation=Max('generation'))['generation'] or \
+            container.verified_generation
+        if not container.verified_generation:
+            return {'generation': generation, 'full': True}
+        rows = list(changes.order_by('generation', 'pk').values(
+            'created', 'file_id', 'hash_text', 'size', 'deleted'
+        )[:config.MANIFEST_DIFF_MAX + 1])
+        if len(rows) > config.MANIFEST_DIFF_MAX:
+            return {'generation': generation, 'full': True}
+        latest = {}
+        for row in rows:
+            latest[row['file_id']] = {
+                'dataid': row['file_id'].hex,
+                'hash_text': row['hash_text'],
+                'size': row['size'],
+                'mtime': row['created'].timestamp(),
+                'deleted': row['deleted'],
+            }
+        return {
+            'generation': generation,
+            'full': False,
+            'changes': list(latest.values())
+        }
+
+    @classmethod
+    def verify(cls, containerid: int = None, generation: int = None):
+        """
+        Saves the generation verified by the integrity check of a container
+        and drops the changes up to it.
+        :param containerid:
+        :param generation:
+        :return:
+        """
+        Container.objects.filter(
+            pk=containerid, verified_generation__lt=generation
+        ).update(verified_generation=generation)
+        cls.objects.filter(
+            container_id=containerid, generation__lte=generation).delete()
+
+    @classmethod
+    def reset(cls, container: Container = None):
+        """
+        Forgets the manifest of a container while MANIFEST_DIFF is disabled;
+        the first check after it is enabled again is a full one.
+        :param container:
+        :return:
+        """
+        if container.verified_generation:
+            Container.objects.filter(pk=container.pk).update(
+                verified_generation=0)
+            cls.objects.filter(container=container).delete()
+
+
+class TextDictionary(models.Model):
+    """ Zstandard dictionary trained on the texts of a container. The texts
+    compressed with it carry its dict_id. The id is derived from the content
+    of the dictionary, so containers with the same samples share an id.
+    """
+    created = models.DateTimeField(auto_now_add=True)
+    container = models.ForeignKey(Container, on_delete=models.CASCADE)
+    dict_id = models.BigIntegerField(db_index=True)
+    content = models.BinaryField()
+
+    @classmethod
+    def get_content(cls, dict_id: int = None) -> bytes:
+        """Returns the content of a dictionary for its id."""
+        obj = cls.objects.filter(dict_id=dict_id).first()
+        if not obj:
+            raise ValueError(f"Dictionary with id: `{dict_id}` doesn't exist.")
+        return bytes(obj.content)
+
+    @classmethod
+    def compress(cls, payload: bytes, container: Container = None) -> bytes:
+        """
+        Compresses a text with the latest dictionary of the container. Texts
+        are compressed without a dictionary until one has been trained. Only
+        the id of the dictionary is queried; its content is loaded once per
+        process (see compression.get_dictionary).
+        :param payload:
+        :param container:
+        :return:
+        """
+        dict_id = cls.objects.filter(
+            container=container).order_by('-created').values_list(
+                'dict_id', flat=True).first()
+        return compression.compress(
+            payload, dict_id=dict_id, load_dictionary=cls.get_content)
+
+    @classmethod
+    def schedule_training(cls, container: Container = None):
+        """
+        Sends the task that trains a dictionary when the container holds
+        enough texts and has no dictionary.
+        :param container:
+        :return:
+        """
+        if cls.objects.filter(container=container).exists():
+            return
+        if container.data_set.count() < config.ZSTD_DICT_SAMPLES:
+            return
+        if not RedisConnect().set(
+                f'train_text_dictionary_{container.pk}', time.time(),
+                nx=True, ex=config.ZSTD_DICT_TRAIN_TIMEOUT):
+            return
+        celery.send_task(
+            config.RMXWEB_TASKS['train_text_dictionary'],
+            kwargs={'containerid': container.pk}
+        )
+
+    @classmethod
+    def train(cls, containerid: int = None):
+        """
+        Trains a dictionary on the latest texts of a container.
+        :param containerid:
+        :return: the dictionary or None if the samples are not sufficient
+        """
+        container = Container.get_object(pk=containerid)
+        samples = [
+            ''.join(_.get_text()).encode('utf-8')
+            for _ in container.data_set.order_by('-pk')[
+                :config.ZSTD_DICT_SAMPLES]
+        ]
+        try:
+            dict_id, content = compression.train_dictionary(samples)
+        except compression.zstandard.ZstdError as _:
+            return None
+        return cls.objects.create(
+            container=container, dict_id=dict_id, content=content)
+
+
+class Host(models.Model):
+    """ Dictionary of the hostnames that appear in links. """
+    name = models.CharField(max_length=500, unique=True)
+
+    @classmethod
+    def get_many(cls, names: typing.Iterable[str]) -> dict:
+        """
+        Returns a mapping between hostnames and Host objects. The hostnames
+        that are not in the dictionary are inserted.
+        :param names:
+        :return:
+        """
+        names = set(_ for _ in names if _)
+        if not names:
+            return {}
+        cls.objects.bulk_create(
+            [cls(name=_) for _ in names],
+            batch_size=config.BULK_CREATE_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        return {_.name: _ for _ in cls.objects.filter(name__in=names)}
+
+
+class Url(models.Model):
+    """ Dictionary of urls. Every url is stored once and is shared by all the
+    links that point to it.
+    """
+    url = models.TextField(validators=[validators.URLValidator()])
+    url_hash = models.CharField(
+        max_length=config.URL_HEXDIGEST_SIZE, unique=True)
+    host = models.ForeignKey(Host, on_delete=models.PROTECT, null=True)
+
+    @staticmethod
+    def hash(url: str) -> str:
+        """Returns the digest that identifies a url in the dictionary."""
+        digest = hashlib.blake2b(digest_size=config.URL_DIGEST_SIZE)
+        digest.update(bytes(url, 'utf-8'))
+        return digest.hexdigest()
+
+    @classmethod
+    def get_many(cls, urls: typing.Iterable[str]) -> dict:
+        """
+        Returns a mapping between urls and Url objects. The urls that are not
+        in the dictionary are inserted along with their hostnames.
+        :param urls:
+        :return:
+        """
+        hashes = {cls.hash(_): _ for _ in urls if _}
+        out = {
+            _.url_hash: _ for _ in cls.objects.filter(url_hash__in=hashes)
+        }
+        missing = [_ for _ in hashes if _ not in out]
+        if missing:
+            hostnames = {
+                _: urllib.parse.urlparse(hashes[_]).hostname for _ in missing
+            }
+            hosts = Host.get_many(hostnames.values())
+            cls.objects.bulk_create(
+                [
+                    cls(url=hashes[_], url_hash=_,
+                        host=hosts.get(hostnames[_]))
+                    for _ in missing
+                ],
+                batch_size=config.BULK_CREATE_BATCH_SIZE,
+                ignore_conflicts=True
+            )
+            out.update({
+                _.url_hash: _ for _ in cls.objects.filter(url_hash__in=missing)
+            })
+        return {hashes[k]: v for k, v in out.items()}
+
+
+class Link(models.Model):
+    """ Edge between a web page (Data model) and a url (Url model) that
+    appears in it.
+    """
     data = models.ForeignKey(Data, on_delete=models.CASCADE)
-    hostname = models.CharField(max_length=500, null=True)
+    target = models.ForeignKey(Url, on_delete=models.PROTECT)
+
+    @property
+    def url(self):
+        return self.target.url
+
+    @property
+    def hostname(self):
+        return self.target.host.name if self.target.host_id else None
+
+    @property
+    def created(self):
+        """Links are created along with the Data object they belong to."""
+        return self.data.created
 
     @classmethod
     def create(cls, url: str = None, data: Data = None):
@@ -191,11 +1157,24 @@ class Link(models.Model):
         :param data:
         :return:
         """
-        cls(
-            url=url,
-            hostname=urllib.parse.urlparse(url).hostname,
-            data=data
-        ).save()
+        cls.create_many([(data, url)])
+
+    @classmethod
+    def create_many(cls, links: typing.List[typing.Tuple[Data, str]]):
+        """
+        Creating Link objects for a list of (data, url) pairs. A url that
+        appears more than once in the same web page is saved once.
+        :param links:
+        :return:
+        """
+        links = list(dict.fromkeys(
+            (data, url) for data, url in links if url
+        ))
+        urls = Url.get_many(url for _, url in links)
+        cls.objects.bulk_create(
+            [cls(data=data, target=urls[url]) for data, url in links],
+            batch_size=config.BULK_CREATE_BATCH_SIZE
+        )
 
 
 def create_data_obj(container_id: int = None,
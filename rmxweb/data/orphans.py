@@ -0,0 +1,53 @@
+"""
+Keeps, in a redis sorted set, the time when the garbage collector first found
+each orphaned text file of a container. The ctime of a text file can't be
+used for this: it changes whenever the blob of the file is linked again.
+"""
+import time
+import typing
+
+from metrics.redis import RedisConnect
+
+
+class OrphanedFiles(object):
+
+    def __init__(self, containerid: int = None):
+        """
+        Instantiating OrphanedFiles.
+
+        :param containerid:
+        """
+        self.key = f'orphaned_files_containerid_{containerid}'
+        self.redis = RedisConnect().connection
+
+    def update(self, names: typing.Iterable[str] = None) -> dict:
+        """
+        Registers the names of the files that are orphaned now and forgets the
+        files that are not orphaned anymore.
+
+        :param names: the names of the orphaned files
+        :return: a dict with the time when every file was first found
+        """
+        names = set(names or [])
+        now = time.time()
+        found = dict(
+            (_.decode('utf-8'), score)
+            for _, score in self.redis.zrange(self.key, 0, -1, withscores=True)
+        )
+        gone = set(found) - names
+        if gone:
+            self.redis.zrem(self.key, *gone)
+        new = names - set(found)
+        if new:
+            self.redis.zadd(self.key, dict((_, now) for _ in new), nx=True)
+        return dict((_, found.get(_, now)) for _ in names)
+
+    def forget(self, names: typing.Iterable[str] = None):
+        """ Forgets the files that were removed. """
+        names = list(names or [])
+        if names:
+            self.redis.zrem(self.key, *names)
+
+    def delete(self):
+        """ Deletes the times of the container. """
+        self.redis.delete(self.key)
@@ -0,0 +1,147 @@
+"""
+Append-only pack files for the texts of a container.
+
+In the pack storage mode, the texts of a container are appended to segmented
+pack files instead of being written to one file per Data object. The location
+of every text (segment, offset, length) is saved on the Data object.
+"""
+import contextlib
+import fcntl
+import os
+import re
+import stat
+import time
+import typing
+
+from rmxweb import config
+
+SEGMENT_PATTERN = re.compile(r'^segment-(\d+)\.pack$')
+
+
+class PackStore(object):
+
+    def __init__(self, path: str = None):
+        """
+        Instantiating the PackStore.
+
+        :param path: the path to the pack folder of a container
+        """
+        self.path = path
+
+    def create_folder(self):
+        """ Creating the pack folder with permissions 'read, write, execute' to
+            user, group and other (777).
+        """
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, exist_ok=True)
+            os.chmod(self.path, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)
+
+    def segment_path(self, segment: int) -> str:
+        """ Returns the path of a segment. """
+        return os.path.join(self.path, f'segment-{segment:06d}.pack')
+
+    def segments(self) -> typing.List[int]:
+        """ Returns the numbers of all the segments in the pack folder. """
+        out = []
+        for name in os.listdir(self.path):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                out.append(int(match.group(1)))
+        return sorted(out)
+
+    @contextlib.contextmanager
+    def lock(self):
+        """ Exclusive lock on the pack folder, shared by all workers. """
+        self.create_folder()
+        with open(os.path.join(self.path, 'lock'), 'a') as _file:
+            fcntl.flock(_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(_file, fcntl.LOCK_UN)
+
+    def append(self, payload: bytes = None) -> typing.Tuple[int, int, int]:
+        """
+        Appends a text to the last segment. A new segment is started when the
+        last one would grow over PACK_SEGMENT_SIZE.
+
+        :param payload: the encoded text
+        :return: segment, offset and length of the text
+        """
+        with self.lock():
+            return self._append(payload)
+
+    def _append(self, payload: bytes = None, min_segment: int = 0):
+        """ Appending to the last segment; the caller holds the lock. """
+        segments = self.segments()
+        segment = max(segments[-1] if segments else 1, min_segment)
+        path = self.segment_path(segment)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size and size + len(payload) > config.PACK_SEGMENT_SIZE:
+            segment += 1
+            path = self.segment_path(segment)
+            size = 0
+        with open(path, 'ab') as _file:
+            _file.write(payload)
+        if not size:
+            os.chmod(path, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)
+        return segment, size, len(payload)
+
+    def read(self, segment: int, offset: int, length: int) -> bytes:
+        """
+        Reads a text from a segment.
+
+        :param segment:
+        :param offset:
+        :param length:
+        :return: the encoded text
+        """
+        with open(self.segment_path(segment), 'rb') as _file:
+            _file.seek(offset)
+            return _file.read(length)
+
+    def segments_to_compact(self, live: typing.Dict[int, int] = None):
+        """
+        Returns the segments that should be compacted. The last segment, that
+        is still being appended to, and segments modified less than
+        PACK_COMPACT_GRACE seconds ago are never compacted.
+
+        :param live: mapping between segments and their live bytes
+        :return:
+        """
+        out = []
+        segments = self.segments()
+        now = time.time()
+        for segment in segments[:-1]:
+            stats = os.stat(self.segment_path(segment))
+            if now - stats.st_mtime < config.PACK_COMPACT_GRACE:
+                continue
+            if live.get(segment, 0) < stats.st_size * (
+                    1 - config.PACK_COMPACT_RATIO):
+                out.append(segment)
+        return out
+
+    def compact(self, entries: typing.Iterable[tuple] = None) -> dict:
+        """
+        Copies the live entries of the segments being compacted to new
+        segments. The caller holds the lock, updates the index and removes the
+        old segments.
+
+        :param entries: (key, segment, offset, length) of the live entries
+        :return: a mapping between keys and the new (segment, offset, length)
+        """
+        segments = self.segments()
+        # compacted entries never go to a segment that is being compacted.
+        min_segment = (segments[-1] if segments else 0) + 1
+        out = {}
+        for key, segment, offset, length in entries:
+            out[key] = self._append(
+                self.read(segment, offset, length), min_segment=min_segment)
+        return out
+
+    def remove_segments(self, segments: typing.Iterable[int] = None):
+        """ Removes segments from the pack folder. """
+        for segment in segments:
+            path = self.segment_path(segment)
+            if os.path.exists(path):
+                os.remove(path)
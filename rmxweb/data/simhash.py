@@ -0,0 +1,67 @@
+"""
+Simhash signatures of texts. Similar texts have signatures that differ by a
+small number of bits; the signatures are split in bands so that the candidate
+near-duplicates of a text are found with an index lookup.
+"""
+import collections
+import hashlib
+import re
+import typing
+
+from rmxweb import config
+
+SIGNATURE_BITS = 64
+# the number of bands; every band has a column in the Data table.
+BANDS = 4
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def shingles(data: typing.Iterable[str]) -> collections.Counter:
+    """ Returns the word shingles of a text along with their counts. """
+    words = WORD_RE.findall(' '.join(data).lower())
+    size = config.SIMHASH_SHINGLE_SIZE
+    if len(words) < size:
+        return collections.Counter([' '.join(words)] if words else [])
+    return collections.Counter(
+        ' '.join(words[idx:idx + size])
+        for idx in range(len(words) - size + 1)
+    )
+
+
+def simhash(data: typing.Iterable[str]) -> typing.Optional[int]:
+    """
+    Returns the simhash of a text as a signed 64 bit integer, so that it fits
+    in a BigIntegerField; None for a text without words.
+
+    :param data: the paragraphs of the text
+    :return:
+    """
+    features = shingles(data)
+    if not features:
+        return None
+    weights = [0] * SIGNATURE_BITS
+    for feature, count in features.items():
+        value = int.from_bytes(
+            hashlib.blake2b(bytes(feature, 'utf-8'), digest_size=8).digest(),
+            'big'
+        )
+        for bit in range(SIGNATURE_BITS):
+            weights[bit] += count if value >> bit & 1 else -count
+    out = sum(1 << bit for bit in range(SIGNATURE_BITS) if weights[bit] > 0)
+    return out - (1 << SIGNATURE_BITS) if out >> (SIGNATURE_BITS - 1) else out
+
+
+def bands(signature: int) -> typing.List[int]:
+    """ Returns the bands of a signature as non-negative integers. """
+    size = SIGNATURE_BITS // BANDS
+    value = signature & ((1 << SIGNATURE_BITS) - 1)
+    return [
+        value >> (idx * size) & ((1 << size) - 1)
+        for idx in range(BANDS)
+    ]
+
+
+def distance(first: int, second: int) -> int:
+    """ Returns the number of bits that differ between two signatures. """
+    return bin((first ^ second) & ((1 << SIGNATURE_BITS) - 1)).count('1')
@@ -1,12 +1,16 @@
 
 
-from .models import Data as DataModel
+from .models import Data as DataModel, TextDictionary
+from metrics.cancellation import cancellable
 from metrics.config import CREATE_DATA_PREFIX
+from metrics.crawl_activity import CrawlActivity
 from metrics.decorator import register_metrics
+from rmxweb import config
 from rmxweb.celery import celery
 
 
 @celery.task
+@cancellable
 @register_metrics(CREATE_DATA_PREFIX)
 def create_from_webpage(containerid: str = None,
                         endpoint: str = None,
@@ -23,12 +27,35 @@ def create_from_webpage(containerid: str = None,
         endpoint=endpoint,
         seed=seed
     )
+    CrawlActivity(containerid=containerid).touch()
     if isinstance(doc, DataModel):
         return doc.pk, doc.file_id
     return None, None
 
 
 @celery.task
+@cancellable
+@register_metrics(CREATE_DATA_PREFIX)
+def create_many_from_webpage(containerid: str = None, pages: list = None):
+    """
+    Task creating Data objects for a batch of web pages. Every page is a dict
+    with the keys: endpoint, seed, title, data and links.
+
+    :param containerid:
+    :param pages:
+    :return: a list of (pk, file_id) for every page; (None, None) for pages
+     that were not saved.
+    """
+    docs = DataModel.create_many(containerid=containerid, pages=pages)
+    CrawlActivity(containerid=containerid).touch()
+    return [
+        (doc.pk, doc.file_id) if isinstance(doc, DataModel) else (None, None)
+        for doc in docs
+    ]
+
+
+@celery.task
+@cancellable
 def delete_many(containerid: str = None, data_ids: list = None):
     """
     Delete many data objects that match a containerid and a lit of data ids.
@@ -39,6 +66,46 @@ def delete_many(containerid: str = None, data_ids: list = None):
     DataModel.delete_many(data_ids=data_ids, containerid=containerid)
 
 
+@celery.task
+@cancellable
+def collect_garbage(containerid: str = None):
+    """
+    Removing the texts of deleted data objects from a container. The task is
+    sent again if orphaned files were too recent to be removed.
+    :param containerid:
+    :return:
+    """
+    if DataModel.collect_garbage(containerid=containerid):
+        celery.send_task(
+            config.RMXWEB_TASKS['collect_garbage'],
+            kwargs={'containerid': containerid},
+            countdown=config.GC_GRACE
+        )
+
+
+@celery.task
+@cancellable
+def compact_pack(containerid: str = None):
+    """
+    Compacting the pack files of a container after deletions.
+    :param containerid:
+    :return:
+    """
+    return DataModel.compact_pack(containerid=containerid)
+
+
+@celery.task
+@cancellable
+def train_text_dictionary(containerid: str = None):
+    """
+    Training the zstd dictionary used to compress the texts of a container.
+    :param containerid:
+    :return: the id of the dictionary
+    """
+    obj = TextDictionary.train(containerid=containerid)
+    return obj.dict_id if obj else None
+
+
 # todo(): delete
 # @celery.task
 # def create(corpusid: str = None,
@@ -0,0 +1,883 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import urllib.parse
+from unittest import mock
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+
+from container.models import Container
+from .blob import BlobStore
+from .bloom import UrlBloomFilter
+from .boilerplate import BoilerplateFilter, truncate
+from .canonical import canonicalise
+from . import compression
+from .models import Data, Link, ManifestChange, TextDictionary, Url
+from .orphans import OrphanedFiles
+from .pack import PackStore
+from . import simhash as signatures
+from .tasks import create_many_from_webpage
+from metrics.tests import RedisTestCase
+from rmxweb import config
+from rmxweb.celery import celery
+
+
+class CanonicaliseTestCase(TestCase):
+
+    def test_canonicalise(self):
+        for url, expected in [
+            ('HTTP://Example.COM', 'http://example.com/'),
+            ('https://example.com:443/a', 'https://example.com/a'),
+            ('http://example.com:8080/a', 'http://example.com:8080/a'),
+            ('http://example.com/a#top', 'http://example.com/a'),
+            ('http://example.com/a?b=2&a=1', 'http://example.com/a?a=1&b=2'),
+            ('http://example.com/a?utm_source=x&fbclid=y&q=1',
+             'http://example.com/a?q=1'),
+            ('http://example.com/a?q=', 'http://example.com/a?q='),
+            ('  http://user:pw@example.com/ ', 'http://user:pw@example.com/'),
+        ]:
+            self.assertEqual(canonicalise(url), expected, url)
+
+    def test_empty_url(self):
+        self.assertIsNone(canonicalise(None))
+        self.assertEqual(canonicalise(''), '')
+
+
+class SimhashTestCase(TestCase):
+
+    text = [
+        'The quick brown fox jumps over the lazy dog near the river bank.',
+        'A second paragraph talks about foxes, dogs and the weather today.',
+    ]
+
+    def test_simhash(self):
+        value = signatures.simhash(self.text)
+        self.assertEqual(value, signatures.simhash(list(self.text)))
+        self.assertTrue(-2 ** 63 <= value < 2 ** 63)
+        self.assertIsNone(signatures.simhash(['', ' ... ']))
+
+    def test_similar_texts_are_close(self):
+        other = self.text + ['One more sentence.']
+        close = signatures.distance(
+            signatures.simhash(self.text), signatures.simhash(other))
+        far = signatures.distance(
+            signatures.simhash(self.text),
+            signatures.simhash(['Something else entirely, about databases.']))
+        self.assertLess(close, far)
+
+    def test_bands(self):
+        value = -1
+        self.assertEqual(signatures.bands(value), [0xffff] * signatures.BANDS)
+        value = 0x0004000300020001
+        self.assertEqual(signatures.bands(value), [1, 2, 3, 4])
+
+    def test_pairs_within_the_distance_share_a_band(self):
+        value = signatures.simhash(self.text)
+        for bits in ([0, 16, 32], [1, 17, 63], [15, 31, 47]):
+            other = value ^ sum(1 << bit for bit in bits)
+            self.assertEqual(signatures.distance(value, other), 3)
+            self.assertTrue(set(enumerate(signatures.bands(value))) & set(
+                enumerate(signatures.bands(other))))
+
+    def test_nearest(self):
+        candidates = [('a', 0b1111), ('b', 0b0001), ('c', 0)]
+        self.assertEqual(Data.nearest(0b0011, candidates), 'b')
+        self.assertEqual(Data.nearest(0b11111111, candidates), None)
+
+
+class NearDuplicatesTestCase(TestCase):
+
+    def setUp(self):
+        self.container = Container.objects.create(name='simhash')
+
+    def create_data(self, value: int = None, duplicate_of: Data = None):
+        obj = Data(container=self.container, containerid=self.container.pk,
+                   duplicate_of=duplicate_of)
+        obj.set_simhash(value)
+        obj.save()
+        return obj
+
+    def test_find_near_duplicates(self):
+        original = self.create_data(0b1010)
+        duplicate = self.create_data(0b1011, duplicate_of=original)
+        self.create_data(0b1010 ^ (0xff << 40))
+        # the near-duplicates are never returned as originals.
+        self.assertEqual(
+            Data.find_near_duplicates(
+                self.container, [0b1011, None, 0xff << 20]),
+            [original.pk, None, None]
+        )
+        self.assertEqual(
+            Data.find_near_duplicates(
+                self.container, [0b1010], exclude=[original.pk]),
+            [None]
+        )
+        self.assertEqual(
+            list(Data.duplicate_clusters(self.container.pk)), [duplicate])
+
+
+class UrlBloomFilterTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.bloom = UrlBloomFilter(containerid=1)
+
+    def test_might_contain_many(self):
+        self.bloom.add_many(['http://a.com/', 'http://b.com/'])
+        self.assertEqual(
+            self.bloom.might_contain_many(
+                ['http://a.com/', 'http://c.com/', 'http://b.com/']),
+            [True, False, True]
+        )
+
+    def test_rebuild_marks_the_filter_ready(self):
+        # urls added by a worker don't make the filter usable.
+        self.bloom.add_many(['http://a.com/'])
+        self.assertFalse(self.bloom.exists())
+        self.assertTrue(self.bloom.rebuild(lambda: ['http://b.com/']))
+        self.assertTrue(self.bloom.exists())
+        self.assertEqual(
+            self.bloom.might_contain_many(['http://a.com/', 'http://b.com/']),
+            [True, True]
+        )
+        self.bloom.delete()
+        self.assertFalse(self.bloom.exists())
+
+    def test_one_rebuild_at_a_time(self):
+        def rebuild_again():
+            self.assertFalse(self.bloom.rebuild(lambda: []))
+            return ['http://a.com/']
+
+        self.assertTrue(self.bloom.rebuild(rebuild_again))
+        self.assertTrue(self.bloom.rebuild(lambda: []))
+
+
+class FindDuplicatesTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.container = Container.objects.create(name='bloom')
+        url = 'http://example.com/'
+        self.data = Data.objects.create(
+            container=self.container, containerid=self.container.pk,
+            url=url, canonical_url=Url.objects.create(
+                url=url, url_hash=Url.hash(url))
+        )
+
+    def test_find_duplicates(self):
+        found = Data.find_duplicates(
+            self.container, ['http://example.com/', 'http://new.com/'])
+        self.assertEqual(found, {'http://example.com/': self.data})
+        self.assertTrue(UrlBloomFilter(self.container.pk).exists())
+
+    def test_find_duplicates_during_a_rebuild(self):
+        bloom = UrlBloomFilter(self.container.pk)
+        # another worker is building the filter and added a url already.
+        self.redis.set(bloom.rebuild_key, 1)
+        bloom.add_many(['http://other.com/'])
+        found = Data.find_duplicates(self.container, ['http://example.com/'])
+        self.assertEqual(found, {'http://example.com/': self.data})
+
+
+class BlobStoreTestCase(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.store = BlobStore(os.path.join(self.path, 'blobs'))
+        self.payload, self.hash_text = Data.encode_text(['a text'])
+
+    def write(self, name: str = None) -> str:
+        path = os.path.join(self.path, name)
+        self.store.write(
+            path=path, payload=self.payload, hash_text=self.hash_text)
+        return path
+
+    def test_write_links_the_same_text_once(self):
+        paths = [self.write(name) for name in ['a', 'b']]
+        blob_path = self.store.blob_path(self.hash_text)
+        self.assertEqual(os.stat(blob_path).st_nlink, 3)
+        for path in paths:
+            self.assertTrue(os.path.samefile(path, blob_path))
+            with open(path, 'rb') as _file:
+                self.assertEqual(_file.read(), self.payload)
+        # nothing is left in the temporary folder of the store.
+        self.assertEqual(os.listdir(os.path.join(self.store.root, 'tmp')), [])
+
+    def test_release_keeps_a_blob_with_references(self):
+        paths = [self.write(name) for name in ['a', 'b']]
+        blob_path = self.store.blob_path(self.hash_text)
+        os.remove(paths[0])
+        self.store.release(self.hash_text)
+        self.assertTrue(os.path.exists(blob_path))
+        os.remove(paths[1])
+        self.store.release_many([self.hash_text, self.hash_text])
+        self.assertFalse(os.path.exists(blob_path))
+        # releasing a blob that is gone, or no hash, does nothing.
+        self.store.release(self.hash_text)
+        self.store.release(None)
+
+    def test_remove_drops_the_last_reference(self):
+        paths = [self.write(name) for name in ['a', 'b']]
+        blob_path = self.store.blob_path(self.hash_text)
+        self.store.remove(paths[0])
+        self.assertFalse(os.path.exists(paths[0]))
+        self.assertEqual(os.stat(blob_path).st_nlink, 2)
+        self.store.remove(paths[1])
+        self.assertFalse(os.path.exists(blob_path))
+
+    def test_write_without_hard_links(self):
+        with mock.patch('os.link', side_effect=PermissionError):
+            path = self.write('a')
+        with open(path, 'rb') as _file:
+            self.assertEqual(_file.read(), self.payload)
+        self.assertFalse(
+            os.path.exists(self.store.blob_path(self.hash_text)))
+
+
+class PackStoreTestCase(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.store = PackStore(os.path.join(self.path, 'pack'))
+
+    def test_append_and_read(self):
+        first = self.store.append(b'first text')
+        second = self.store.append(b'second')
+        self.assertEqual(first, (1, 0, 10))
+        self.assertEqual(second, (1, 10, 6))
+        self.assertEqual(self.store.read(*first), b'first text')
+        self.assertEqual(self.store.read(*second), b'second')
+
+    def test_append_starts_a_new_segment(self):
+        with mock.patch.object(config, 'PACK_SEGMENT_SIZE', 12):
+            self.store.append(b'0123456789')
+            location = self.store.append(b'abcdef')
+        self.assertEqual(location, (2, 0, 6))
+        self.assertEqual(self.store.segments(), [1, 2])
+
+    def test_segments_to_compact(self):
+        with mock.patch.object(config, 'PACK_SEGMENT_SIZE', 10):
+            self.store.append(b'0123456789')
+            self.store.append(b'0123456789')
+            self.store.append(b'0123456789')
+        with mock.patch.object(config, 'PACK_COMPACT_GRACE', 0):
+            # the last segment is never compacted.
+            self.assertEqual(
+                self.store.segments_to_compact({1: 2, 2: 10, 3: 0}), [1])
+        # the segments modified recently are kept.
+        self.assertEqual(self.store.segments_to_compact({1: 0, 2: 0}), [])
+
+    def test_compact(self):
+        with mock.patch.object(config, 'PACK_SEGMENT_SIZE', 10):
+            dead = self.store.append(b'dead')
+            live = self.store.append(b'live')
+            last = self.store.append(b'0123456789')
+        self.assertEqual((dead[0], live[0], last[0]), (1, 1, 2))
+        moved = self.store.compact([('key', *live)])
+        # the live entry goes after the last segment.
+        self.assertEqual(moved, {'key': (3, 0, 4)})
+        self.store.remove_segments([1])
+        self.assertEqual(self.store.segments(), [2, 3])
+        self.assertEqual(self.store.read(*moved['key']), b'live')
+
+
+class CompactPackTestCase(TestCase):
+
+    def setUp(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        patcher = mock.patch.object(config, 'CONTAINER_ROOT', path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.container = Container.objects.create(
+            name='pack', storage=config.STORAGE_PACK)
+        self.store = PackStore(self.container.pack_path)
+
+    def create_data(self, payload: bytes = None) -> Data:
+        segment, offset, length = self.store.append(payload)
+        return Data.objects.create(
+            container=self.container, containerid=self.container.pk,
+            pack_segment=segment, pack_offset=offset, pack_length=length)
+
+    def test_compact_pack_moves_live_texts(self):
+        with mock.patch.object(config, 'PACK_SEGMENT_SIZE', 20):
+            dead = self.create_data(b'0123456789012345')
+            live = self.create_data(b'live')
+            self.create_data(b'last segment')
+        dead.delete()
+        with mock.patch.object(config, 'PACK_COMPACT_GRACE', 0):
+            self.assertEqual(
+                Data.compact_pack(containerid=self.container.pk), [1])
+        live.refresh_from_db()
+        self.assertNotEqual(live.pack_segment, 1)
+        self.assertEqual(self.store.read(
+            live.pack_segment, live.pack_offset, live.pack_length), b'live')
+
+    def test_compact_pack_keeps_a_location_changed_during_the_copy(self):
+        with mock.patch.object(config, 'PACK_SEGMENT_SIZE', 20):
+            dead = self.create_data(b'0123456789012345')
+            obj = self.create_data(b'old')
+            self.create_data(b'last segment')
+        dead.delete()
+        compact = PackStore.compact
+
+        def refresh_during_copy(store, entries):
+            moved = compact(store, entries)
+            # a refresh saves the location of the new text meanwhile.
+            Data.objects.filter(pk=obj.pk).update(
+                pack_segment=2, pack_offset=12, pack_length=3)
+            return moved
+
+        with mock.patch.object(config, 'PACK_COMPACT_GRACE', 0), \
+                mock.patch.object(PackStore, 'compact', refresh_during_copy):
+            Data.compact_pack(containerid=self.container.pk)
+        obj.refresh_from_db()
+        self.assertEqual(
+            (obj.pack_segment, obj.pack_offset, obj.pack_length), (2, 12, 3))
+
+    def test_collect_garbage_compacts_the_pack(self):
+        with mock.patch.object(config, 'PACK_SEGMENT_SIZE', 20):
+            dead = self.create_data(b'0123456789012345')
+            live = self.create_data(b'live')
+            self.create_data(b'last segment')
+        dead.delete()
+        self.assertEqual(self.store.segments(), [1, 2])
+        with mock.patch.object(config, 'PACK_COMPACT_GRACE', 0):
+            self.assertFalse(
+                Data.collect_garbage(containerid=self.container.pk))
+        self.assertEqual(self.store.segments(), [2, 3])
+        live.refresh_from_db()
+        self.assertEqual(live.get_text(), ['live'])
+
+
+class BoilerplateFilterTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.boilerplate = BoilerplateFilter(containerid=1)
+
+    def page(self, idx: int = None) -> list:
+        return ['Home  | About', f'the text of page {idx}']
+
+    def test_strip_keeps_everything_before_min_pages(self):
+        for idx in range(config.BOILERPLATE_MIN_PAGES - 1):
+            self.assertEqual(self.boilerplate.strip(
+                'example.com', self.page(idx)), self.page(idx))
+
+    def test_strip_drops_frequent_paragraphs(self):
+        for idx in range(config.BOILERPLATE_MIN_PAGES):
+            out = self.boilerplate.strip('example.com', self.page(idx))
+        self.assertEqual(out, [f'the text of page {idx}'])
+        # whitespace and case don't make a paragraph unique.
+        self.assertEqual(self.boilerplate.strip(
+            'example.com', ['home | about', 'other']), ['other'])
+        # the counters are kept per host.
+        self.assertEqual(self.boilerplate.strip(
+            'example.org', self.page(0)), self.page(0))
+
+    def test_strip_without_count(self):
+        for idx in range(config.BOILERPLATE_MIN_PAGES):
+            self.boilerplate.strip('example.com', self.page(idx))
+        counters = self.boilerplate.redis.hgetall(self.boilerplate.key)
+        self.assertEqual(
+            self.boilerplate.strip('example.com', self.page(0), count=False),
+            ['the text of page 0'])
+        self.assertEqual(
+            self.boilerplate.redis.hgetall(self.boilerplate.key), counters)
+
+    def test_delete(self):
+        self.boilerplate.strip('example.com', self.page(0))
+        self.boilerplate.delete()
+        self.assertFalse(self.boilerplate.redis.exists(self.boilerplate.key))
+
+
+class TruncateTestCase(TestCase):
+
+    def test_truncate(self):
+        data = ['abcd', 'efgh', 'ijkl']
+        self.assertEqual(truncate(data, max_size=100), data)
+        self.assertEqual(truncate(data, max_size=12), ['abcd', 'efgh'])
+        self.assertEqual(truncate(data, max_size=16), ['abcd', 'efgh', 'ij'])
+        self.assertEqual(truncate(None, max_size=10), [])
+
+    def test_truncate_doesnt_split_characters(self):
+        self.assertEqual(truncate(['a\u00e9b'], max_size=4), ['a'])
+
+
+class RecrawlTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        for name in ['CONTAINER_ROOT', 'BLOB_ROOT']:
+            patcher = mock.patch.object(config, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(Container, 'mark_stale')
+        self.mark_stale = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.container = Container.create(the_name='recrawl')
+        self.boilerplate = BoilerplateFilter(containerid=self.container.pk)
+
+    def create(self, idx: int = None, text: str = None) -> Data:
+        return Data.create(
+            data=['Home | About', text or f'the text of page {idx}'],
+            containerid=self.container.pk,
+            endpoint=f'http://example.com/{idx}')
+
+    def test_unchanged_recrawl(self):
+        pages = config.BOILERPLATE_MIN_PAGES + 1
+        objs = [self.create(idx) for idx in range(pages)]
+        counters = self.boilerplate.redis.hgetall(self.boilerplate.key)
+        self.mark_stale.reset_mock()
+        # the boilerplate counters moved since the first page was saved; its
+        # cleaned text would differ, the crawled text doesn't.
+        obj = self.create(0)
+        self.assertEqual(obj.pk, objs[0].pk)
+        self.assertEqual(obj.hash_text, objs[0].hash_text)
+        self.mark_stale.assert_not_called()
+        self.assertEqual(
+            self.boilerplate.redis.hgetall(self.boilerplate.key), counters)
+        Data.create_many(containerid=self.container.pk, pages=[{
+            'data': ['Home | About', f'the text of page {idx}'],
+            'endpoint': f'http://example.com/{idx}',
+        } for idx in range(pages)])
+        self.mark_stale.assert_not_called()
+        self.assertEqual(
+            self.boilerplate.redis.hgetall(self.boilerplate.key), counters)
+
+    def test_changed_recrawl(self):
+        pages = config.BOILERPLATE_MIN_PAGES + 1
+        objs = [self.create(idx) for idx in range(pages)]
+        counters = self.boilerplate.redis.hgetall(self.boilerplate.key)
+        self.mark_stale.reset_mock()
+        obj = self.create(0, text='a new text')
+        self.assertNotEqual(obj.hash_text, objs[0].hash_text)
+        self.mark_stale.assert_called_once()
+        self.assertEqual(
+            self.boilerplate.redis.hgetall(self.boilerplate.key), counters)
+
+    def test_refresh_replaces_the_text(self):
+        old = self.create(0)
+        obj = self.create(0, text='a new text')
+        self.assertEqual(obj.file_path, old.file_path)
+        self.assertEqual(''.join(obj.get_text()),
+                         'Home | About\n\na new text\n\n')
+        # the old blob lost its last reference; no temporary file is left.
+        self.assertFalse(os.path.exists(BlobStore().blob_path(old.hash_text)))
+        self.assertTrue(os.path.samefile(
+            obj.file_path, BlobStore().blob_path(obj.hash_text)))
+        self.assertEqual(os.listdir(self.container.container_path()),
+                         [obj.file_id.hex])
+
+    def test_failed_refresh_keeps_the_text(self):
+        old = self.create(0)
+        with mock.patch.object(BlobStore, 'write', side_effect=OSError), \
+                self.assertRaises(OSError):
+            self.create(0, text='a new text')
+        obj = Data.objects.get(pk=old.pk)
+        self.assertEqual(obj.hash_text, old.hash_text)
+        self.assertEqual(''.join(obj.get_text()),
+                         'Home | About\n\nthe text of page 0\n\n')
+        self.assertEqual(os.listdir(self.container.container_path()),
+                         [obj.file_id.hex])
+        # a failure after the new text is written removes it as well.
+        replace = os.replace
+
+        def fail_rename(src, dst):
+            if dst == obj.file_path:
+                raise OSError(dst)
+            return replace(src, dst)
+
+        with mock.patch('os.replace', side_effect=fail_rename), \
+                self.assertRaises(OSError):
+            self.create(0, text='a new text')
+        self.assertEqual(os.listdir(self.container.container_path()),
+                         [obj.file_id.hex])
+        self.assertFalse(os.path.exists(BlobStore().blob_path(
+            Data.encode_text(['Home | About', 'a new text'])[1])))
+        self.assertEqual(''.join(obj.get_text()),
+                         'Home | About\n\nthe text of page 0\n\n')
+
+
+class CreateManyTestCase(RedisTestCase):
+
+    texts = [
+        'Rivers carry water from the mountains down to the sea.',
+        'A recipe for bread needs flour, yeast, salt and some water.',
+        'The election results were announced late in the evening.',
+        'Telescopes collect light from galaxies far away from us.',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        for name in ['CONTAINER_ROOT', 'BLOB_ROOT']:
+            patcher = mock.patch.object(config, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(Container, 'mark_stale')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.container = Container.create(the_name='create many')
+
+    def page(self, idx: int = None, endpoint: str = None) -> dict:
+        return {
+            'data': [self.texts[idx]],
+            'endpoint': endpoint or f'http://example.com/{idx}',
+            'links': [f'http://example.com/{idx + 1}'],
+        }
+
+    def test_create_many(self):
+        first = Data.create(containerid=self.container.pk, **self.page(0))
+        out = Data.create_many(containerid=self.container.pk, pages=[
+            self.page(1),
+            # the same canonical url as the page before.
+            self.page(2, endpoint='http://EXAMPLE.com/1#top'),
+            self.page(0),
+            self.page(3),
+        ])
+        self.assertIsNone(out[1])
+        # the page that exists in the container is returned as it is.
+        self.assertEqual(out[2].pk, first.pk)
+        objs = {_.pk: _ for _ in self.container.data_set.all()}
+        self.assertEqual(len(objs), 3)
+        for idx, obj in [(1, out[0]), (3, out[3])]:
+            self.assertEqual(objs[obj.pk].file_id, obj.file_id)
+            self.assertEqual(''.join(objs[obj.pk].get_text()),
+                             f'{self.texts[idx]}\n\n')
+            self.assertEqual(
+                [_.target.url for _ in Link.objects.filter(data=obj)],
+                [f'http://example.com/{idx + 1}'])
+        self.assertEqual(
+            sorted(os.listdir(self.container.container_path())),
+            sorted(_.file_id.hex for _ in objs.values()))
+
+    def test_duplicates_saved_by_another_worker(self):
+        saved = Data.create(containerid=self.container.pk, **self.page(0))
+        # the url was saved after this batch looked for duplicates.
+        with mock.patch.object(Data, 'find_duplicates', return_value={}):
+            out = Data.create_many(containerid=self.container.pk, pages=[
+                self.page(1), self.page(0, endpoint=saved.url)])
+        self.assertIsNone(out[1])
+        self.assertEqual(
+            Data.objects.get(pk=out[0].pk).file_id, out[0].file_id)
+        self.assertEqual(self.container.data_set.count(), 2)
+        # the text of the page that was not saved is removed.
+        self.assertEqual(
+            sorted(os.listdir(self.container.container_path())),
+            sorted([saved.file_id.hex, out[0].file_id.hex]))
+
+    def test_create_many_from_webpage(self):
+        out = create_many_from_webpage(containerid=self.container.pk, pages=[
+            self.page(0), self.page(1, endpoint='http://example.com/0')])
+        obj = self.container.data_set.get()
+        self.assertEqual(out, [(obj.pk, obj.file_id), (None, None)])
+
+
+@unittest.skipIf(compression.zstandard is None, 'zstandard is required (see '
+                                                'requirements.txt)')
+class CompressionTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        for name in ['CONTAINER_ROOT', 'BLOB_ROOT']:
+            patcher = mock.patch.object(config, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # every test loads its own dictionaries.
+        patcher = mock.patch.dict(compression._DICTIONARIES, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch.object(config, 'COMPRESS_TEXTS', True):
+            self.container = Container.create(the_name='compressed')
+
+    @staticmethod
+    def text(idx: int = None) -> list:
+        return [
+            f'Page {idx} of the archive about rivers, lakes and the sea.',
+            f'The river number {idx} flows {idx * 7} miles to the sea and '
+            f'feeds {idx % 5} lakes on its way.',
+        ]
+
+    def create(self, idx: int = None) -> Data:
+        return Data.create(data=self.text(idx), containerid=self.container.pk,
+                           endpoint=f'http://example.com/{idx}')
+
+    def test_compress_without_a_dictionary(self):
+        payload = Data.encode_text(self.text(1))[0]
+        compressed = compression.compress(payload)
+        self.assertTrue(compression.is_compressed(compressed))
+        self.assertFalse(compression.is_compressed(payload))
+        self.assertEqual(
+            compression.decompress(compressed, TextDictionary.get_content),
+            payload)
+
+    def test_compress_with_a_dictionary(self):
+        payload = Data.encode_text(self.text(1))[0]
+        # texts are compressed without a dictionary until one is trained.
+        self.assertEqual(compression.zstandard.get_frame_parameters(
+            TextDictionary.compress(payload, self.container)).dict_id, 0)
+        with mock.patch.object(config, 'ZSTD_DICT_SIZE', 1024):
+            dict_id, content = compression.train_dictionary(
+                [Data.encode_text(self.text(_))[0] for _ in range(200)])
+        TextDictionary.objects.create(
+            container=self.container, dict_id=dict_id, content=content)
+        compressed = TextDictionary.compress(payload, self.container)
+        self.assertEqual(compression.zstandard.get_frame_parameters(
+            compressed).dict_id, dict_id)
+        # the dictionary is found from the id saved in the frame.
+        compression._DICTIONARIES.clear()
+        self.assertEqual(''.join(Data.decode_text(compressed)),
+                         payload.decode('utf-8'))
+        compression._DICTIONARIES.clear()
+        TextDictionary.objects.all().delete()
+        with self.assertRaises(ValueError):
+            Data.decode_text(compressed)
+
+    def test_texts_round_trip(self):
+        obj = self.create(1)
+        with open(obj.file_path, 'rb') as _file:
+            self.assertTrue(compression.is_compressed(_file.read()))
+        self.assertEqual(''.join(obj.get_text()),
+                         ''.join(f'{_}\n\n' for _ in self.text(1)))
+        self.assertEqual(obj.text_size, len(Data.encode_text(self.text(1))[0]))
+
+    def test_texts_written_before_compression(self):
+        Container.objects.filter(pk=self.container.pk).update(
+            compressed=False)
+        obj = self.create(1)
+        with open(obj.file_path, 'rb') as _file:
+            self.assertFalse(compression.is_compressed(_file.read()))
+        Container.objects.filter(pk=self.container.pk).update(
+            compressed=True)
+        self.create(2)
+        self.assertEqual(
+            [''.join(_.get_text()) for _ in Data.objects.order_by('pk')],
+            [''.join(f'{_}\n\n' for _ in self.text(idx)) for idx in (1, 2)])
+
+    def test_train(self):
+        for idx in range(20):
+            self.create(idx)
+        with mock.patch.object(config, 'ZSTD_DICT_SIZE', 1024):
+            obj = TextDictionary.train(containerid=self.container.pk)
+        self.assertEqual(obj.container, self.container)
+        new = self.create(20)
+        with open(new.file_path, 'rb') as _file:
+            self.assertEqual(compression.zstandard.get_frame_parameters(
+                _file.read()).dict_id, obj.dict_id)
+        # the texts compressed before the dictionary are still read.
+        self.assertEqual(
+            [''.join(_.get_text()) for _ in Data.objects.order_by('pk')],
+            [''.join(f'{_}\n\n' for _ in self.text(idx))
+             for idx in range(21)])
+
+
+class CollectGarbageTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        for name in ['CONTAINER_ROOT', 'BLOB_ROOT']:
+            patcher = mock.patch.object(config, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.container = Container.create(the_name='garbage')
+        self.orphaned = OrphanedFiles(containerid=self.container.pk)
+
+    def patch_send_task(self) -> mock.Mock:
+        patcher = mock.patch.object(celery, 'send_task')
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def orphan(self, name: str = None) -> str:
+        path = os.path.join(self.container.container_path(), name)
+        with open(path, 'wb') as _file:
+            _file.write(b'orphan')
+        return path
+
+    def test_update(self):
+        with mock.patch('time.time', return_value=100):
+            self.assertEqual(self.orphaned.update(['a', 'b']),
+                             {'a': 100, 'b': 100})
+        with mock.patch('time.time', return_value=200):
+            self.assertEqual(self.orphaned.update(['b', 'c']),
+                             {'b': 100, 'c': 200})
+        self.orphaned.forget(['b'])
+        with mock.patch('time.time', return_value=300):
+            self.assertEqual(self.orphaned.update(['b']), {'b': 300})
+
+    def test_collect_garbage_waits_for_the_grace_period(self):
+        path = self.orphan('orphan')
+        self.assertTrue(Data.collect_garbage(containerid=self.container.pk))
+        self.assertTrue(os.path.exists(path))
+        # the ctime of the file changes; the grace period doesn't restart.
+        os.utime(path)
+        with mock.patch('time.time', return_value=time.time() + 3600):
+            self.assertFalse(
+                Data.collect_garbage(containerid=self.container.pk))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.orphaned.update([]), {})
+
+    def test_collect_garbage_keeps_live_files(self):
+        obj = Data.create(data=['a text'], containerid=self.container.pk,
+                          endpoint='http://example.com/')
+        with mock.patch('time.time', return_value=time.time() + 3600):
+            self.assertFalse(
+                Data.collect_garbage(containerid=self.container.pk))
+        self.assertTrue(os.path.exists(obj.file_path))
+
+    def test_delete_many_removes_the_texts_before_the_link(self):
+        objs = [
+            Data.create(data=['the same text'], containerid=self.container.pk,
+                        endpoint=f'http://example.com/{idx}')
+            for idx in range(3)
+        ]
+        paths = [obj.file_path for obj in objs]
+        blob_path = BlobStore().blob_path(objs[0].hash_text)
+        link = mock.Mock()
+        link.apply_async.side_effect = lambda: self.assertEqual(
+            [os.path.exists(_) for _ in paths], [False, False, True])
+        send_task = self.patch_send_task()
+        Data.delete_many(data_ids=[objs[0].pk, objs[1].pk],
+                         containerid=self.container.pk, link=link)
+        link.apply_async.assert_called_once()
+        # the garbage collector is sent for unknown orphans only.
+        self.assertEqual(send_task.call_args.args,
+                         (config.RMXWEB_TASKS['collect_garbage'],))
+        self.assertNotIn('link', send_task.call_args.kwargs)
+        self.assertTrue(os.path.exists(blob_path))
+        Data.delete_many(data_ids=[objs[2].pk],
+                         containerid=self.container.pk)
+        self.assertFalse(os.path.exists(blob_path))
+        self.assertEqual(self.orphaned.update([]), {})
+
+
+@mock.patch.object(config, 'MANIFEST_DIFF', True)
+class ManifestChangeTestCase(TestCase):
+
+    def setUp(self):
+        self.container = Container.objects.create(name='manifest')
+
+    def create_data(self, hash_text: str = None) -> Data:
+        return Data.objects.create(
+            container=self.container, containerid=self.container.pk,
+            hash_text=hash_text, text_size=len(hash_text))
+
+    def diff(self) -> dict:
+        self.container.refresh_from_db()
+        return ManifestChange.diff(self.container)
+
+    def test_record(self):
+        objs = [self.create_data('a'), self.create_data('b')]
+        ManifestChange.record(self.container, objs)
+        ManifestChange.record(self.container, objs[:1], deleted=True)
+        self.assertEqual(
+            list(ManifestChange.objects.order_by('pk').values_list(
+                'generation', 'deleted')),
+            [(1, False), (1, False), (2, True)])
+        self.container.refresh_from_db()
+        self.assertEqual(self.container.manifest_generation, 2)
+        with mock.patch.object(config, 'MANIFEST_DIFF', False):
+            ManifestChange.record(self.container, objs)
+        self.assertEqual(ManifestChange.objects.count(), 3)
+
+    def test_diff(self):
+        obj = self.create_data('a')
+        ManifestChange.record(self.container, [obj])
+        # the container was never verified.
+        self.assertEqual(self.diff(), {'generation': 1, 'full': True})
+        ManifestChange.verify(self.container.pk, 1)
+        self.assertEqual(self.diff(), {
+            'generation': 1, 'full': False, 'changes': []})
+        other = self.create_data('b')
+        ManifestChange.record(self.container, [obj, other])
+        obj.hash_text = 'c'
+        ManifestChange.record(self.container, [obj])
+        diff = self.diff()
+        self.assertEqual(diff['generation'], 3)
+        self.assertEqual(
+            [(_['dataid'], _['hash_text']) for _ in diff['changes']],
+            [(obj.file_id.hex, 'c'), (other.file_id.hex, 'b')])
+        with mock.patch.object(config, 'MANIFEST_DIFF_MAX', 2):
+            self.assertEqual(self.diff(), {'generation': 3, 'full': True})
+
+    def test_verify_keeps_later_generations(self):
+        obj = self.create_data('a')
+        ManifestChange.record(self.container, [obj])
+        ManifestChange.verify(self.container.pk, 1)
+        ManifestChange.record(self.container, [obj])
+        generation = self.diff()['generation']
+        # changes recorded while the check runs are kept.
+        ManifestChange.record(self.container, [obj])
+        ManifestChange.verify(self.container.pk, generation)
+        self.assertEqual(list(ManifestChange.objects.values_list(
+            'generation', flat=True)), [3])
+        # a late callback doesn't move the verified generation back.
+        ManifestChange.verify(self.container.pk, 1)
+        self.container.refresh_from_db()
+        self.assertEqual(self.container.verified_generation, 2)
+
+    def test_reset(self):
+        obj = self.create_data('a')
+        ManifestChange.record(self.container, [obj])
+        ManifestChange.verify(self.container.pk, 1)
+        ManifestChange.record(self.container, [obj])
+        self.container.refresh_from_db()
+        ManifestChange.reset(self.container)
+        self.assertFalse(ManifestChange.objects.exists())
+        self.assertEqual(self.diff(), {'generation': 0, 'full': True})
+
+
+class UrlDictionaryMigrationTestCase(TransactionTestCase):
+
+    migrate_from = [
+        ('container', '0001_initial'), ('data', '0002_data_containerid')]
+    migrate_to = [
+        ('container', '0001_initial'), ('data', '0003_url_dictionary')]
+
+    def migrate(self, targets: list = None):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_links_point_to_the_url_dictionary(self):
+        apps = self.migrate(self.migrate_from)
+        container = apps.get_model('container', 'Container').objects.create(
+            name='links')
+        data = apps.get_model('data', 'Data').objects.create(
+            container=container, containerid=container.pk)
+        Link = apps.get_model('data', 'Link')
+        urls = [
+            f'http://host{idx % 3}.example.com/{idx}'
+            for idx in list(range(700)) + list(range(500))
+        ]
+        Link.objects.bulk_create(
+            [Link(url=_, data=data) for _ in urls + [None]])
+
+        apps = self.migrate(self.migrate_to)
+        Link = apps.get_model('data', 'Link')
+        Url = apps.get_model('data', 'Url')
+        self.assertEqual(Url.objects.count(), 700)
+        self.assertEqual(
+            apps.get_model('data', 'Host').objects.count(), 3)
+        self.assertEqual(
+            list(Link.objects.order_by('pk').values_list(
+                'target__url', 'target__host__name')),
+            [(_, urllib.parse.urlparse(_).hostname) for _ in urls])
@@ -8,4 +8,5 @@ from . import views
 urlpatterns = [
     path('', views.ListData.as_view()),
     path('<int:pk>/', views.DataRecord.as_view()),
+    path('duplicates/', views.DuplicateClusters.as_view()),
 ]
@@ -3,7 +3,7 @@ import json
 from django.http import Http404, HttpResponse
 from rest_framework.views import APIView
 
-from .models import Data
+from .models import Data, Link
 from serialisers import SerialiserFactory
 
 
@@ -25,8 +25,9 @@ class ListData(APIView):
         links = []
         data_objs = Data.objects.filter(container__pk=containerid)
         if get_links:
-            for item in data_objs:
-                links += item.get_all_links()
+            links = Link.objects.filter(
+                data__container__pk=containerid
+            ).select_related('data', 'target__host')
 
         serialiser = SerialiserFactory().get_serialiser('data_list_csv')
         serialiser = serialiser(data={'dataset': data_objs, 'links': links})
@@ -64,3 +65,26 @@ class DataRecord(APIView):
         )
         resp['Content-Disposition'] = 'attachment; filename="%s"' % zip_name
         return resp
+
+
+class DuplicateClusters(APIView):
+    """View exposing the clusters of near-duplicate pages in a container."""
+    def get(self, request):
+        """Retrieves the near-duplicate clusters for a given containerid."""
+        params = request.GET.dict()
+        try:
+            containerid = int(params.get('containerid'))
+        except (TypeError, ValueError) as _:
+            raise Http404(f'Provided parameters: {params}')
+
+        serialiser = SerialiserFactory().get_serialiser('duplicates_csv')
+        serialiser = serialiser(
+            data={'dataset': Data.duplicate_clusters(containerid)})
+        zip_name = serialiser.get_zip_name(
+            f'Duplicates-ContainerID-{containerid}')
+        resp = HttpResponse(
+            serialiser.get_value(),
+            content_type='application/force-download'
+        )
+        resp['Content-Disposition'] = 'attachment; filename="%s"' % zip_name
+        return resp
@@ -0,0 +1,63 @@
+"""
+The async views of the features, served under ASGI (see ASYNC_VIEWS in
+rmxweb.config). The requests wait for redis and nlp without holding a thread.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views import View
+
+from .emit import get_features_async
+from .views import Feature as _Feature
+from metrics.eta import MATRIX, estimate
+from metrics.graph import GraphReady
+from rmxweb.middleware import busy_response
+from serialisers import SerialiserFactory
+
+
+class Feature(View):
+    """
+    Displaying features for a container id and feature's number.
+    """
+    async def get(self, request):
+
+        params = request.GET.dict()
+        try:
+            containerid = int(params['containerid'])
+            feats = int(params.get('features', 10))
+            words = int(params.get('words', 10))
+        except (ValueError, KeyError, TypeError) as _:
+            raise Http404(params)
+
+        stats = await GraphReady(
+            containerid=containerid, features=feats, prefetch=False
+        ).status_async()
+        if not stats.get("ready"):
+            return busy_response(_Feature.http_resp_for_busy(
+                id=containerid,
+                uri=request.get_full_path(),
+                payload=stats,
+                eta=await sync_to_async(estimate)(MATRIX, containerid, feats)
+            ))
+
+        resp = _Feature.lemma(await get_features_async(
+            containerid=containerid,
+            features=feats,
+            words=words
+        ))
+        if not resp['success']:
+            return busy_response(_Feature.http_resp_for_busy(
+                id=containerid,
+                uri=request.get_full_path(),
+                payload=resp,
+                eta=await sync_to_async(estimate)(MATRIX, containerid, feats)
+            ))
+        serialiser = SerialiserFactory().get_serialiser('features_csv')
+        serialiser = serialiser(data=resp)
+        zip_name = serialiser.get_zip_name(
+            f'Features-ContainerID-{containerid}')
+        resp = HttpResponse(
+            serialiser.get_value(),
+            content_type='application/force-download'
+        )
+        resp['Content-Disposition'] = 'attachment; filename="%s"' % zip_name
+        return resp
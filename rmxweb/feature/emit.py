@@ -3,8 +3,8 @@ Functions calling other services
 """
 
 from container.decorators import feats_available
-from rmxweb.celery import celery
 from rmxweb.config import NLP_TASKS
+from rmxweb.remote import remote_call, remote_call_async
 
 
 @feats_available
@@ -17,7 +17,7 @@ def get_features(containerid: int = None, container=None, feats: int = None,
     :param words:
     :return:
     """
-    resp = celery.send_task(
+    return features_response(remote_call(
         NLP_TASKS['retrieve_features'],
         kwargs={
             'containerid': containerid,
@@ -25,7 +25,30 @@ def get_features(containerid: int = None, container=None, feats: int = None,
             'path': container.get_folder_path(),
             'words': words
         }
-    ).get()
+    ), feats)
+
+
+@feats_available
+async def get_features_async(containerid: int = None, container=None,
+                             feats: int = None, words: int = None, **_):
+    """ The async version of get_features. """
+    return features_response(await remote_call_async(
+        NLP_TASKS['retrieve_features'],
+        kwargs={
+            'containerid': containerid,
+            'feats': feats,
+            'path': container.get_folder_path(),
+            'words': words
+        }
+    ), feats)
+
+
+def features_response(resp: list = None, feats: int = None) -> dict:
+    """
+    :param resp: the features returned by nlp
+    :param feats:
+    :return:
+    """
     if resp:
         return {'success': True, 'data': resp}
     else:
@@ -0,0 +1,67 @@
+import io
+from unittest import mock
+import zipfile
+
+from django.test import override_settings
+from django.urls import path
+
+from . import async_views
+from metrics.graph import GraphReady
+from metrics.tests import RedisTestCase
+from rmxweb import config
+from rmxweb.remote import ServiceUnavailable
+
+# the async views are only routed under ASGI (see ASYNC_VIEWS)
+urlpatterns = [
+    path('feature/', async_views.Feature.as_view()),
+]
+
+
+@override_settings(ROOT_URLCONF='feature.tests')
+class AsyncFeatureTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(
+            GraphReady, 'status_async', new_callable=mock.AsyncMock,
+            return_value={'ready': True})
+        self.status = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('feature.async_views.get_features_async',
+                             new_callable=mock.AsyncMock)
+        self.get_features = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_features(self):
+        self.get_features.return_value = {'success': True, 'data': [
+            {'id': 1, 'word': 'b', 'weight': 0.5},
+            {'id': 1, 'word': 'a', 'weight': 0.4},
+        ]}
+        resp = await self.async_client.get(
+            '/feature/', {'containerid': 1, 'features': 10})
+        self.assertEqual(resp.status_code, 200)
+        self.get_features.assert_awaited_once_with(
+            containerid=1, features=10, words=10)
+        with zipfile.ZipFile(io.BytesIO(resp.content)) as archive:
+            self.assertIn('lemma.csv', archive.namelist())
+
+    async def test_busy(self):
+        self.status.return_value = {'ready': False}
+        resp = await self.async_client.get(
+            '/feature/', {'containerid': 1, 'features': 10})
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp['Retry-After'], str(config.ETA_RETRY_DEFAULT))
+        self.assertEqual(resp.json()['task']['name'], 'Features not ready.')
+        self.get_features.assert_not_awaited()
+
+    async def test_errors_are_json(self):
+        resp = await self.async_client.get('/feature/', {'features': 10})
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(resp['Content-Type'], 'application/json')
+        # the parameters, as in the response of feature.views.Feature
+        self.assertEqual(resp.json(), {'features': '10'})
+        self.get_features.side_effect = ServiceUnavailable('nlp', 30)
+        resp = await self.async_client.get('/feature/', {'containerid': 1})
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp['Retry-After'], '30')
+        self.assertIn('"nlp"', resp.json()['detail'])
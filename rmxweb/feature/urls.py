@@ -2,7 +2,13 @@
 
 from django.urls import path
 
-from . import views
+from rmxweb.config import ASYNC_VIEWS
+
+
+if ASYNC_VIEWS:
+    from . import async_views as views
+else:
+    from . import views
 
 
 urlpatterns = [
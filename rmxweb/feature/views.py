@@ -3,6 +3,7 @@ from django.http import Http404, HttpResponse
 from rest_framework.views import APIView, Response
 
 from .emit import get_features
+from metrics.eta import MATRIX, estimate
 from metrics.graph import GraphReady
 from serialisers import SerialiserFactory
 
@@ -27,7 +28,8 @@ class Feature(APIView):
             return Response(self.http_resp_for_busy(
                 id=containerid,
                 uri=request.get_full_path(),
-                payload=stats
+                payload=stats,
+                eta=estimate(MATRIX, containerid, feats)
             ), status=202)
 
         resp = self.get_features(containerid, feats, words)
@@ -35,7 +37,8 @@ class Feature(APIView):
             return Response(self.http_resp_for_busy(
                 id=containerid,
                 uri=request.get_full_path(),
-                payload=resp
+                payload=resp,
+                eta=estimate(MATRIX, containerid, feats)
             ), status=202)
         serialiser = SerialiserFactory().get_serialiser('features_csv')
         serialiser = serialiser(data=resp)
@@ -48,11 +51,14 @@ class Feature(APIView):
         resp['Content-Disposition'] = 'attachment; filename="%s"' % zip_name
         return resp
 
-    def http_resp_for_busy(self, id: (int, str), payload: dict, uri: str):
+    @staticmethod
+    def http_resp_for_busy(id: (int, str), payload: dict, uri: str,
+                           eta: dict = None):
         """
         :param id:
         :param payload:
         :param uri:
+        :param eta: the estimate of the stage (see metrics.eta.estimate)
         :return:
         """
         return {
@@ -62,7 +68,8 @@ class Feature(APIView):
                 'name': 'Features not ready.',
                 'job-state': "STARTED",
                 'job-status': "INPROGRESS",
-                'summary': payload
+                'summary': payload,
+                'eta': eta
             }
         }
 
@@ -81,6 +88,15 @@ class Feature(APIView):
             features=feats,
             words=words
         )
+        return Feature.lemma(out)
+
+    @staticmethod
+    def lemma(out: dict = None):
+        """
+        Adds the lemma of the features to the features returned by nlp.
+        :param out:
+        :return:
+        """
         if not out['success']:
             return out
 
@@ -0,0 +1,190 @@
+"""
+The async views of the graph, the dendrogram and the context of the features,
+served under ASGI (see ASYNC_VIEWS in rmxweb.config). The requests wait for
+redis, nlp and rmxgrep without holding a thread.
+"""
+import json
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views import View
+
+from container.models import Container
+from .data import get_graph_async
+from .decorators import graph_request
+from .emit import hierarchical_tree_async, search_texts_async
+from .views import Dendrogram as _Dendrogram, _View
+
+from metrics.dataset_ready import DatasetReady
+from metrics.dendrogram import DendrogramReady
+from metrics.eta import DENDROGRAM, MATRIX, estimate
+from rmxweb.middleware import busy_response
+from serialisers import SerialiserFactory
+
+
+class Graph(View):
+    """Returns a network graph for a given container id and features number.
+    """
+
+    @graph_request
+    async def get(self, containerid: int = None, words: int = 10,
+                  features: int = 10, docsperfeat: int = 0,
+                  featsperdoc: int = 3, uri: str = None, **_):
+        """
+        Returns features for a given containerid and parameters defined in the
+        request's GET dictionary (see graph.views.Graph).
+        """
+        data = await get_graph_async(
+            containerid=containerid, words=words, features=features,
+            featsperdoc=featsperdoc, docsperfeat=docsperfeat
+        )
+        if not data.get('success', True):
+            return busy_response(_View.http_resp_for_busy(
+                containerid=containerid,
+                payload=data,
+                uri=uri,
+                msg='Graph being computed',
+                eta=await sync_to_async(estimate)(
+                    MATRIX, containerid, features)
+            ))
+        serialiser = SerialiserFactory().get_serialiser('graph_csv')
+        serialiser = serialiser(data)
+        zip_name = serialiser.get_zip_name(
+            f'Network-Graph-ContainerID-{containerid}')
+        resp = HttpResponse(
+            serialiser.get_value(),
+            content_type='application/force-download'
+        )
+        resp['Content-Disposition'] = 'attachment; filename="%s"' % zip_name
+        return resp
+
+
+class Dendrogram(View):
+    """ Returns the dataset for the hierarchical tree / dendrogram.
+    """
+    async def get(self, request):
+        """
+        Returns the hierarchical tree that can be used to display a dendrogram
+        or radial, circular dendrogram.
+        :param request:
+        :return:
+        """
+        params = request.GET.dict()
+        flat = params.get('flat')
+        if flat:
+            flat = json.loads(flat)
+        else:
+            flat = True
+        try:
+            containerid = int(params.get('containerid'))
+        except (ValueError, TypeError):
+            raise Http404(params)
+        if not isinstance(flat, bool):
+            raise Http404(params)
+        dat_stats = await DatasetReady(
+            containerid=containerid, prefetch=False).status_async()
+        den_stats = await DendrogramReady(
+            containerid=containerid, prefetch=False).status_async()
+        dat_ready = dat_stats.get("ready", False)
+        den_ready = den_stats.get("ready", False)
+        if not bool(dat_ready and den_ready):
+            if not dat_ready:
+                msg = 'Crawler or integrity check in progress.'
+                container = await Container.objects.aget(pk=containerid)
+                eta = await sync_to_async(container.dataset_eta)()
+            else:
+                msg = 'Dendrogram being computed.'
+                eta = await sync_to_async(estimate)(DENDROGRAM, containerid)
+            return busy_response(_View.http_resp_for_busy(
+                containerid=containerid,
+                uri=request.get_full_path(),
+                msg=msg,
+                eta=eta
+            ))
+        resp = await hierarchical_tree_async(
+            containerid=containerid, flat=flat)
+        if not resp['success']:
+            # In this case, the system is busy or there is an issue.
+            if resp.get('error', False):
+                raise Http404(resp)
+            return busy_response(_View.http_resp_for_busy(
+                containerid=containerid,
+                payload=resp,
+                msg="Dendrogram being computed",
+                uri=request.get_full_path(),
+                eta=await sync_to_async(estimate)(DENDROGRAM, containerid)
+            ))
+        serialiser = SerialiserFactory().get_serialiser('dendrogram_csv')
+
+        branch = resp['branch']
+        leaf = await sync_to_async(_Dendrogram().prepare_data)(
+            containerid, resp['leaf'])
+        serialiser = serialiser(data={'branch': branch, 'leaf': leaf})
+        zip_name = serialiser.get_zip_name(
+            f'Dendrogram-ContainerID-{containerid}')
+        resp = HttpResponse(
+            serialiser.get_value(),
+            content_type='application/force-download'
+        )
+        resp['Content-Disposition'] = 'attachment; filename="%s"' % zip_name
+        return resp
+
+
+async def get_context(request):
+    """ Returns the context for lemmatised feature words (see
+    graph.views.get_context).
+
+    :param request:
+    :return:
+    """
+    params = request.GET.dict() or json.loads(request.body)
+
+    if not params:
+        raise Http404
+    try:
+        containerid = int(params['containerid'])
+        container = await Container.objects.aget(pk=containerid)
+        lemma = params['lemma']
+    except (ValueError, KeyError, TypeError) as _:
+        raise Http404(params)
+
+    highlight = params.get('highlight', False)
+
+    lemma_to_words, lemma = await sync_to_async(container.get_lemma_words)(
+        lemma)
+    matchwords = []
+    for i in lemma:
+        try:
+            mapping = next(_ for _ in lemma_to_words if _.get('lemma') == i)
+            matchwords.extend(mapping.get('words'))
+        except StopIteration:
+            matchwords.append(i)
+    data = await search_texts_async(
+        path=container.container_path(),
+        highlight=highlight,
+        words=matchwords
+    )
+
+    serialiser = SerialiserFactory().get_serialiser('search_text_csv')
+
+    data_objs = [
+        {
+            'title': _.title, 'url': _.url, 'pk': _.pk, 'dataid': _.dataid,
+            'created': _.created
+        }
+        async for _ in container.data_set.filter(
+            file_id__in=list(uuid.UUID(_['dataid']) for _ in data['data'])
+        )
+    ]
+    serialiser = serialiser(data={
+        'docs': data_objs, 'response': data, 'lemma': lemma
+    })
+    zip_name = serialiser.get_zip_name(
+        f'Feature-Context-ContainerID-{containerid}')
+    resp = HttpResponse(
+        serialiser.get_value(),
+        content_type='application/force-download'
+    )
+    resp['Content-Disposition'] = 'attachment; filename="%s"' % zip_name
+    return resp
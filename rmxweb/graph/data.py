@@ -94,3 +94,9 @@ def get_graph(container=None, **kwds):
     :return:
     """
     return container.get_features(**kwds)
+
+
+@feats_available
+async def get_graph_async(container=None, **kwds):
+    """ The async version of get_graph. """
+    return await container.get_features_async(**kwds)
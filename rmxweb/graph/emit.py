@@ -1,12 +1,21 @@
 
 import typing
 
+from asgiref.sync import sync_to_async
+
 from container.decorators import feats_available
-from metrics.config import COMPUTE_DENDROGRAM_RUN_PREFIX
+from metrics.config import (
+    COMPUTE_DENDROGRAM_RUN_PREFIX,
+    LANE_BACKGROUND,
+    LANE_INTERACTIVE,
+)
 from metrics.decorator import register_metrics
 from metrics.dendrogram import DendrogramReady
+from metrics.lanes import Lane
+from metrics.semaphore import NlpSemaphore, admission
 from rmxweb.celery import celery
-from rmxweb.config import NLP_TASKS, RMXGREP_TASK
+from rmxweb.config import NLP_TASKS, RMXGREP_TASK, RMXWEB_TASKS
+from rmxweb.remote import remote_call, remote_call_async
 
 
 def search_texts(words: typing.List[str] = None, highlight: bool = None,
@@ -17,27 +26,44 @@ def search_texts(words: typing.List[str] = None, highlight: bool = None,
     :param path:
     :return:
     """
-    return celery.send_task(
+    return remote_call(
         RMXGREP_TASK['search_text'],
         kwargs={
             'highlight': highlight,
             'words': words,
             'container_path': path,
-        }).get()
+        })
+
+
+async def search_texts_async(words: typing.List[str] = None,
+                             highlight: bool = None, path: str = None) -> dict:
+    """ The async version of search_texts. """
+    return await remote_call_async(
+        RMXGREP_TASK['search_text'],
+        kwargs={
+            'highlight': highlight,
+            'words': words,
+            'container_path': path,
+        })
 
 
 @register_metrics(COMPUTE_DENDROGRAM_RUN_PREFIX)
-def compute_dendrogram(containerid: int = None):
+def compute_dendrogram(containerid: int = None,
+                       lane: str = LANE_BACKGROUND):
     """
-    Computing the dendrogram for a given containerid.
+    Computing the dendrogram for a given containerid. The computation is sent
+    to nlp by generate_dendrogram_remote, once admitted by the semaphore of
+    the dendrograms.
 
     :param containerid:
+    :param lane: the priority lane of the computation
     """
     celery.send_task(
-        NLP_TASKS['compute_dendrogram'],
+        RMXWEB_TASKS['generate_dendrogram_remote'],
         kwargs={
             'containerid': containerid
-        }
+        },
+        **Lane(lane, containerid).options()
     )
 
 
@@ -49,20 +75,49 @@ def hierarchical_tree(containerid: int = None, flat: bool = None, **_) -> dict:
     :param flat:
     :return:
     """
-    resp = celery.send_task(
+    resp = remote_call(
         NLP_TASKS['hierarchical_tree'],
         kwargs={
             'containerid': containerid,
             'flat': flat,
         }
-    ).get(timeout=3)
+    )
     if resp.get("success"):
         return resp
 
     # check whether nlp is runnning the same process
     stats = DendrogramReady(containerid=containerid)()
     if not stats.get("ready", False):
-        return {"success": False, "busy": True, "payload": stats}
+        return {"success": False, "busy": True, "payload": stats,
+                "admission": admission(NlpSemaphore.token(containerid),
+                                       jobs=['compute_dendrogram'])}
+
+    compute_dendrogram(containerid=containerid, lane=LANE_INTERACTIVE)
+    return {"success": False, "busy": True}
+
+
+@feats_available
+async def hierarchical_tree_async(containerid: int = None, flat: bool = None,
+                                  **_) -> dict:
+    """ The async version of hierarchical_tree. """
+    resp = await remote_call_async(
+        NLP_TASKS['hierarchical_tree'],
+        kwargs={
+            'containerid': containerid,
+            'flat': flat,
+        }
+    )
+    if resp.get("success"):
+        return resp
+
+    stats = await DendrogramReady(
+        containerid=containerid, prefetch=False).status_async()
+    if not stats.get("ready", False):
+        return {"success": False, "busy": True, "payload": stats,
+                "admission": await sync_to_async(admission)(
+                    NlpSemaphore.token(containerid),
+                    jobs=['compute_dendrogram'])}
 
-    compute_dendrogram(containerid=containerid)
+    await sync_to_async(compute_dendrogram)(
+        containerid=containerid, lane=LANE_INTERACTIVE)
     return {"success": False, "busy": True}
@@ -1,13 +1,20 @@
 
+from container.pipeline import DENDROGRAM, MATRIX, Pipeline
+from metrics.cancellation import Cancellation, cancellable
 from metrics.config import (
     COMPUTE_DENDROGRAM_CALLBACK_PREFIX,
     COMPUTE_MATRIX_CALLBACK_PREFIX,
+    TASK_DENDROGRAM,
 )
 from metrics.decorator import register_metrics
+from metrics.semaphore import NlpSemaphore, release
+from metrics.single_flight import MatrixFlight
 from rmxweb.celery import celery
+from rmxweb.config import MATRIX_JOBS
 
 
 @celery.task
+@cancellable
 @register_metrics(COMPUTE_MATRIX_CALLBACK_PREFIX)
 def compute_matrix_callback(
         containerid: int = None,
@@ -16,17 +23,27 @@ def compute_matrix_callback(
 ):
     """
     This task is called by nlp. It is called after nlp finishes computing a
-    matrix, a graph. This function is just a placeholder for Prometheus. It
-    does logging.
+    matrix, a graph. It clears the computations in flight for the feature
+    number and advances the post-crawl pipeline.
 
     :param containerid:
     :param features:
     """
-    pass
+    MatrixFlight(containerid=containerid, features=features).land()
+    release(NlpSemaphore.token(containerid, features), jobs=MATRIX_JOBS)
+    Cancellation(containerid=containerid).clear(
+        Cancellation.matrix_kind(features))
+    Pipeline(containerid=containerid).advance(MATRIX, features=features)
 
 
 @celery.task
+@cancellable
 @register_metrics(COMPUTE_DENDROGRAM_CALLBACK_PREFIX)
 def compute_dendrogram_callback(containerid: int = None):
-    """Called when the dendrogram is computed. It needs to be here for metrics."""
-    pass
+    """Called when the dendrogram is computed. It needs to be here for metrics.
+       It ends the post-crawl pipeline.
+    """
+    Cancellation(containerid=containerid).clear(TASK_DENDROGRAM)
+    NlpSemaphore('compute_dendrogram').release(
+        NlpSemaphore.token(containerid))
+    Pipeline(containerid=containerid).advance(DENDROGRAM)
@@ -0,0 +1,46 @@
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import path
+
+from . import async_views
+from metrics.dataset_ready import DatasetReady
+from metrics.dendrogram import DendrogramReady
+from metrics.tests import RedisTestCase
+from rmxweb import config
+
+# the async views are only routed under ASGI (see ASYNC_VIEWS)
+urlpatterns = [
+    path('graph/', async_views.Graph.as_view()),
+    path('graph/dendrogram/', async_views.Dendrogram.as_view()),
+]
+
+
+@override_settings(ROOT_URLCONF='graph.tests')
+class AsyncGraphTestCase(RedisTestCase):
+
+    async def test_graph_parameters(self):
+        resp = await self.async_client.get('/graph/', {'containerid': 1})
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(resp['Content-Type'], 'application/json')
+        self.assertIn('features', resp.json()['expected'])
+
+    async def test_dendrogram_parameters(self):
+        resp = await self.async_client.get(
+            '/graph/dendrogram/', {'containerid': 'a'})
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(resp.json(), {'containerid': 'a'})
+
+    @mock.patch.object(DatasetReady, 'status_async',
+                       new_callable=mock.AsyncMock,
+                       return_value={'ready': True})
+    @mock.patch.object(DendrogramReady, 'status_async',
+                       new_callable=mock.AsyncMock,
+                       return_value={'ready': False})
+    async def test_dendrogram_busy(self, *_):
+        resp = await self.async_client.get(
+            '/graph/dendrogram/', {'containerid': 1})
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp['Retry-After'], str(config.ETA_RETRY_DEFAULT))
+        self.assertEqual(
+            resp.json()['task']['name'], 'Dendrogram being computed.')
@@ -2,9 +2,14 @@
 
 from django.urls import path
 
-from . import views
+from rmxweb.config import ASYNC_VIEWS
 
 
+if ASYNC_VIEWS:
+    from . import async_views as views
+else:
+    from . import views
+
 urlpatterns = [
 
     path('', views.Graph.as_view()),
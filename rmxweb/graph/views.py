@@ -12,6 +12,7 @@ from .emit import hierarchical_tree, search_texts
 
 from metrics.dataset_ready import DatasetReady
 from metrics.dendrogram import DendrogramReady
+from metrics.eta import DENDROGRAM, MATRIX, estimate
 from metrics.graph import GraphReady
 from serialisers import SerialiserFactory
 
@@ -21,12 +22,13 @@ class _View(APIView):
     @staticmethod
     def http_resp_for_busy(
             *, containerid: (int, str), payload: dict = None, uri: str = None,
-            msg: str = None):
+            msg: str = None, eta: dict = None):
         """
         :param containerid:
         :param payload:
         :param uri:
         :param msg:
+        :param eta: the estimate of the stage (see metrics.eta.estimate)
         :return:
         """
         return {
@@ -36,7 +38,8 @@ class _View(APIView):
                 'name': msg,
                 'job-state': "STARTED",
                 'job-status': "INPROGRESS",
-                'response-payload': payload
+                'response-payload': payload,
+                'eta': eta
             }
         }
 
@@ -91,6 +94,7 @@ class Graph(_View):
                     payload=data,
                     uri=uri,
                     msg='Graph being computed',
+                    eta=estimate(MATRIX, containerid, features)
                 ),
                 status=202
             )
@@ -136,14 +140,18 @@ class Dendrogram(_View):
             msg = 'The system is busy.'
             if not dat_ready:
                 msg = 'Crawler or integrity check in progress.'
-            elif not den_ready:
+                eta = Container.get_object(pk=containerid).dataset_eta()
+            else:
                 msg = 'Dendrogram being computed.'
+                eta = estimate(DENDROGRAM, containerid)
             return Response(
                 super().http_resp_for_busy(
                     containerid=containerid,
                     uri=request.get_full_path(),
                     msg=msg,
-                )
+                    eta=eta
+                ),
+                status=202
             )
         resp = hierarchical_tree(containerid=containerid, flat=flat)
         if not resp['success']:
@@ -154,7 +162,8 @@ class Dendrogram(_View):
                 containerid=containerid,
                 payload=resp,
                 msg="Dendrogram being computed",
-                uri=request.get_full_path()
+                uri=request.get_full_path(),
+                eta=estimate(DENDROGRAM, containerid)
             ), status=202)
         serialiser = SerialiserFactory().get_serialiser('dendrogram_csv')
 
@@ -1,8 +1,33 @@
+from django.http import JsonResponse
 from django.shortcuts import HttpResponse
 
+from metrics.circuit_breaker import CircuitBreaker
+from metrics.lanes import Lane
+from rmxweb.config import PRIORITY_LANES, REMOTE_CALL_TIMEOUTS
+
 # Create your views_neo here.
 
 
 def home(request):
 
     return HttpResponse('This is the home page of proximity-bot.')
+
+
+def lanes(request):
+    """Returns the time spent in the queue by the tasks of every priority
+       lane.
+    """
+    return JsonResponse({
+        'lanes': [Lane(_).wait_stats() for _ in PRIORITY_LANES]
+    })
+
+
+def services(request):
+    """Returns the state of the circuit breakers of the services called in
+       the request path, with the count of calls, failures, timeouts and
+       trips.
+    """
+    names = sorted({_.split('.')[0] for _ in REMOTE_CALL_TIMEOUTS})
+    return JsonResponse({
+        'services': [CircuitBreaker(_).stats() for _ in names]
+    })
@@ -0,0 +1,104 @@
+"""
+Cancellation of the tasks of a container, saved in redis. The ids of the tasks
+sent for a container (crawls, matrices, dendrograms, integrity checks) are
+tracked per kind; a task replaces the older tasks of its kind when it
+supersedes them. When the container is deleted, its tasks are revoked and a
+cancellation token is set, that the downstream tasks check before running
+(see `cancellable`).
+"""
+from functools import wraps
+import typing
+
+from .config import TASK_MATRIX
+from .redis import RedisConnect
+from rmxweb.celery import celery
+from rmxweb.config import CANCELLATION_TIMEOUT
+
+
+class Cancellation(object):
+
+    def __init__(self, containerid: int = None):
+        """
+        Instantiating the Cancellation. The tracked tasks are saved in a redis
+        hash, task id to kind.
+
+        :param containerid:
+        """
+        self.containerid = containerid
+        self.tasks_key = f'tasks_containerid_{containerid}'
+        self.token_key = f'cancelled_containerid_{containerid}'
+        self.redis = RedisConnect().connection
+
+    @staticmethod
+    def matrix_kind(features: int = None) -> str:
+        """ The kind of the matrix computations for a feature number. """
+        return f'{TASK_MATRIX}_features_{features}'
+
+    def task_ids(self, kind: str = None) -> typing.List[str]:
+        """
+        Returns the ids of the tracked tasks; all kinds if kind is None.
+        """
+        return [
+            key.decode() for key, value in
+            self.redis.hgetall(self.tasks_key).items()
+            if kind is None or value.decode() == kind
+        ]
+
+    @staticmethod
+    def revoke(task_ids: typing.List[str] = None):
+        """ Revokes tasks; the running ones are terminated. """
+        if task_ids:
+            celery.control.revoke(task_ids, terminate=True)
+
+    def track(self, kind: str = None, task_id: str = None,
+              supersede: bool = False):
+        """
+        Tracks a task of the container.
+
+        :param kind: the kind of the task
+        :param task_id:
+        :param supersede: revokes the other tasks of the same kind
+        """
+        if supersede:
+            self.revoke(self.clear(kind, keep=task_id))
+        pipe = self.redis.pipeline()
+        pipe.hset(self.tasks_key, task_id, kind)
+        pipe.expire(self.tasks_key, CANCELLATION_TIMEOUT)
+        pipe.execute()
+
+    def clear(self, kind: str = None,
+              keep: str = None) -> typing.List[str]:
+        """
+        Stops tracking the tasks of a kind, that are finished or superseded.
+        Returns their ids.
+        """
+        task_ids = [_ for _ in self.task_ids(kind) if _ != keep]
+        if task_ids:
+            self.redis.hdel(self.tasks_key, *task_ids)
+        return task_ids
+
+    def cancel(self):
+        """ Sets the cancellation token and revokes all the tracked tasks. """
+        self.redis.set(self.token_key, 1, ex=CANCELLATION_TIMEOUT)
+        self.revoke(self.task_ids())
+        self.redis.delete(self.tasks_key)
+
+    def is_cancelled(self) -> bool:
+        return bool(self.redis.exists(self.token_key))
+
+    def reset(self):
+        """ Clears the token and the tracked tasks of a new container. """
+        self.redis.delete(self.token_key, self.tasks_key)
+
+
+def cancellable(func):
+    """
+    Decorator for the tasks that receive a containerid. The task doesn't run
+    if the container was cancelled.
+    """
+    @wraps(func)
+    def wrapped(*args, **kwds):
+        if Cancellation(containerid=kwds.get('containerid')).is_cancelled():
+            return None
+        return func(*args, **kwds)
+    return wrapped
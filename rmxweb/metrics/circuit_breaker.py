@@ -0,0 +1,109 @@
+"""
+Circuit breakers of the services called in the request path (nlp, rmxgrep,
+scrasync), saved in redis so that all the web workers share them.
+
+A breaker opens after BREAKER_THRESHOLD failures (timeouts, unreachable
+broker) within BREAKER_WINDOW seconds and rejects the calls for
+BREAKER_COOLDOWN seconds. It is then half-open: one call probes the service;
+the breaker closes if it succeeds and opens again if it fails.
+
+The calls, timeouts, failures and trips are counted per service.
+"""
+from .redis import RedisConnect
+from rmxweb.config import (
+    BREAKER_COOLDOWN,
+    BREAKER_THRESHOLD,
+    BREAKER_WINDOW,
+)
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker(object):
+
+    def __init__(self, service: str = None):
+        """
+        Instantiating the CircuitBreaker.
+
+        :param service: the name of the service, e.g. nlp
+        """
+        self.service = service
+        self.failures_key = f'breaker_{service}_failures'
+        self.open_key = f'breaker_{service}_open'
+        self.half_open_key = f'breaker_{service}_half_open'
+        self.probe_key = f'breaker_{service}_probe'
+        self.counters_key = f'breaker_{service}_counters'
+        self.redis = RedisConnect().connection
+
+    @property
+    def state(self) -> str:
+        if self.redis.exists(self.open_key):
+            return OPEN
+        if self.redis.exists(self.half_open_key):
+            return HALF_OPEN
+        return CLOSED
+
+    def wait(self, timeout: int = None) -> int:
+        """
+        Returns the time in seconds before the service can be called, 0 if
+        the call can be made. When the breaker is half-open, the first caller
+        gets the probe for `timeout` seconds.
+        """
+        ttl = self.redis.ttl(self.open_key)
+        if ttl and ttl > 0:
+            return ttl
+        if not self.redis.exists(self.half_open_key):
+            return 0
+        if self.redis.set(self.probe_key, 1, nx=True, ex=timeout or 1):
+            return 0
+        return max(self.redis.ttl(self.probe_key), 1)
+
+    def success(self):
+        """ Records a successful call; a half-open breaker closes. """
+        pipe = self.redis.pipeline()
+        pipe.hincrby(self.counters_key, 'calls', 1)
+        pipe.delete(self.half_open_key, self.probe_key)
+        pipe.execute()
+
+    def failure(self, timeout: bool = False):
+        """
+        Records a failed call. The breaker trips after BREAKER_THRESHOLD
+        failures in BREAKER_WINDOW seconds, or when the probe of a half-open
+        breaker fails.
+        """
+        pipe = self.redis.pipeline()
+        pipe.hincrby(self.counters_key, 'calls', 1)
+        pipe.hincrby(self.counters_key, 'failures', 1)
+        if timeout:
+            pipe.hincrby(self.counters_key, 'timeouts', 1)
+        pipe.incr(self.failures_key)
+        pipe.expire(self.failures_key, BREAKER_WINDOW)
+        pipe.exists(self.half_open_key)
+        *_, failures, _, half_open = pipe.execute()
+        if half_open or failures >= BREAKER_THRESHOLD:
+            self.trip()
+
+    def trip(self):
+        """ Opens the breaker for BREAKER_COOLDOWN seconds. """
+        pipe = self.redis.pipeline()
+        pipe.set(self.open_key, 1, ex=BREAKER_COOLDOWN)
+        pipe.set(self.half_open_key, 1, ex=BREAKER_COOLDOWN + BREAKER_WINDOW)
+        pipe.delete(self.failures_key, self.probe_key)
+        pipe.hincrby(self.counters_key, 'trips', 1)
+        pipe.execute()
+
+    def stats(self) -> dict:
+        """ Returns the state and the counters of the breaker. """
+        counters = {
+            key.decode(): int(value) for key, value in
+            self.redis.hgetall(self.counters_key).items()
+        }
+        return {
+            'service': self.service,
+            'state': self.state,
+            **{_: counters.get(_, 0)
+               for _ in ('calls', 'failures', 'timeouts', 'trips')}
+        }
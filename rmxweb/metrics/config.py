@@ -12,6 +12,18 @@ COMPUTE_MATRIX_CALLBACK_PREFIX = "compute_matrix_callback"
 INTEGRITY_CHECK_RUN_PREFIX = "integrity_check_run"
 INTEGRITY_CHECK_CALLBACK_PREFIX = "integrity_check_callback"
 
+# the priority lanes of the tasks (see metrics.lanes)
+LANE_INTERACTIVE = "interactive"
+LANE_BACKGROUND = "background"
+LANE_BULK = "bulk"
+
+# the kinds of the tasks tracked for cancellation (see metrics.cancellation)
+TASK_CRAWL = "crawl"
+TASK_MONITOR_CRAWL = "monitor_crawl"
+TASK_INTEGRITY_CHECK = "integrity_check"
+TASK_DENDROGRAM = "dendrogram"
+TASK_MATRIX = "matrix"
+
 
 ENTER = 'enter'
 EXIT = 'exit'
@@ -0,0 +1,214 @@
+"""
+Crawl activity, saved in redis, used to signal the end of a crawl with an
+event. Every page written by the crawler refreshes a key that expires when the
+crawl is considered quiescent; the expiry of the key, published by redis as a
+keyspace notification, means that the crawl is finished.
+
+The quiescence window adapts to the rate at which the pages of the crawl
+arrive; see QUIESCENCE_ALPHA in rmxweb.config.
+"""
+import math
+import time
+import typing
+
+from redis.exceptions import ResponseError
+
+from .redis import RedisConnect
+from rmxweb.config import (
+    CRAWL_FINISHED_TIMEOUT,
+    CRAWL_LISTENER_HEARTBEAT,
+    QUIESCENCE_ALPHA,
+    QUIESCENCE_MIN,
+    QUIESCENCE_MIN_SAMPLES,
+    QUIESCENCE_SMOOTHING,
+    SECONDS_AFTER_LAST_CALL,
+)
+
+ACTIVITY_PREFIX = 'crawl_activity_containerid_'
+ARRIVALS_PREFIX = 'crawl_arrivals_containerid_'
+FINISHED_PREFIX = 'crawl_finished_containerid_'
+EXPIRED_CHANNEL = '__keyevent@*__:expired'
+# set while a listener of the crawl events runs (see listen)
+LISTENER_KEY = 'crawl_event_listener'
+
+
+class CrawlActivity(object):
+
+    def __init__(self, containerid: int = None):
+        """
+        Instantiating the CrawlActivity.
+
+        :param containerid:
+        """
+        self.containerid = containerid
+        self.key = f'{ACTIVITY_PREFIX}{containerid}'
+        self.arrivals_key = f'{ARRIVALS_PREFIX}{containerid}'
+        self.finished_key = f'{FINISHED_PREFIX}{containerid}'
+        self.redis = RedisConnect().connection
+
+    @staticmethod
+    def window(mean: float = None, count: int = 0,
+               done: bool = False) -> float:
+        """
+        Returns the number of seconds without pages after which a crawl is
+        quiescent.
+
+        :param mean: the mean time between two pages
+        :param count: the number of intervals in the mean
+        :param done: True if scrasync reported the end of the crawl
+        :return:
+        """
+        if done:
+            return QUIESCENCE_MIN
+        if count < QUIESCENCE_MIN_SAMPLES:
+            return SECONDS_AFTER_LAST_CALL
+        return min(
+            max(mean * math.log(1 / QUIESCENCE_ALPHA), QUIESCENCE_MIN),
+            SECONDS_AFTER_LAST_CALL
+        )
+
+    def get_arrivals(self) -> dict:
+        """ Returns the statistics of the arrivals of pages. """
+        stats = {
+            _.decode('utf-8'): float(value)
+            for _, value in self.redis.hgetall(self.arrivals_key).items()
+        }
+        return {
+            'last': stats.get('last'),
+            'mean': stats.get('mean', 0.0),
+            'count': int(stats.get('count', 0)),
+            'done': bool(stats.get('done', 0)),
+        }
+
+    def quiescence_window(self) -> float:
+        """ Returns the current quiescence window of the crawl. """
+        stats = self.get_arrivals()
+        return self.window(stats['mean'], stats['count'], stats['done'])
+
+    def start(self):
+        """ Resets the statistics of the container when a crawl starts. """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(self.arrivals_key)
+        pipe.set(self.key, time.time(), ex=SECONDS_AFTER_LAST_CALL)
+        pipe.delete(self.finished_key)
+        pipe.execute()
+
+    def touch(self):
+        """
+        Registers a page of the crawler on the container. The mean time
+        between pages is updated and the activity key expires after the new
+        quiescence window. Concurrent workers may lose an update of the mean,
+        which only makes the estimate slightly coarser.
+        """
+        now = time.time()
+        stats = self.get_arrivals()
+        mean, count = stats['mean'], stats['count']
+        if stats['last']:
+            interval = max(now - stats['last'], 0.0)
+            mean = interval if not count else mean + QUIESCENCE_SMOOTHING * (
+                interval - mean)
+            count += 1
+        window = self.window(mean, count, stats['done'])
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(self.arrivals_key, mapping={
+            'last': now, 'mean': mean, 'count': count
+        })
+        pipe.expire(self.arrivals_key, CRAWL_FINISHED_TIMEOUT)
+        pipe.set(self.key, now, px=int(window * 1000))
+        pipe.delete(self.finished_key)
+        pipe.execute()
+
+    def finish(self):
+        """
+        Registers the end of the crawl reported by scrasync. The activity key
+        expires after QUIESCENCE_MIN seconds, leaving time for the pages that
+        are still in the queue.
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(self.arrivals_key, 'done', 1)
+        pipe.expire(self.arrivals_key, CRAWL_FINISHED_TIMEOUT)
+        pipe.set(self.key, time.time(), px=QUIESCENCE_MIN * 1000, xx=True)
+        pipe.execute()
+
+    def is_active(self) -> bool:
+        """ Returns True if the crawler wrote pages in the last
+            SECONDS_AFTER_LAST_CALL seconds.
+        """
+        return bool(self.redis.exists(self.key))
+
+    def claim(self) -> bool:
+        """
+        Returns True for the first caller after the crawl quiesced. The event
+        listener and the polling safety net both report the end of a crawl;
+        this makes sure that it is handled once.
+        """
+        if self.is_active():
+            return False
+        return bool(self.redis.set(
+            self.finished_key, time.time(), nx=True,
+            ex=CRAWL_FINISHED_TIMEOUT
+        ))
+
+    def is_finished(self) -> bool:
+        """ Returns True if the end of the crawl was claimed. """
+        return bool(self.redis.exists(self.finished_key))
+
+    @staticmethod
+    def containerid_from_key(key: (bytes, str)) -> typing.Optional[int]:
+        """ Returns the container id of an activity key, or None for other
+            keys.
+        """
+        if isinstance(key, bytes):
+            key = key.decode('utf-8')
+        if not key.startswith(ACTIVITY_PREFIX):
+            return None
+        try:
+            return int(key[len(ACTIVITY_PREFIX):])
+        except ValueError:
+            return None
+
+    @classmethod
+    def enable_notifications(cls, connection):
+        """
+        Enables the notifications for expired keys on the redis server. If
+        CONFIG is not allowed, notify-keyspace-events has to contain "Ex" in
+        the configuration of the server.
+        """
+        try:
+            flags = connection.config_get('notify-keyspace-events').get(
+                'notify-keyspace-events', '')
+            missing = ''.join(
+                _ for _ in 'Ex' if _ not in flags and not (
+                    _ == 'x' and 'A' in flags)
+            )
+            if missing:
+                connection.config_set(
+                    'notify-keyspace-events', flags + missing)
+        except ResponseError:
+            pass
+
+    @classmethod
+    def listen(cls) -> typing.Iterator[int]:
+        """
+        Yields the container ids of the crawls that quiesced. The listener
+        registers itself every CRAWL_LISTENER_HEARTBEAT seconds, so that
+        monitor_crawl knows whether the events are handled.
+        """
+        connection = RedisConnect().connection
+        cls.enable_notifications(connection)
+        pubsub = connection.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(EXPIRED_CHANNEL)
+        while True:
+            connection.set(
+                LISTENER_KEY, time.time(), ex=2 * CRAWL_LISTENER_HEARTBEAT)
+            message = pubsub.get_message(timeout=CRAWL_LISTENER_HEARTBEAT)
+            if not message:
+                continue
+            containerid = cls.containerid_from_key(message.get('data'))
+            if containerid is not None:
+                yield containerid
+
+    @staticmethod
+    def listener_is_running() -> bool:
+        """ Returns True if a listener of the crawl events is running. """
+        return bool(RedisConnect().connection.exists(LISTENER_KEY))
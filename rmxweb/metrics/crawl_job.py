@@ -0,0 +1,62 @@
+"""
+The crawl jobs, saved in redis. A job is created when a crawl is sent to
+scrasync, without waiting for scrasync; the callback of launch_crawl adds the
+crawlid to the job, or marks it as failed. The clients poll the job resource.
+"""
+import time
+import typing
+
+from .redis import RedisConnect
+from rmxweb.config import CRAWL_FINISHED_TIMEOUT
+
+
+PENDING = 'PENDING'
+LAUNCHED = 'LAUNCHED'
+FAILED = 'FAILED'
+
+
+class CrawlJob(object):
+
+    def __init__(self, jobid: str = None):
+        """
+        Instantiating the CrawlJob. The job is a redis hash with the fields:
+        containerid, state, crawlid, created.
+
+        :param jobid: the id of the launch_crawl task
+        """
+        self.jobid = jobid
+        self.key = f'crawl_job_{jobid}'
+        self.redis = RedisConnect().connection
+
+    def _update(self, **fields):
+        pipe = self.redis.pipeline()
+        pipe.hset(self.key, mapping=fields)
+        pipe.expire(self.key, CRAWL_FINISHED_TIMEOUT)
+        pipe.execute()
+
+    def create(self, containerid: int = None):
+        self._update(containerid=containerid, state=PENDING,
+                     created=time.time())
+
+    def launched(self, crawlid: str = None):
+        """ Called when scrasync returned the crawlid. """
+        self._update(state=LAUNCHED, crawlid=crawlid or '')
+
+    def failed(self):
+        self._update(state=FAILED)
+
+    def get(self) -> typing.Optional[dict]:
+        """ Returns the job, or None if it doesn't exist. """
+        job = {
+            key.decode(): value.decode() for key, value in
+            self.redis.hgetall(self.key).items()
+        }
+        if not job:
+            return None
+        return {
+            'jobid': self.jobid,
+            'containerid': int(job['containerid']),
+            'state': job['state'],
+            'crawlid': job.get('crawlid') or None,
+            'created': float(job['created']),
+        }
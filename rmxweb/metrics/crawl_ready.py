@@ -1,5 +1,6 @@
 
 from .config import CREATE_DATA_PREFIX
+from .crawl_activity import CrawlActivity
 from .query import LastCall
 
 
@@ -15,7 +16,9 @@ class CrawlReady(object):
         """
         self.stats = LastCall(
             dtype=CREATE_DATA_PREFIX,
-            containerid=containerid
+            containerid=containerid,
+            time_after_last_call=CrawlActivity(
+                containerid=containerid).quiescence_window()
         )
 
     def __call__(self):
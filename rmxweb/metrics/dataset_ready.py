@@ -5,13 +5,18 @@ from .query import RunningProcess
 
 class DatasetReady(object):
 
-    def __init__(self, containerid: int = None):
+    def __init__(self, containerid: int = None, prefetch: bool = True):
 
         self.stats = RunningProcess(
             containerid=containerid,
             callback_dtype=CRAWL_CALLBACK_PREFIX,
-            run_dtype=CRAWL_RUN_PREFIX
+            run_dtype=CRAWL_RUN_PREFIX,
+            prefetch=prefetch
         )
 
     def __call__(self):
         return self.stats.status()
+
+    async def status_async(self):
+        """ The status, retrieved with the asyncio client of redis. """
+        return await self.stats.status_async()
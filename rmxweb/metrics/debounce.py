@@ -0,0 +1,63 @@
+"""
+Debouncing of requests, saved in redis so that it works across workers. The
+requests made within the window of the previous one are coalesced into a
+single trailing execution.
+"""
+import time
+
+from .redis import RedisConnect
+
+
+class Debounce(object):
+
+    def __init__(self, name: str = None, containerid: int = None,
+                 window: float = None):
+        """
+        Instantiating the Debounce.
+
+        :param name: the name of the debounced action
+        :param containerid:
+        :param window: the time in seconds without requests before the action
+         runs
+        """
+        self.window = window
+        self.due_key = f'{name}_due_containerid_{containerid}'
+        self.scheduled_key = f'{name}_scheduled_containerid_{containerid}'
+        self.redis = RedisConnect().connection
+
+    @property
+    def timeout(self) -> int:
+        """ The expiry of the keys, in case the trailing task is lost. """
+        return int(self.window * 4) + 1
+
+    def request(self) -> bool:
+        """
+        Registers a request and moves the execution to the end of the window.
+        Returns True if no execution is scheduled, in which case the caller
+        schedules one after `window` seconds.
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.set(self.due_key, time.time() + self.window, ex=self.timeout)
+        pipe.set(self.scheduled_key, 1, nx=True, ex=self.timeout)
+        return bool(pipe.execute()[1])
+
+    def remaining(self) -> float:
+        """ Returns the seconds left before the execution is due. """
+        due = self.redis.get(self.due_key)
+        if not due:
+            return 0
+        return float(due) - time.time()
+
+    def postpone(self):
+        """ Keeps the execution scheduled while it is postponed. """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.expire(self.due_key, self.timeout)
+        pipe.expire(self.scheduled_key, self.timeout)
+        pipe.execute()
+
+    def clear(self):
+        """
+        Clears the requests before the action runs; requests that come after
+        this schedule a new execution.
+        """
+        self.redis.delete(self.due_key, self.scheduled_key)
@@ -2,6 +2,9 @@
 from functools import wraps
 import time
 
+from .config import ENTER, EXIT
+from .eta import record_stage
+from .events import ContainerEvents
 from .namespace import Namespace
 from .redis import RedisConnect
 
@@ -9,6 +12,9 @@ from .redis import RedisConnect
 def register_metrics(*dtype):
     """
     Decorator to register function and task in metrics that are saved in redis.
+    The exit of a callback records the duration of its stage (see
+    metrics.eta). The records are published as events of the container (see
+    metrics.events).
 
     :param dtype:
     :return:
@@ -32,10 +38,18 @@ def register_metrics(*dtype):
                 base = Namespace(dtype=item)
                 base.process_parameters(**kwds)
                 namespace.append(base)
-                redis_db.set(base.enter_name, time.time())
+                enter_time = time.time()
+                redis_db.set(base.enter_name, enter_time)
+                ContainerEvents(base.containerid).publish(
+                    base.dtype, ENTER, base.features, enter_time)
             out = func(*args, **kwds)
             for base in namespace:
-                redis_db.set(base.exit_name, time.time())
+                exit_time = time.time()
+                redis_db.set(base.exit_name, exit_time)
+                record_stage(base.dtype, base.containerid, base.features,
+                             exit_time)
+                ContainerEvents(base.containerid).publish(
+                    base.dtype, EXIT, base.features, exit_time)
             return out
         return wrapped
     return inner
@@ -8,12 +8,17 @@ from .query import RunningProcess
 
 class DendrogramReady(object):
 
-    def __init__(self, containerid: int = None):
+    def __init__(self, containerid: int = None, prefetch: bool = True):
         self.stats = RunningProcess(
             run_dtype=COMPUTE_DENDROGRAM_RUN_PREFIX,
             callback_dtype=COMPUTE_DENDROGRAM_CALLBACK_PREFIX,
-            containerid=containerid
+            containerid=containerid,
+            prefetch=prefetch
         )
 
     def __call__(self, *args, **kwargs):
         return self.stats.status()
+
+    async def status_async(self):
+        """ The status, retrieved with the asyncio client of redis. """
+        return await self.stats.status_async()
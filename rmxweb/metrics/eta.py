@@ -0,0 +1,168 @@
+"""
+Estimated time of arrival of the stages of a container: crawl, integrity
+check, matrix and dendrogram. The duration of a stage, from the enter record
+of its run to the exit record of its callback (see register_metrics), is
+recorded against the size of the container (the number of data objects). A
+line fitted by least squares on the last ETA_SAMPLES durations of the stage
+gives the expected duration for a size.
+
+The estimate gives the busy responses their ETA and their Retry-After.
+"""
+import statistics
+import time
+import typing
+
+from django.apps import apps
+
+from .config import (
+    COMPUTE_DENDROGRAM_CALLBACK_PREFIX,
+    COMPUTE_DENDROGRAM_RUN_PREFIX,
+    COMPUTE_MATRIX_CALLBACK_PREFIX,
+    COMPUTE_MATRIX_RUN_PREFIX,
+    CRAWL_CALLBACK_PREFIX,
+    CRAWL_RUN_PREFIX,
+    INTEGRITY_CHECK_CALLBACK_PREFIX,
+    INTEGRITY_CHECK_RUN_PREFIX,
+)
+from .namespace import Namespace
+from .redis import RedisConnect
+from rmxweb.config import (
+    ETA_RETRY_DEFAULT,
+    ETA_RETRY_MAX,
+    ETA_RETRY_MIN,
+    ETA_SAMPLES,
+)
+
+
+CRAWL = 'crawl'
+INTEGRITY_CHECK = 'integrity_check'
+MATRIX = 'matrix'
+DENDROGRAM = 'dendrogram'
+
+# the run and callback prefixes of the stages
+STAGES = {
+    CRAWL: (CRAWL_RUN_PREFIX, CRAWL_CALLBACK_PREFIX),
+    INTEGRITY_CHECK: (
+        INTEGRITY_CHECK_RUN_PREFIX, INTEGRITY_CHECK_CALLBACK_PREFIX),
+    MATRIX: (COMPUTE_MATRIX_RUN_PREFIX, COMPUTE_MATRIX_CALLBACK_PREFIX),
+    DENDROGRAM: (
+        COMPUTE_DENDROGRAM_RUN_PREFIX, COMPUTE_DENDROGRAM_CALLBACK_PREFIX),
+}
+CALLBACK_STAGES = {callback: stage for stage, (_, callback) in STAGES.items()}
+
+
+def container_size(containerid: int = None) -> int:
+    """ Returns the number of data objects of a container. """
+    return apps.get_model('data', 'Data').objects.filter(
+        container_id=containerid).count()
+
+
+class StageDurations(object):
+
+    def __init__(self, stage: str = None):
+        """
+        Instantiating StageDurations. The durations are saved in a redis list
+        as "size:duration".
+
+        :param stage: one of the keys of STAGES
+        """
+        if stage not in STAGES:
+            raise ValueError(f'"{stage}" is not in {tuple(STAGES)}')
+        self.stage = stage
+        self.key = f'stage_durations_{stage}'
+        self.redis = RedisConnect().connection
+
+    def record(self, size: int = None, duration: float = None):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lpush(self.key, f'{size}:{duration}')
+        pipe.ltrim(self.key, 0, ETA_SAMPLES - 1)
+        pipe.execute()
+
+    def samples(self) -> typing.List[typing.Tuple[float, float]]:
+        return [
+            tuple(float(_) for _ in item.decode().split(':'))
+            for item in self.redis.lrange(self.key, 0, -1)
+        ]
+
+    def fit(self) -> typing.Optional[typing.Tuple[float, float]]:
+        """
+        Returns the intercept and the slope of the duration as a function of
+        the size; the slope is 0 until two sizes were recorded. Returns None
+        if there are no durations.
+        """
+        samples = self.samples()
+        if not samples:
+            return None
+        sizes, durations = zip(*samples)
+        if len(set(sizes)) < 2:
+            return statistics.fmean(durations), 0.
+        slope, intercept = statistics.linear_regression(sizes, durations)
+        return intercept, slope
+
+    def predict(self, size: int = None) -> typing.Optional[float]:
+        """ Returns the expected duration for a size, or None. """
+        model = self.fit()
+        if model is None:
+            return None
+        intercept, slope = model
+        return max(intercept + slope * size, 0.)
+
+
+def record_stage(dtype: str = None, containerid: int = None,
+                 features: int = None, exit_time: float = None):
+    """
+    Records the duration of a stage when its callback exits. A run is
+    measured once, even if its callback is called several times.
+
+    :param dtype: the prefix of the callback
+    :param containerid:
+    :param features:
+    :param exit_time: the time of the exit record of the callback
+    """
+    stage = CALLBACK_STAGES.get(dtype)
+    if not stage:
+        return
+    run = Namespace(dtype=STAGES[stage][0], containerid=containerid,
+                    features=features)
+    redis = RedisConnect().connection
+    enter = redis.get(run.enter_name)
+    if not enter:
+        return
+    measured_key = f'{run.enter_name}_measured'
+    if redis.getset(measured_key, enter) == enter:
+        return
+    redis.expire(measured_key, 24 * 60 * 60)
+    StageDurations(stage).record(
+        size=container_size(containerid),
+        duration=max(exit_time - float(enter), 0.)
+    )
+
+
+def estimate(stage: str = None, containerid: int = None,
+             features: int = None) -> dict:
+    """
+    Returns the estimate for a stage of a container: the time when its run
+    started, the expected duration for the size of the container, the ETA as
+    a timestamp, and the time in seconds after which the client should ask
+    again (between ETA_RETRY_MIN and ETA_RETRY_MAX).
+    """
+    run = Namespace(dtype=STAGES[stage][0], containerid=containerid,
+                    features=features)
+    now = time.time()
+    started = RedisConnect().get(run.enter_name)
+    started = float(started) if started else None
+    size = container_size(containerid)
+    expected = StageDurations(stage).predict(size)
+    eta = None
+    if expected is not None:
+        eta = (started or now) + expected
+    retry_after = ETA_RETRY_DEFAULT if eta is None else eta - now
+    return {
+        'stage': stage,
+        'size': size,
+        'started': started,
+        'expected_duration': expected,
+        'eta': eta,
+        'retry_after': int(min(max(retry_after, ETA_RETRY_MIN),
+                               ETA_RETRY_MAX)),
+    }
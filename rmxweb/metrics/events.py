@@ -0,0 +1,87 @@
+"""
+The events of the containers, published on a redis channel per container by
+register_metrics: every enter and exit record of a run or of a callback is a
+transition of a stage (see metrics.eta), and every page written by the
+crawler is a progress event of the crawl. The events are streamed to the
+clients as server-sent events by container.async_views.events, under ASGI.
+"""
+import json
+import time
+import typing
+
+from .config import CREATE_DATA_PREFIX, ENTER
+from .eta import CRAWL, STAGES
+from .redis import AsyncRedisConnect, RedisConnect
+
+
+STARTED = 'started'
+SENT = 'sent'
+CALLBACK = 'callback'
+FINISHED = 'finished'
+PROGRESS = 'progress'
+
+# the stage and the state of a stage for the prefixes and the records
+TRANSITIONS = {CREATE_DATA_PREFIX: (CRAWL, PROGRESS, PROGRESS)}
+for _stage, (_run, _callback) in STAGES.items():
+    TRANSITIONS[_run] = (_stage, STARTED, SENT)
+    TRANSITIONS[_callback] = (_stage, CALLBACK, FINISHED)
+
+
+class ContainerEvents(object):
+
+    def __init__(self, containerid: int = None):
+        """
+        Instantiating ContainerEvents.
+
+        :param containerid:
+        """
+        self.containerid = containerid
+        self.channel = f'events_containerid_{containerid}'
+
+    def event(self, dtype: str = None, record: str = None,
+              features: int = None, timestamp: float = None
+              ) -> typing.Optional[dict]:
+        """
+        Returns the event of a record, or None.
+
+        :param dtype: the prefix of the record
+        :param record: ENTER or EXIT
+        :param features:
+        :param timestamp:
+        """
+        if dtype not in TRANSITIONS or self.containerid is None:
+            return None
+        stage, on_enter, on_exit = TRANSITIONS[dtype]
+        return {
+            'containerid': self.containerid,
+            'stage': stage,
+            'state': on_enter if record == ENTER else on_exit,
+            'dtype': dtype,
+            'features': features,
+            'time': timestamp or time.time(),
+        }
+
+    def publish(self, dtype: str = None, record: str = None,
+                features: int = None, timestamp: float = None):
+        """ Publishes the event of a record. """
+        event = self.event(dtype, record, features, timestamp)
+        if event:
+            RedisConnect().connection.publish(self.channel, json.dumps(event))
+
+    async def subscribe_async(self):
+        """ Subscribes to the events; the caller closes the pubsub. """
+        pubsub = AsyncRedisConnect().connection.pubsub(
+            ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.channel)
+        return pubsub
+
+    @staticmethod
+    async def listen_async(pubsub=None, timeout: float = None
+                           ) -> typing.AsyncIterator[typing.Optional[dict]]:
+        """
+        Yields the events received by a pubsub (see subscribe_async), and None
+        when no event came in `timeout` seconds.
+        """
+        while True:
+            message = await pubsub.get_message(timeout=timeout)
+            yield json.loads(message['data']) if message else None
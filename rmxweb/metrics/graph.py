@@ -5,13 +5,19 @@ from .query import RunningProcess
 
 class GraphReady(object):
 
-    def __init__(self, containerid: int = None, features: int = None):
+    def __init__(self, containerid: int = None, features: int = None,
+                 prefetch: bool = True):
         self.stats = RunningProcess(
             callback_dtype=COMPUTE_MATRIX_CALLBACK_PREFIX,
             run_dtype=COMPUTE_MATRIX_RUN_PREFIX,
             containerid=containerid,
-            features=features
+            features=features,
+            prefetch=prefetch
         )
 
     def __call__(self, *args, **kwargs):
         return self.stats.status()
+
+    async def status_async(self):
+        """ The status, retrieved with the asyncio client of redis. """
+        return await self.stats.status_async()
@@ -5,12 +5,17 @@ from .query import RunningProcess
 
 class IntegrityCheckReady(object):
 
-    def __init__(self, containerid: int = None):
+    def __init__(self, containerid: int = None, prefetch: bool = True):
         self.stats = RunningProcess(
             containerid=containerid,
             callback_dtype=INTEGRITY_CHECK_CALLBACK_PREFIX,
-            run_dtype=INTEGRITY_CHECK_RUN_PREFIX
+            run_dtype=INTEGRITY_CHECK_RUN_PREFIX,
+            prefetch=prefetch
         )
 
     def __call__(self):
         return self.stats.status()
+
+    async def status_async(self):
+        """ The status, retrieved with the asyncio client of redis. """
+        return await self.stats.status_async()
@@ -0,0 +1,181 @@
+"""
+Priority lanes of the tasks sent through celery. Interactive requests
+(features, graphs, dendrograms), background work (matrices of the pipeline,
+integrity checks) and bulk work (ingestion, maintenance) are published with
+priorities taken from separate bands (PRIORITY_LANES). Within its band, a
+container that sent many tasks recently is moved down, so that one big crawl
+doesn't starve the other containers.
+
+Only the queues in PRIORITY_QUEUES get priorities; the tasks sent to the
+queues of other services (nlp, scrasync, rmxgrep, rmxcluster) are published
+with priority 0, the only one that their workers are sure to read.
+
+The time spent by the tasks in the queue is recorded per lane.
+"""
+from datetime import datetime
+import statistics
+import time
+import typing
+
+from celery import current_task, signals
+from celery.app.routes import MapRoute
+
+from .config import LANE_BACKGROUND, LANE_BULK
+from .redis import RedisConnect
+from rmxweb.celery_settings import TASK_QUEUES
+from rmxweb.config import (
+    LANE_FAIRNESS_QUANTUM,
+    LANE_FAIRNESS_WINDOW,
+    LANE_WAIT_SAMPLES,
+    PRIORITY_LANES,
+    PRIORITY_QUEUES,
+)
+
+
+# prefixes of the task names that run in the bulk lane; the other tasks run
+# in the background lane, unless the caller chooses another one.
+BULK_PREFIXES = ('data.',)
+
+QUEUES = MapRoute(TASK_QUEUES)
+
+
+class Lane(object):
+
+    def __init__(self, name: str = None, containerid: int = None):
+        """
+        Instantiating the Lane.
+
+        :param name: one of the keys of PRIORITY_LANES
+        :param containerid:
+        """
+        if name not in PRIORITY_LANES:
+            raise ValueError(f'"{name}" is not in {tuple(PRIORITY_LANES)}')
+        self.name = name
+        self.containerid = containerid
+        self.redis = RedisConnect().connection
+
+    @staticmethod
+    def of_task(name: str = None) -> str:
+        """ Returns the default lane of a task. """
+        if name.startswith(BULK_PREFIXES):
+            return LANE_BULK
+        return LANE_BACKGROUND
+
+    @staticmethod
+    def of_priority(priority: int = None) -> typing.Optional[str]:
+        """ Returns the lane of a priority, or None. """
+        for name, (low, high) in PRIORITY_LANES.items():
+            if priority is not None and low <= priority <= high:
+                return name
+        return None
+
+    @property
+    def key(self):
+        return f'lane_{self.name}_containerid_{self.containerid}'
+
+    @property
+    def wait_key(self):
+        return f'lane_wait_{self.name}'
+
+    def priority(self) -> int:
+        """
+        Registers a task of the container in the lane and returns its
+        priority. The container moves one step down the band for every
+        LANE_FAIRNESS_QUANTUM tasks sent in the last LANE_FAIRNESS_WINDOW
+        seconds.
+        """
+        low, high = PRIORITY_LANES[self.name]
+        if self.containerid is None:
+            return low
+        count = self.redis.incr(self.key)
+        if count == 1:
+            self.redis.expire(self.key, LANE_FAIRNESS_WINDOW)
+        return min(high, low + (count - 1) // LANE_FAIRNESS_QUANTUM)
+
+    def options(self) -> dict:
+        """ Returns the options of send_task for a task in the lane. """
+        return {'priority': self.priority()}
+
+    def record_wait(self, wait: float = None):
+        """ Records the time spent by a task in the queue. """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lpush(self.wait_key, wait)
+        pipe.ltrim(self.wait_key, 0, LANE_WAIT_SAMPLES - 1)
+        pipe.execute()
+
+    def wait_stats(self) -> dict:
+        """
+        Returns statistics on the last LANE_WAIT_SAMPLES times spent in the
+        queue, in seconds.
+        """
+        waits = sorted(
+            float(_) for _ in self.redis.lrange(self.wait_key, 0, -1))
+        if not waits:
+            return {'lane': self.name, 'count': 0}
+        return {
+            'lane': self.name,
+            'count': len(waits),
+            'mean': statistics.fmean(waits),
+            'median': statistics.median(waits),
+            'p95': waits[int(.95 * (len(waits) - 1))],
+            'max': waits[-1],
+        }
+
+
+def inherits_priority() -> bool:
+    """
+    Returns True if the task is sent by a task that has a priority; the task
+    takes the priority of its parent (task_inherit_parent_priority).
+    """
+    parent = current_task
+    if not parent or not parent.request.delivery_info:
+        return False
+    return parent.request.delivery_info.get('priority') is not None
+
+
+def route_task(name, args, kwargs, options, task=None, **_):
+    """
+    Router of the tasks (task_routes). The queue comes from TASK_QUEUES, the
+    priority from the lane of the task, unless the caller or the parent task
+    gave one. The tasks for the queues of other services get priority 0,
+    which the parent task can't override.
+    """
+    route = QUEUES(name) or {}
+    if route.get('queue') not in PRIORITY_QUEUES:
+        route['priority'] = 0
+    elif options.get('priority') is None and not inherits_priority():
+        route['priority'] = Lane(
+            Lane.of_task(name), (kwargs or {}).get('containerid')
+        ).priority()
+    return route
+
+
+@signals.before_task_publish.connect
+def stamp_lane(headers=None, properties=None, routing_key=None, **_):
+    """
+    Adds the lane and the time of publication to the headers of the tasks
+    sent to the queues in PRIORITY_QUEUES.
+    """
+    if routing_key not in PRIORITY_QUEUES:
+        return
+    lane = Lane.of_priority((properties or {}).get('priority'))
+    if lane and headers is not None:
+        headers['lane'] = lane
+        headers['enqueued'] = time.time()
+
+
+@signals.task_prerun.connect
+def record_wait(task=None, **_):
+    """
+    Records the time spent in the queue by the tasks that have a lane. For
+    tasks sent with a countdown, the time is counted from the eta.
+    """
+    lane = getattr(task.request, 'lane', None)
+    enqueued = getattr(task.request, 'enqueued', None)
+    if lane not in PRIORITY_LANES or enqueued is None:
+        return
+    start = float(enqueued)
+    if task.request.eta:
+        start = max(
+            start, datetime.fromisoformat(task.request.eta).timestamp())
+    Lane(lane).record_wait(max(0., time.time() - start))
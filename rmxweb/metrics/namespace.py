@@ -1,11 +1,16 @@
 
 from hashlib import blake2b
 import time
+import typing
 
 from django.db.models import Model
 
 from .config import ENTER, EXIT, PROG_PREFIXES
-from .redis import RedisConnect
+from .redis import AsyncRedisConnect, RedisConnect
+
+
+# the number of keys read by one MGET (see Q.fetch_many)
+MGET_CHUNK = 500
 
 
 class Namespace(object):
@@ -92,17 +97,74 @@ class Namespace(object):
 class Q(object):
     """Basic methods to query the redis database for metrics."""
 
-    def __init__(self, metrics_names: tuple = None):
+    def __init__(self, metrics_names: tuple = None, result: dict = None):
         """
         Instantiating the Query object. It takes a list with metrics names that
         will be retrieved from the data store.
 
         :param metrics_names: list with names of metrics
         :type metrics_names: list
+        :param result: the metrics, when they were already retrieved
         """
         self.metrics_names = metrics_names
         self.redis = RedisConnect()
-        self.result = self.get_metrics()
+        self.result = self.get_metrics() if result is None else result
+        # the records to delete with the asyncio client (see fetch)
+        self.outdated = None
+
+    @classmethod
+    async def fetch(cls, metrics_names: tuple = None):
+        """
+        Retrieves the metrics with the asyncio client and returns the Query
+        object. The records are then deleted by delete_outdated.
+        """
+        values = await AsyncRedisConnect().mget(list(metrics_names))
+        q = cls(metrics_names=metrics_names, result={
+            key: cls.get_timestamp_value(value)
+            for key, value in zip(metrics_names, values) if value
+        })
+        q.outdated = []
+        return q
+
+    @classmethod
+    def fetch_many(cls, names: typing.List[tuple] = None) -> list:
+        """
+        Retrieves the metrics of several queries in one round trip: the keys
+        are read by MGETs of MGET_CHUNK keys, sent in a pipeline. Returns a
+        Query object per tuple of metrics names; the records are then deleted
+        by delete_many.
+        """
+        keys = list(dict.fromkeys(_ for metrics_names in names
+                                  for _ in metrics_names))
+        pipe = RedisConnect().connection.pipeline(transaction=False)
+        for idx in range(0, len(keys), MGET_CHUNK):
+            pipe.mget(keys[idx:idx + MGET_CHUNK])
+        values = dict(zip(
+            keys, (_ for chunk in pipe.execute() for _ in chunk)))
+        queries = []
+        for metrics_names in names:
+            q = cls(metrics_names=metrics_names, result={
+                key: cls.get_timestamp_value(values[key])
+                for key in metrics_names if values[key]
+            })
+            q.outdated = []
+            queries.append(q)
+        return queries
+
+    @staticmethod
+    def delete_many(queries: list = None):
+        """ Deletes the records passed to del_record after fetch_many. """
+        outdated = {_ for q in queries for _ in q.outdated or ()}
+        if outdated:
+            RedisConnect().connection.delete(*outdated)
+        for q in queries:
+            q.outdated = []
+
+    async def delete_outdated(self):
+        """ Deletes the records passed to del_record after fetch. """
+        if self.outdated:
+            await AsyncRedisConnect().connection.delete(*self.outdated)
+            self.outdated = []
 
     def __call__(self):
 
@@ -129,6 +191,9 @@ class Q(object):
         :param key:
         :return:
         """
+        if self.outdated is not None:
+            self.outdated.append(key)
+            return
         self.redis.delete(key)
 
     @staticmethod
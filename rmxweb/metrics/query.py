@@ -111,6 +111,7 @@ class RunningProcess(object):
             callback_dtype: str = None,
             containerid: int = None,
             features: int = None,
+            prefetch: bool = True,
             **kwds
     ):
         """
@@ -119,6 +120,8 @@ class RunningProcess(object):
         :param callback_dtype:
         :param containerid:
         :param features:
+        :param prefetch: retrieves the metrics; otherwise they are retrieved
+         by status_async
         :param kwds:
         """
         # run namespace
@@ -135,7 +138,7 @@ class RunningProcess(object):
             features=features,
             **kwds
         )
-        self.q = Q(metrics_names=self.metrics_names)
+        self.q = Q(metrics_names=self.metrics_names) if prefetch else None
 
     @property
     def metrics_names(self):
@@ -162,6 +165,13 @@ class RunningProcess(object):
             "record": timestamp
         }
 
+    async def status_async(self):
+        """ Retrieves the metrics with the asyncio client; see status. """
+        self.q = await Q.fetch(metrics_names=self.metrics_names)
+        status = self.status()
+        await self.q.delete_outdated()
+        return status
+
     def status(self):
         """
 
@@ -0,0 +1,54 @@
+"""
+The readiness of many containers at once: the dataset (crawl), the integrity
+check, the dendrogram and the matrices of feature numbers. The metrics of the
+whole batch are read from redis in one round trip (see Q.fetch_many).
+"""
+import typing
+
+from .dataset_ready import DatasetReady
+from .dendrogram import DendrogramReady
+from .graph import GraphReady
+from .integrity_check import IntegrityCheckReady
+from .namespace import Q
+
+
+# the readiness classes of a container
+CHECKS = {
+    'dataset': DatasetReady,
+    'integrity_check': IntegrityCheckReady,
+    'dendrogram': DendrogramReady,
+}
+
+
+def readiness(containers: typing.Dict[int, typing.Iterable[int]] = None
+              ) -> typing.Dict[int, dict]:
+    """
+    Returns the readiness of the containers.
+
+    :param containers: the container ids to the feature numbers whose
+     matrices are checked (GraphReady)
+    :return: container id to {'dataset': status, 'integrity_check': status,
+     'dendrogram': status, 'graph': {features: status}}
+    """
+    checks = []
+    for containerid, features in containers.items():
+        for name, cls in CHECKS.items():
+            checks.append((containerid, name, None,
+                           cls(containerid=containerid, prefetch=False)))
+        for _ in features or ():
+            checks.append((containerid, 'graph', _, GraphReady(
+                containerid=containerid, features=_, prefetch=False)))
+    queries = Q.fetch_many(
+        [check.stats.metrics_names for *_, check in checks])
+    out = {
+        containerid: {**{name: None for name in CHECKS}, 'graph': {}}
+        for containerid in containers
+    }
+    for (containerid, name, features, check), q in zip(checks, queries):
+        check.stats.q = q
+        if name == 'graph':
+            out[containerid]['graph'][features] = check()
+        else:
+            out[containerid][name] = check()
+    Q.delete_many(queries)
+    return out
@@ -1,5 +1,9 @@
 
+import asyncio
+import weakref
+
 from redis import ConnectionPool, Redis
+from redis import asyncio as aioredis
 
 from rmxweb.config import (
     METRICS_HOST_NAME, METRICS_DB_NUMBER, METRICS_PASS, METRICS_PORT
@@ -7,6 +11,8 @@ from rmxweb.config import (
 
 
 CONNECTION = None
+# the asyncio connections, one per event loop
+ASYNC_CONNECTIONS = weakref.WeakKeyDictionary()
 
 
 class RedisConnect(object):
@@ -43,5 +49,40 @@ class RedisConnect(object):
     def delete(self, key: str):
         return self.connection.delete(key)
 
-    def set(self, key: str, value: (float, str)):
-        return self.connection.set(key, value)
+    def set(self, key: str, value: (float, str), **kwds):
+        return self.connection.set(key, value, **kwds)
+
+
+class AsyncRedisConnect(object):
+    """
+    The asyncio counterpart of RedisConnect, used by the async views. The
+    connections are bound to the event loop that created them.
+    """
+
+    def __init__(self):
+
+        self.connection = self.get_connection()
+
+    @staticmethod
+    def get_connection() -> aioredis.Redis:
+        loop = asyncio.get_running_loop()
+        if loop not in ASYNC_CONNECTIONS:
+            ASYNC_CONNECTIONS[loop] = aioredis.Redis(
+                password=METRICS_PASS,
+                host=METRICS_HOST_NAME,
+                port=METRICS_PORT,
+                db=METRICS_DB_NUMBER,
+            )
+        return ASYNC_CONNECTIONS[loop]
+
+    async def get(self, key: str):
+        return await self.connection.get(key)
+
+    async def mget(self, keys: list):
+        return await self.connection.mget(keys)
+
+    async def delete(self, key: str):
+        return await self.connection.delete(key)
+
+    async def set(self, key: str, value: (float, str), **kwds):
+        return await self.connection.set(key, value, **kwds)
@@ -0,0 +1,296 @@
+"""
+Admission control of the expensive nlp jobs (compute_matrices,
+factorize_matrices, compute_dendrogram), saved in redis. A counting semaphore
+per job type lets NLP_JOB_LIMITS[job] jobs run at once; the others wait in a
+queue, in the order of their first request, with the task that sends them.
+When a job is released, the next waiting jobs are admitted and their tasks
+are sent again. Jobs are identified by a token (e.g. the container and the
+feature number of a matrix); one job per token runs at a time, and a waiting
+job is queued once per set of parameters.
+
+The durations of the last jobs give the estimated start time of the waiting
+ones.
+"""
+import hashlib
+import json
+import math
+import statistics
+import time
+import typing
+
+from .redis import RedisConnect
+from rmxweb.celery import celery
+from rmxweb.config import (
+    NLP_JOB_LIMITS,
+    NLP_JOB_TIMEOUT,
+    RMXWEB_TASKS,
+)
+
+
+# the number of durations kept per job type
+DURATION_SAMPLES = 100
+
+
+class NlpSemaphore(object):
+
+    def __init__(self, job: str = None):
+        """
+        Instantiating the NlpSemaphore.
+
+        :param job: one of the keys of NLP_JOB_LIMITS
+        """
+        if job not in NLP_JOB_LIMITS:
+            raise ValueError(f'"{job}" is not in {tuple(NLP_JOB_LIMITS)}')
+        self.job = job
+        self.limit = NLP_JOB_LIMITS[job]
+        # token to the time when the job was admitted
+        self.holders_key = f'semaphore_{job}_holders'
+        # waiter to the time of the first request
+        self.queue_key = f'semaphore_{job}_queue'
+        # waiter to the task that is sent when the job is admitted
+        self.waiters_key = f'semaphore_{job}_waiters'
+        # set while a wake_nlp_jobs task is scheduled
+        self.wake_key = f'semaphore_{job}_wake'
+        self.durations_key = f'semaphore_{job}_durations'
+        self.redis = RedisConnect().connection
+
+    @staticmethod
+    def token(containerid: int = None, features: int = None) -> str:
+        """ The token of a job: a dendrogram or a feature number. """
+        if features is None:
+            return f'containerid_{containerid}'
+        return f'containerid_{containerid}_features_{features}'
+
+    @staticmethod
+    def waiter(token: str = None, task: str = None,
+               kwargs: dict = None) -> typing.Tuple[str, str]:
+        """
+        Returns the name of a waiting job in the queue and the task that is
+        sent when it is admitted. The requests with the same token and
+        parameters share a place.
+        """
+        payload = json.dumps({'task': task, 'kwargs': kwargs or {}},
+                             sort_keys=True)
+        digest = hashlib.blake2b(
+            bytes(payload, 'utf-8'), digest_size=8).hexdigest()
+        return f'{token}:{digest}', payload
+
+    @staticmethod
+    def token_of(waiter: (bytes, str) = None) -> str:
+        """ Returns the token of a waiting job. """
+        if isinstance(waiter, bytes):
+            waiter = waiter.decode('utf-8')
+        return waiter.split(':', 1)[0]
+
+    def purge(self) -> int:
+        """
+        Drops the holders that didn't release in NLP_JOB_TIMEOUT seconds.
+        Returns the number of holders dropped.
+        """
+        return self.redis.zremrangebyscore(
+            self.holders_key, '-inf', time.time() - NLP_JOB_TIMEOUT)
+
+    def next_jobs(self, pipe=None, waiter: str = None) -> typing.List[str]:
+        """
+        Returns the waiting jobs that take the free places, in the order of
+        the queue; a job waits while another job with its token runs.
+
+        :param pipe: the pipeline that watches the keys
+        :param waiter: a job that is not queued yet, counted last
+        """
+        holding = set(
+            _.decode('utf-8') for _ in pipe.zrange(self.holders_key, 0, -1))
+        free = self.limit - len(holding)
+        waiters = [
+            _.decode('utf-8') for _ in pipe.zrange(self.queue_key, 0, -1)]
+        if waiter is not None and waiter not in waiters:
+            waiters.append(waiter)
+        out = []
+        for item in waiters:
+            if len(out) >= free:
+                break
+            token = self.token_of(item)
+            if token not in holding:
+                holding.add(token)
+                out.append(item)
+        return out
+
+    def acquire(self, token: str = None, task: str = None,
+                kwargs: dict = None, supersede: bool = False) -> bool:
+        """
+        Returns True if the job is admitted. Otherwise the job is queued, or
+        keeps its place in the queue, and `task` is sent with `kwargs` and
+        admitted=True once the job is admitted (see wake).
+
+        :param token:
+        :param task: the name of the task that requests the job
+        :param kwargs: the parameters of the task
+        :param supersede: if True, a job with the same token that runs gives
+         its place to this one
+        """
+        waiter, payload = self.waiter(token, task, kwargs)
+
+        def admit(pipe):
+            now = time.time()
+            if supersede and pipe.zscore(self.holders_key, token) is not None:
+                admitted = True
+            else:
+                admitted = waiter in self.next_jobs(pipe, waiter)
+            pipe.multi()
+            if admitted:
+                pipe.zadd(self.holders_key, {token: now})
+                pipe.zrem(self.queue_key, waiter)
+                pipe.hdel(self.waiters_key, waiter)
+                return True
+            pipe.zadd(self.queue_key, {waiter: now}, nx=True)
+            pipe.hset(self.waiters_key, waiter, payload)
+            return False
+
+        if self.purge():
+            self.wake()
+        admitted = self.redis.transaction(
+            admit, self.holders_key, self.queue_key,
+            value_from_callable=True)
+        if not admitted:
+            self.schedule_wake()
+        return admitted
+
+    def wake(self) -> typing.List[dict]:
+        """
+        Admits the next waiting jobs (see next_jobs) and sends their tasks
+        again.
+
+        :return: the tasks that were sent
+        """
+        def admit(pipe):
+            now = time.time()
+            admitted = self.next_jobs(pipe)
+            payloads = pipe.hmget(
+                self.waiters_key, admitted) if admitted else []
+            pipe.multi()
+            if admitted:
+                pipe.zadd(self.holders_key, dict(
+                    (self.token_of(_), now) for _ in admitted))
+                pipe.zrem(self.queue_key, *admitted)
+                pipe.hdel(self.waiters_key, *admitted)
+            return [json.loads(_) for _ in payloads if _]
+
+        tasks = self.redis.transaction(
+            admit, self.holders_key, self.queue_key, self.waiters_key,
+            value_from_callable=True)
+        for item in tasks:
+            celery.send_task(
+                item['task'], kwargs=dict(item['kwargs'], admitted=True))
+        return tasks
+
+    def schedule_wake(self):
+        """
+        Sends wake_nlp_jobs, once per NLP_JOB_TIMEOUT seconds, for the jobs
+        that wait on a holder that never releases.
+        """
+        if self.redis.set(self.wake_key, 1, nx=True, ex=NLP_JOB_TIMEOUT):
+            celery.send_task(
+                RMXWEB_TASKS['wake_nlp_jobs'],
+                kwargs={'job': self.job},
+                countdown=NLP_JOB_TIMEOUT
+            )
+
+    def is_waiting(self) -> bool:
+        """ Returns True if jobs wait in the queue. """
+        return bool(self.redis.zcard(self.queue_key))
+
+    def release(self, token: str = None):
+        """
+        Releases the job, records its duration and admits the next waiting
+        jobs.
+        """
+        started = self.redis.zscore(self.holders_key, token)
+        if started is None:
+            return
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.holders_key, token)
+        pipe.lpush(self.durations_key, time.time() - started)
+        pipe.ltrim(self.durations_key, 0, DURATION_SAMPLES - 1)
+        pipe.execute()
+        self.wake()
+
+    def drop_container(self, containerid: int = None):
+        """ Removes the jobs of a container and admits the next jobs. """
+        prefix = self.token(containerid)
+
+        def of_container(token: str = None) -> bool:
+            return token == prefix or token.startswith(f'{prefix}_')
+
+        holders = [
+            _ for _ in self.redis.zrange(self.holders_key, 0, -1)
+            if of_container(_.decode())
+        ]
+        waiters = [
+            _ for _ in self.redis.zrange(self.queue_key, 0, -1)
+            if of_container(self.token_of(_))
+        ]
+        if not holders and not waiters:
+            return
+        pipe = self.redis.pipeline()
+        if holders:
+            pipe.zrem(self.holders_key, *holders)
+        if waiters:
+            pipe.zrem(self.queue_key, *waiters)
+            pipe.hdel(self.waiters_key, *waiters)
+        pipe.execute()
+        self.wake()
+
+    def mean_duration(self) -> float:
+        """
+        The mean duration of the last jobs; NLP_JOB_TIMEOUT until a job
+        finished.
+        """
+        durations = [
+            float(_) for _ in self.redis.lrange(self.durations_key, 0, -1)]
+        return statistics.fmean(durations) if durations else NLP_JOB_TIMEOUT
+
+    def status(self, token: str = None) -> typing.Optional[dict]:
+        """
+        Returns the position of a waiting job in the queue (0 is the next job)
+        and its estimated start time, as a timestamp; the jobs ahead start by
+        batches of `limit`, one mean duration apart. Returns None if the job
+        is not waiting.
+        """
+        position = next((
+            idx for idx, _ in enumerate(
+                self.redis.zrange(self.queue_key, 0, -1))
+            if self.token_of(_) == token
+        ), None)
+        if position is None:
+            return None
+        return {
+            'job': self.job,
+            'position': position,
+            'eta': time.time() + math.ceil(
+                (position + 1) / self.limit) * self.mean_duration(),
+        }
+
+
+def release(token: str = None, jobs: typing.Iterable[str] = None):
+    """ Releases a job in the semaphores of the job types. """
+    for job in jobs or NLP_JOB_LIMITS:
+        NlpSemaphore(job).release(token)
+
+
+def drop_container(containerid: int = None):
+    """ Removes the jobs of a deleted container from the semaphores. """
+    for job in NLP_JOB_LIMITS:
+        NlpSemaphore(job).drop_container(containerid)
+
+
+def admission(token: str = None,
+              jobs: typing.Iterable[str] = None) -> typing.Optional[dict]:
+    """
+    Returns the status of a job waiting in the queue of one of the job types,
+    or None.
+    """
+    for job in jobs or NLP_JOB_LIMITS:
+        status = NlpSemaphore(job).status(token)
+        if status:
+            return status
+    return None
@@ -0,0 +1,67 @@
+"""
+Single-flight guard, saved in redis, for the computation of matrices. Only the
+first request for a set of parameters sends the computation to nlp; the
+requests that come while it is in flight attach to it. The guard is cleared by
+the callback of the computation, or expires after MATRIX_FLIGHT_TIMEOUT
+seconds if the callback is lost.
+"""
+import time
+import typing
+
+from .redis import RedisConnect
+from rmxweb.config import MATRIX_FLIGHT_TIMEOUT
+
+
+class MatrixFlight(object):
+
+    def __init__(self, containerid: int = None, features: int = None):
+        """
+        Instantiating the MatrixFlight. Every flight for a container and a
+        feature number is saved in its own redis key, one per set of the
+        other parameters, that expires on its own; a redis set holds the
+        keys of the feature number.
+
+        :param containerid:
+        :param features:
+        """
+        self.key = f'matrix_flight_containerid_{containerid}_' \
+                   f'features_{features}'
+        self.redis = RedisConnect().connection
+
+    def flight_key(self, words: int = None, docs_per_feat: int = None,
+                   feats_per_doc: int = None) -> str:
+        """ Returns the key of a flight. """
+        return f'{self.key}_words_{words}_docs_per_feat_{docs_per_feat}_' \
+               f'feats_per_doc_{feats_per_doc}'
+
+    def claim(self, words: int = None, docs_per_feat: int = None,
+              feats_per_doc: int = None) -> bool:
+        """
+        Returns True if no computation with these parameters is in flight; the
+        caller sends the computation.
+        """
+        key = self.flight_key(words, docs_per_feat, feats_per_doc)
+        pipe = self.redis.pipeline()
+        pipe.set(key, time.time(), nx=True, ex=MATRIX_FLIGHT_TIMEOUT)
+        pipe.sadd(self.key, key)
+        pipe.expire(self.key, MATRIX_FLIGHT_TIMEOUT)
+        return bool(pipe.execute()[0])
+
+    def started(self, words: int = None, docs_per_feat: int = None,
+                feats_per_doc: int = None) -> typing.Optional[float]:
+        """ Returns the time when the flight started, or None. """
+        value = self.redis.get(
+            self.flight_key(words, docs_per_feat, feats_per_doc))
+        return float(value) if value else None
+
+    def land(self):
+        """
+        Clears the flights of the feature number. A flight claimed while they
+        are read is cleared too.
+        """
+        def clear(pipe):
+            keys = pipe.smembers(self.key)
+            pipe.multi()
+            pipe.delete(self.key, *keys)
+
+        self.redis.transaction(clear, self.key)
@@ -0,0 +1,771 @@
+import asyncio
+import math
+import threading
+import time
+import unittest
+from unittest import mock
+
+from celery import states
+from celery.backends.redis import RedisBackend
+from celery.exceptions import TimeoutError
+from django.http import HttpResponse
+from redis.client import Pipeline
+from django.test import TestCase
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from . import redis
+from .cancellation import Cancellation, cancellable
+from .circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from .config import (
+    COMPUTE_MATRIX_CALLBACK_PREFIX,
+    TASK_DENDROGRAM,
+    TASK_MATRIX,
+)
+from .crawl_activity import LISTENER_KEY, CrawlActivity
+from .crawl_job import FAILED, LAUNCHED, PENDING, CrawlJob
+from .debounce import Debounce
+from .eta import MATRIX, STAGES, StageDurations, estimate, record_stage
+from .dataset_ready import DatasetReady
+from .graph import GraphReady
+from .lanes import Lane, route_task
+from .namespace import MGET_CHUNK, Namespace, Q
+from .readiness import CHECKS as READINESS_CHECKS, readiness
+from .semaphore import NlpSemaphore, admission, drop_container
+from .single_flight import MatrixFlight
+from rmxweb import config
+from rmxweb.celery import celery
+from rmxweb.middleware import RetryAfterMiddleware, busy_response
+from rmxweb.remote import (
+    AwaitableResult,
+    ServiceUnavailable,
+    remote_call,
+    remote_call_async,
+)
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis is required (see '
+                                    'requirements-test.txt)')
+class RedisTestCase(TestCase):
+    """Runs the tests against an in-memory redis, emptied for every test."""
+
+    def setUp(self):
+        super().setUp()
+        # the asyncio clients of a test connect to the same server.
+        self.server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeRedis(server=self.server)
+        patcher = mock.patch.object(redis, 'CONNECTION', self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class CrawlActivityTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.activity = CrawlActivity(containerid=1)
+
+    def test_claim(self):
+        self.activity.start()
+        self.assertFalse(self.activity.claim())
+        self.assertFalse(self.activity.is_finished())
+        self.redis.delete(self.activity.key)
+        self.assertTrue(self.activity.claim())
+        self.assertTrue(self.activity.is_finished())
+        self.assertFalse(self.activity.claim())
+        # a new crawl can be claimed again.
+        self.activity.start()
+        self.assertFalse(self.activity.is_finished())
+
+    def touch(self, now: float = None) -> float:
+        with mock.patch('time.time', return_value=now):
+            self.activity.touch()
+            return self.activity.quiescence_window()
+
+    def is_active(self, now: float = None) -> bool:
+        with mock.patch('time.time', return_value=now):
+            return self.activity.is_active()
+
+    def test_window(self):
+        self.assertEqual(CrawlActivity.window(1, 1),
+                         config.SECONDS_AFTER_LAST_CALL)
+        self.assertEqual(CrawlActivity.window(10, 100, done=True),
+                         config.QUIESCENCE_MIN)
+        samples = config.QUIESCENCE_MIN_SAMPLES
+        self.assertEqual(CrawlActivity.window(0.1, samples),
+                         config.QUIESCENCE_MIN)
+        self.assertAlmostEqual(CrawlActivity.window(2, samples),
+                               2 * math.log(1 / config.QUIESCENCE_ALPHA))
+        self.assertEqual(CrawlActivity.window(600, samples),
+                         config.SECONDS_AFTER_LAST_CALL)
+
+    def test_window_follows_the_arrivals(self):
+        # the times are real, as fakeredis expires the keys with time.time.
+        now = time.time()
+        self.activity.start()
+        windows = [self.touch(now + idx) for idx in range(10)]
+        # the window is kept until enough intervals were measured.
+        self.assertEqual(windows[:config.QUIESCENCE_MIN_SAMPLES],
+                         [config.SECONDS_AFTER_LAST_CALL] *
+                         config.QUIESCENCE_MIN_SAMPLES)
+        self.assertEqual(windows[-1], config.QUIESCENCE_MIN)
+        now += 9
+        for _ in range(5):
+            now += 3
+            windows.append(self.touch(now))
+        # slower pages grow the window, faster pages shrink it.
+        self.assertEqual(windows[-5:], sorted(windows[-5:]))
+        self.assertGreater(windows[-1], config.QUIESCENCE_MIN)
+        for _ in range(5):
+            now += 0.5
+            windows.append(self.touch(now))
+        self.assertEqual(windows[-5:], sorted(windows[-5:], reverse=True))
+        self.assertLess(windows[-1], windows[-6])
+
+    def test_finished_after_the_window(self):
+        now = time.time()
+        self.activity.start()
+        for idx in range(config.QUIESCENCE_MIN_SAMPLES + 1):
+            window = self.touch(now + 2 * idx)
+        last = now + 2 * config.QUIESCENCE_MIN_SAMPLES
+        self.assertAlmostEqual(
+            window, 2 * math.log(1 / config.QUIESCENCE_ALPHA))
+        self.assertTrue(self.is_active(last + window - 0.1))
+        self.assertFalse(self.is_active(last + window + 0.1))
+        self.assertTrue(self.activity.claim())
+
+    def test_finish_shortens_the_window(self):
+        now = time.time()
+        self.activity.start()
+        self.touch(now)
+        with mock.patch('time.time', return_value=now + 1):
+            self.activity.finish()
+        self.assertEqual(self.activity.quiescence_window(),
+                         config.QUIESCENCE_MIN)
+        self.assertTrue(self.is_active(now + config.QUIESCENCE_MIN))
+        self.assertFalse(self.is_active(now + config.QUIESCENCE_MIN + 1.1))
+        # scrasync reports the end of a crawl that already quiesced.
+        self.activity.finish()
+        self.assertFalse(self.activity.is_active())
+
+    def test_listener_is_running(self):
+        self.assertFalse(CrawlActivity.listener_is_running())
+        self.redis.set(LISTENER_KEY, 1)
+        self.assertTrue(CrawlActivity.listener_is_running())
+
+
+class CrawlJobTestCase(RedisTestCase):
+
+    def test_states(self):
+        job = CrawlJob(jobid='job')
+        self.assertIsNone(job.get())
+        job.create(containerid=1)
+        created = job.get().pop('created')
+        self.assertAlmostEqual(created, time.time(), delta=1)
+        self.assertEqual(job.get(), {
+            'jobid': 'job', 'containerid': 1, 'state': PENDING,
+            'crawlid': None, 'created': created,
+        })
+        self.assertLessEqual(
+            self.redis.ttl(job.key), config.CRAWL_FINISHED_TIMEOUT)
+        job.launched('crawl')
+        self.assertEqual(
+            (job.get()['state'], job.get()['crawlid']), (LAUNCHED, 'crawl'))
+        job.failed()
+        self.assertEqual(job.get()['state'], FAILED)
+
+
+class DebounceTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.debounce = Debounce(name='test', containerid=1, window=10)
+
+    def test_request(self):
+        with mock.patch('time.time', return_value=100):
+            self.assertTrue(self.debounce.request())
+            self.assertEqual(self.debounce.remaining(), 10)
+        # the requests within the window move the execution.
+        with mock.patch('time.time', return_value=105):
+            self.assertFalse(self.debounce.request())
+            self.assertEqual(self.debounce.remaining(), 10)
+        with mock.patch('time.time', return_value=120):
+            self.assertEqual(self.debounce.remaining(), -5)
+
+    def test_clear(self):
+        self.assertTrue(self.debounce.request())
+        self.debounce.clear()
+        self.assertEqual(self.debounce.remaining(), 0)
+        self.assertTrue(self.debounce.request())
+
+    def test_keys_expire(self):
+        self.debounce.request()
+        self.assertEqual(self.redis.ttl(self.debounce.due_key), 41)
+        self.redis.expire(self.debounce.scheduled_key, 1)
+        self.debounce.postpone()
+        self.assertEqual(self.redis.ttl(self.debounce.scheduled_key), 41)
+
+
+class LaneTestCase(RedisTestCase):
+
+    def route(self, name: str = None, containerid: int = None, **options):
+        return route_task(name, (), {'containerid': containerid}, options)
+
+    def test_priority(self):
+        low, high = config.PRIORITY_LANES['background']
+        lane = Lane('background', 1)
+        priorities = [
+            lane.priority() for _ in range(config.LANE_FAIRNESS_QUANTUM * 2)]
+        self.assertEqual(priorities[0], low)
+        self.assertEqual(priorities[-1], low + 1)
+        self.assertEqual(Lane('background', 2).priority(), low)
+        with self.assertRaises(ValueError):
+            Lane('unknown')
+
+    def test_route_own_queue(self):
+        self.assertEqual(
+            self.route(config.RMXWEB_TASKS['generate_matrix_remote'], 1),
+            {'queue': 'rmxweb',
+             'priority': config.PRIORITY_LANES['background'][0]})
+        self.assertEqual(
+            self.route(config.RMXWEB_TASKS['delete_many'], 1)['priority'],
+            config.PRIORITY_LANES['bulk'][0])
+        # the caller chooses the priority.
+        self.assertNotIn('priority', self.route(
+            config.RMXWEB_TASKS['generate_matrix_remote'], 1, priority=1))
+
+    def test_route_other_services(self):
+        for name in [config.NLP_TASKS['integrity_check'],
+                     config.SCRASYNC_TASKS['launch_crawl'],
+                     config.RMXGREP_TASK['search_text']]:
+            route = self.route(name, 1)
+            self.assertEqual(route['priority'], 0)
+            self.assertNotEqual(route['queue'], 'rmxweb')
+
+
+@mock.patch.dict(config.NLP_JOB_LIMITS, {'compute_dendrogram': 2})
+class NlpSemaphoreTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('metrics.semaphore.celery.send_task')
+        self.send_task = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.semaphore = NlpSemaphore('compute_dendrogram')
+
+    def acquire(self, containerid: int = None, features: int = None,
+                **kwargs) -> bool:
+        return self.semaphore.acquire(
+            NlpSemaphore.token(containerid, features), task='task',
+            kwargs=dict(kwargs, containerid=containerid))
+
+    def woken(self) -> list:
+        return [
+            _.kwargs['kwargs'] for _ in self.send_task.call_args_list
+            if _.args[0] == 'task'
+        ]
+
+    def test_acquire(self):
+        self.assertTrue(self.acquire(1))
+        self.assertTrue(self.acquire(2))
+        self.assertFalse(self.acquire(3))
+        self.assertFalse(self.acquire(4))
+        # a job keeps its place when it asks again.
+        self.assertFalse(self.acquire(3))
+        self.assertEqual(
+            admission(NlpSemaphore.token(3), ['compute_dendrogram'])[
+                'position'], 0)
+        self.assertEqual(self.semaphore.status(NlpSemaphore.token(4))[
+            'position'], 1)
+        self.assertIsNone(self.semaphore.status(NlpSemaphore.token(1)))
+        # one wake_nlp_jobs task is scheduled.
+        self.assertEqual(self.send_task.call_count, 1)
+
+    def test_one_job_per_token(self):
+        self.assertTrue(self.acquire(1, 10, words=6))
+        self.assertFalse(self.acquire(1, 10, words=8))
+        self.assertFalse(self.acquire(1, 10, words=8))
+        self.assertFalse(self.acquire(1, 10, words=10))
+        self.assertEqual(self.redis.zcard(self.semaphore.queue_key), 2)
+        self.assertTrue(self.semaphore.acquire(
+            NlpSemaphore.token(1, 10), supersede=True))
+
+    def test_release_wakes_the_next_jobs(self):
+        self.acquire(1, 10, words=6)
+        self.acquire(1, 10, words=8)
+        self.acquire(1, 11)
+        self.acquire(2)
+        self.assertEqual(self.woken(), [])
+        self.semaphore.release(NlpSemaphore.token(1, 10))
+        # the second job of the token runs once the first one released.
+        self.assertEqual(self.woken(), [
+            {'containerid': 1, 'words': 8, 'admitted': True},
+        ])
+        self.semaphore.release(NlpSemaphore.token(1, 11))
+        self.assertEqual(self.woken()[1:], [
+            {'containerid': 2, 'admitted': True},
+        ])
+        self.assertFalse(self.semaphore.is_waiting())
+
+    def test_purge(self):
+        with mock.patch('time.time', return_value=0):
+            self.acquire(1)
+            self.acquire(2)
+            self.assertFalse(self.acquire(3))
+        self.assertEqual(self.semaphore.purge(), 2)
+        self.assertEqual(self.semaphore.wake(), [
+            {'task': 'task', 'kwargs': {'containerid': 3}}])
+        # a job admitted after a purge.
+        with mock.patch('time.time', return_value=0):
+            self.acquire(4)
+        self.assertTrue(self.acquire(5))
+
+    def test_drop_container(self):
+        self.acquire(1)
+        self.acquire(2)
+        self.acquire(1, 10)
+        self.acquire(3)
+        drop_container(1)
+        self.assertEqual(self.woken(), [
+            {'containerid': 3, 'admitted': True}])
+        self.assertFalse(self.semaphore.is_waiting())
+
+    def test_concurrent_acquire(self):
+        admitted = []
+
+        def acquire(containerid):
+            if self.acquire(containerid):
+                admitted.append(containerid)
+
+        threads = [
+            threading.Thread(target=acquire, args=(_,)) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(admitted), 2)
+        self.assertEqual(self.redis.zcard(self.semaphore.queue_key), 18)
+
+
+class CancellationTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cancellation = Cancellation(containerid=1)
+        patcher = mock.patch.object(celery.control, 'revoke')
+        self.revoke = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_supersede(self):
+        self.cancellation.track(TASK_DENDROGRAM, 'a')
+        self.cancellation.track(TASK_MATRIX, 'b')
+        self.cancellation.track(TASK_DENDROGRAM, 'c', supersede=True)
+        self.revoke.assert_called_once_with(['a'], terminate=True)
+        self.assertEqual(sorted(self.cancellation.task_ids()), ['b', 'c'])
+        self.assertEqual(self.cancellation.clear(TASK_MATRIX), ['b'])
+        self.assertEqual(self.cancellation.task_ids(), ['c'])
+
+    def test_cancel(self):
+        self.cancellation.track(TASK_DENDROGRAM, 'a')
+        self.cancellation.track(TASK_MATRIX, 'b')
+        self.cancellation.cancel()
+        self.assertEqual(sorted(self.revoke.call_args.args[0]), ['a', 'b'])
+        self.assertTrue(self.revoke.call_args.kwargs['terminate'])
+        self.assertTrue(self.cancellation.is_cancelled())
+        self.assertEqual(self.cancellation.task_ids(), [])
+        self.assertFalse(Cancellation(containerid=2).is_cancelled())
+        self.assertLessEqual(
+            self.redis.ttl(self.cancellation.token_key),
+            config.CANCELLATION_TIMEOUT)
+        self.cancellation.reset()
+        self.assertFalse(self.cancellation.is_cancelled())
+
+    def test_cancellable(self):
+        func = mock.Mock(return_value='done')
+        task = cancellable(func)
+        self.assertEqual(task(containerid=1), 'done')
+        self.cancellation.cancel()
+        self.assertIsNone(task(containerid=1))
+        self.assertEqual(task(containerid=2), 'done')
+        self.assertEqual(func.call_count, 2)
+
+
+class MatrixFlightTestCase(RedisTestCase):
+
+    params = {'words': 6, 'docs_per_feat': 0, 'feats_per_doc': 3}
+
+    def setUp(self):
+        super().setUp()
+        self.flight = MatrixFlight(containerid=1, features=10)
+
+    def test_claim(self):
+        start = time.time()
+        self.assertTrue(self.flight.claim(**self.params))
+        self.assertFalse(self.flight.claim(**self.params))
+        self.assertAlmostEqual(
+            self.flight.started(**self.params), start, delta=1)
+        # other parameters, feature numbers or containers fly on their own.
+        self.assertTrue(self.flight.claim(6, 0, 4))
+        self.assertTrue(
+            MatrixFlight(containerid=1, features=20).claim(**self.params))
+        self.assertTrue(
+            MatrixFlight(containerid=2, features=10).claim(**self.params))
+        self.assertIsNone(self.flight.started(6, 0, 5))
+
+    def test_land(self):
+        self.flight.claim(**self.params)
+        self.flight.claim(6, 0, 4)
+        other = MatrixFlight(containerid=1, features=20)
+        other.claim(**self.params)
+        self.flight.land()
+        self.assertIsNone(self.flight.started(**self.params))
+        self.assertIsNone(self.flight.started(6, 0, 4))
+        self.assertFalse(self.redis.exists(self.flight.key))
+        self.assertTrue(self.flight.claim(**self.params))
+        self.assertIsNotNone(other.started(**self.params))
+
+    def test_claims_expire_on_their_own(self):
+        self.flight.claim(**self.params)
+        key = self.flight.flight_key(**self.params)
+        self.assertLessEqual(self.redis.ttl(key), config.MATRIX_FLIGHT_TIMEOUT)
+        # the flight is about to expire; other claims don't keep it alive.
+        self.redis.expire(key, 5)
+        self.flight.claim(6, 0, 4)
+        self.assertLessEqual(self.redis.ttl(key), 5)
+        self.redis.delete(key)
+        self.assertTrue(self.flight.claim(**self.params))
+
+    def test_concurrent_claim(self):
+        claimed = []
+        barrier = threading.Barrier(10)
+
+        def claim():
+            barrier.wait()
+            if self.flight.claim(**self.params):
+                claimed.append(1)
+
+        threads = [threading.Thread(target=claim) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(claimed), 1)
+
+    def test_claim_while_landing(self):
+        self.flight.claim(**self.params)
+        transaction = self.redis.transaction
+
+        def claim_then_clear(func, *keys):
+            # a claim comes between the read of the flights and the delete;
+            # the transaction is retried and clears it too.
+            def wrapped(pipe):
+                smembers = pipe.smembers
+
+                def read(key):
+                    members = smembers(key)
+                    if not claimed:
+                        claimed.append(self.flight.claim(6, 0, 4))
+                    return members
+                pipe.smembers = read
+                return func(pipe)
+            return transaction(wrapped, *keys)
+
+        claimed = []
+        with mock.patch.object(self.redis, 'transaction',
+                               side_effect=claim_then_clear):
+            self.flight.land()
+        self.assertEqual(claimed, [True])
+        self.assertIsNone(self.flight.started(6, 0, 4))
+
+
+class EtaTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.durations = StageDurations(MATRIX)
+
+    def start(self, stage: str = MATRIX, started: float = None):
+        run = Namespace(dtype=STAGES[stage][0], containerid=1, features=10)
+        self.redis.set(run.enter_name, started)
+
+    def test_no_samples(self):
+        self.assertIsNone(self.durations.fit())
+        self.assertIsNone(self.durations.predict(10))
+        out = estimate(MATRIX, containerid=1, features=10)
+        self.assertIsNone(out['eta'])
+        self.assertEqual(out['retry_after'], config.ETA_RETRY_DEFAULT)
+
+    def test_one_size(self):
+        self.durations.record(size=10, duration=4)
+        self.assertEqual(self.durations.fit(), (4, 0))
+        self.durations.record(size=10, duration=6)
+        self.assertEqual(self.durations.predict(1000), 5)
+
+    def test_regression(self):
+        for size in [10, 20, 30]:
+            self.durations.record(size=size, duration=2 * size + 1)
+        intercept, slope = self.durations.fit()
+        self.assertAlmostEqual(intercept, 1)
+        self.assertAlmostEqual(slope, 2)
+        self.assertAlmostEqual(self.durations.predict(15), 31)
+        # a negative duration is never predicted.
+        for size in [40, 50]:
+            self.durations.record(size=size, duration=0)
+        self.assertEqual(self.durations.predict(1000), 0)
+
+    def test_samples_are_trimmed(self):
+        with mock.patch('metrics.eta.ETA_SAMPLES', 3):
+            for size in range(5):
+                self.durations.record(size=size, duration=size)
+        self.assertEqual(self.durations.samples(),
+                         [(4, 4), (3, 3), (2, 2)])
+
+    def test_record_stage_once(self):
+        self.start(started=100)
+        record_stage(COMPUTE_MATRIX_CALLBACK_PREFIX, 1, 10, exit_time=130)
+        record_stage(COMPUTE_MATRIX_CALLBACK_PREFIX, 1, 10, exit_time=150)
+        # a callback without a run is not measured.
+        record_stage(COMPUTE_MATRIX_CALLBACK_PREFIX, 2, 10, exit_time=150)
+        self.assertEqual(self.durations.samples(), [(0, 30)])
+
+    def test_estimate(self):
+        self.durations.record(size=0, duration=30)
+        now = time.time()
+        self.start(started=now - 10)
+        out = estimate(MATRIX, containerid=1, features=10)
+        self.assertAlmostEqual(out['eta'], now + 20, delta=1)
+        self.assertIn(out['retry_after'], (19, 20))
+        self.start(started=now - 100)
+        self.assertEqual(estimate(MATRIX, containerid=1, features=10)[
+            'retry_after'], config.ETA_RETRY_MIN)
+        self.durations.record(size=0, duration=1000)
+        self.assertEqual(estimate(MATRIX, containerid=1, features=10)[
+            'retry_after'], config.ETA_RETRY_MAX)
+
+
+class RetryAfterTestCase(TestCase):
+
+    def response(self, status: int = 202, data: dict = None):
+        resp = HttpResponse(status=status)
+        if data is not None:
+            resp.data = data
+        return RetryAfterMiddleware.process_response(None, resp)
+
+    def test_retry_after(self):
+        busy = {'task': {'eta': {'retry_after': 12}}}
+        self.assertEqual(self.response(data=busy)['Retry-After'], '12')
+        self.assertEqual(
+            self.response(data={'task': {'eta': None}})['Retry-After'],
+            str(config.ETA_RETRY_DEFAULT))
+        self.assertEqual(self.response()['Retry-After'],
+                         str(config.ETA_RETRY_DEFAULT))
+        self.assertFalse(
+            self.response(status=200, data=busy).has_header('Retry-After'))
+        self.assertEqual(busy_response(busy)['Retry-After'], '12')
+
+    def test_header_is_kept(self):
+        resp = HttpResponse(status=202)
+        resp['Retry-After'] = '3'
+        RetryAfterMiddleware.process_response(None, resp)
+        self.assertEqual(resp['Retry-After'], '3')
+
+
+class ReadinessTestCase(RedisTestCase):
+
+    def test_fetch_many_chunks(self):
+        now = time.time()
+        for key in 'acef':
+            self.redis.set(key, now)
+        names = [('a', 'b', 'c', 'd'), ('c', 'e'), ('f',), ()]
+        with mock.patch('metrics.namespace.MGET_CHUNK', 3), \
+                mock.patch.object(Pipeline, 'mget', autospec=True,
+                                  side_effect=Pipeline.mget) as mget:
+            queries = Q.fetch_many(names)
+        # 6 keys in chunks of 3, read once
+        self.assertEqual([_.args[1] for _ in mget.call_args_list],
+                         [['a', 'b', 'c'], ['d', 'e', 'f']])
+        self.assertEqual([_.result for _ in queries], [
+            {'a': now, 'c': now}, {'c': now, 'e': now}, {'f': now}, {}])
+        self.assertEqual([_.result for _ in queries],
+                         [Q(metrics_names=_).result for _ in names])
+
+    def test_readiness(self):
+        now = time.time()
+        containerids = range(1, config.READINESS_BATCH_LIMIT + 1)
+        expected = {}
+        for containerid in containerids:
+            stats = DatasetReady(containerid=containerid,
+                                 prefetch=False).stats
+            if containerid % 3 == 0:
+                # the crawl called back
+                self.redis.set(stats.callback_n.exit_name, now)
+                expected[containerid] = True
+            elif containerid % 3 == 1:
+                # the crawl runs
+                self.redis.set(stats.run_n.enter_name, now)
+                expected[containerid] = False
+            else:
+                # a run that never called back; its record is deleted
+                self.redis.set(stats.run_n.enter_name, now - 3600)
+                expected[containerid] = True
+        # the keys of the batch don't fit in one MGET
+        self.assertGreater(
+            len(containerids) * len(READINESS_CHECKS) * 4, MGET_CHUNK)
+        graph = GraphReady(containerid=3, features=10, prefetch=False).stats
+        self.redis.set(graph.callback_n.exit_name, now)
+        graph = GraphReady(containerid=4, features=10, prefetch=False).stats
+        self.redis.set(graph.run_n.enter_name, now)
+
+        out = readiness({_: [10] for _ in containerids})
+        self.assertEqual(
+            {_: out[_]['dataset'].get('ready') for _ in containerids},
+            expected)
+        self.assertTrue(out[3]['graph'][10]['ready'])
+        self.assertFalse(out[4]['graph'][10]['ready'])
+        self.assertEqual(set(out[1]), {*READINESS_CHECKS, 'graph'})
+        stats = DatasetReady(containerid=2, prefetch=False).stats
+        self.assertFalse(self.redis.exists(stats.run_n.enter_name))
+
+
+class CircuitBreakerTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.breaker = CircuitBreaker('nlp')
+
+    def trip(self):
+        for _ in range(config.BREAKER_THRESHOLD):
+            self.breaker.failure()
+
+    def cool_down(self):
+        """ The cooldown is over; the breaker becomes half-open. """
+        self.redis.delete(self.breaker.open_key)
+
+    def test_closed(self):
+        self.assertEqual(self.breaker.state, CLOSED)
+        for _ in range(config.BREAKER_THRESHOLD - 1):
+            self.breaker.failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.wait(), 0)
+        # the failures are counted within BREAKER_WINDOW seconds.
+        self.assertEqual(self.redis.ttl(self.breaker.failures_key),
+                         config.BREAKER_WINDOW)
+
+    def test_open(self):
+        self.trip()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.wait(), config.BREAKER_COOLDOWN)
+        self.assertFalse(self.redis.exists(self.breaker.failures_key))
+
+    def test_half_open_probe_succeeds(self):
+        self.trip()
+        self.cool_down()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # one caller probes the service, the others wait for it.
+        self.assertEqual(self.breaker.wait(timeout=10), 0)
+        self.assertEqual(self.breaker.wait(timeout=10), 10)
+        self.breaker.success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.wait(), 0)
+
+    def test_half_open_probe_fails(self):
+        self.trip()
+        self.cool_down()
+        self.assertEqual(self.breaker.wait(timeout=10), 0)
+        self.breaker.failure(timeout=True)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.stats(), {
+            'service': 'nlp',
+            'state': OPEN,
+            'calls': config.BREAKER_THRESHOLD + 1,
+            'failures': config.BREAKER_THRESHOLD + 1,
+            'timeouts': 1,
+            'trips': 2,
+        })
+
+    def test_remote_call(self):
+        name = config.NLP_TASKS['available_features']
+        with mock.patch('rmxweb.remote.celery.send_task') as send_task:
+            send_task.return_value.get.side_effect = TimeoutError
+            for _ in range(config.BREAKER_THRESHOLD):
+                with self.assertRaises(ServiceUnavailable):
+                    remote_call(name, timeout=1)
+            self.assertEqual(self.breaker.state, OPEN)
+            send_task.reset_mock()
+            with self.assertRaises(ServiceUnavailable) as context:
+                remote_call(name, timeout=1)
+            send_task.assert_not_called()
+            self.assertEqual(context.exception.wait, config.BREAKER_COOLDOWN)
+            self.cool_down()
+            send_task.return_value.get.side_effect = None
+            send_task.return_value.get.return_value = {'success': True}
+            self.assertEqual(remote_call(name, timeout=1), {'success': True})
+        self.assertEqual(self.breaker.state, CLOSED)
+
+
+class AwaitableResultTestCase(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.backend_redis = fakeredis.FakeAsyncRedis()
+        patcher = mock.patch('rmxweb.remote.backend_connection',
+                             return_value=self.backend_redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # the backend is not connected to; its url doesn't matter.
+        self.backend = RedisBackend(app=celery, url='redis://localhost/0')
+        patcher = mock.patch.object(
+            type(celery), 'backend', new_callable=mock.PropertyMock,
+            return_value=self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.result = AwaitableResult('task')
+
+    def payload(self, result=None, state: str = states.SUCCESS) -> bytes:
+        backend = self.backend
+        if state == states.FAILURE:
+            result = backend.prepare_exception(result)
+        return backend.encode(backend._get_result_meta(
+            result=result, state=state, traceback=None, request=None))
+
+    async def store(self, payload: bytes = None, delay: float = 0):
+        """ Stores and publishes a result, as the result backend does. """
+        await asyncio.sleep(delay)
+        await self.backend_redis.set(self.result.key, payload)
+        await self.backend_redis.publish(self.result.key, payload)
+
+    async def test_result_stored_before(self):
+        await self.store(self.payload(5))
+        self.assertEqual(await self.result.get(timeout=1), 5)
+
+    async def test_result_published_later(self):
+        # a state that is not ready is not returned.
+        await self.store(self.payload(state=states.STARTED))
+        store = asyncio.ensure_future(self.store(self.payload(5), delay=.05))
+        self.assertEqual(await self.result.get(timeout=2), 5)
+        await store
+
+    async def test_failure(self):
+        await self.store(self.payload(ValueError('boom'), states.FAILURE))
+        with self.assertRaises(ValueError):
+            await self.result.get(timeout=1)
+
+    async def test_timeout(self):
+        with self.assertRaises(TimeoutError):
+            await self.result.get(timeout=.05)
+
+    async def test_remote_call_async(self):
+        name = config.NLP_TASKS['available_features']
+        with mock.patch('rmxweb.remote.celery.send_task') as send_task:
+            send_task.return_value.id = 'task'
+            await self.store(self.payload({'success': True}))
+            self.assertEqual(
+                await remote_call_async(name, timeout=1), {'success': True})
+            await self.backend_redis.delete(self.result.key)
+            with self.assertRaises(ServiceUnavailable):
+                await remote_call_async(name, timeout=.05)
+        stats = CircuitBreaker('nlp').stats()
+        self.assertEqual((stats['calls'], stats['timeouts']), (2, 1))
@@ -6,4 +6,4 @@ set -e
 python3 manage.py migrate
 
 >&2 echo "Running the app with gunicorn"
-gunicorn rmxweb.wsgi:application --bind 0.0.0.0:8000
+exec sh ./run.sh
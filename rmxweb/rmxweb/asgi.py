@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rmxweb.settings')
+# serving the async views (see ASYNC_VIEWS in rmxweb.config)
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
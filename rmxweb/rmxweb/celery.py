@@ -16,4 +16,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rmxweb.settings')
 celery = Celery('rmxweb')
 celery.config_from_object(celery_settings)
 
+# connecting the signals that record the waiting time of the tasks per lane
+import metrics.lanes  # noqa: E402,F401
+
 # celery.autodiscover_tasks()
@@ -29,7 +29,9 @@ accept_content = ['json', 'msgpack', 'yaml']
 task_serializer = 'json'
 result_serializer = 'json'
 
-task_routes = {
+# the queues of the tasks. The tasks are routed by metrics.lanes, that adds
+# their priority.
+TASK_QUEUES = {
 
     re.compile(r'(data|container|graph)\..*'): {'queue': 'rmxweb'},
 
@@ -43,12 +45,33 @@ task_routes = {
 
 }
 
+task_routes = ('metrics.lanes.route_task',)
+
+# priorities with redis: every queue is split in lists, one per priority;
+# the workers take the messages with the lowest priority first. The workers of
+# rmxweb read 10 priorities, a superset of the default steps (0, 3, 6, 9) that
+# the other services publish with; the separator stays the default one. The
+# tasks sent by tasks take the priority of their parent.
+broker_transport_options = {
+    'priority_steps': list(range(10)),
+    'queue_order_strategy': 'priority',
+}
+task_inherit_parent_priority = True
+
 RMXWEB_TASKS = {
 
     'delete_many': 'data.tasks.delete_many',
 
+    'compact_pack': 'data.tasks.compact_pack',
+
+    'collect_garbage': 'data.tasks.collect_garbage',
+
+    'train_text_dictionary': 'data.tasks.train_text_dictionary',
+
     'create_from_webpage': 'data.tasks.create_from_webpage',
 
+    'create_many_from_webpage': 'data.tasks.create_many_from_webpage',
+
     'test_task': 'rmxweb.container.tasks.test_task',
 
     'delete_data_from_container':
@@ -58,12 +81,29 @@ RMXWEB_TASKS = {
 
     'monitor_crawl': 'container.tasks.monitor_crawl',
 
+    'crawl_launched': 'container.tasks.crawl_launched',
+
+    'crawl_launch_failed': 'container.tasks.crawl_launch_failed',
+
+    'crawl_finished': 'container.tasks.crawl_finished',
+
+    'end_crawl': 'container.tasks.end_crawl',
+
     # 'crawl_metrics': 'container.tasks.crawl_metrics',
 
     'integrity_check': 'container.tasks.integrity_check',
 
+    'request_integrity_check': 'container.tasks.request_integrity_check',
+
+    'debounced_integrity_check': 'container.tasks.debounced_integrity_check',
+
     'generate_matrix_remote': 'container.tasks.generate_matrix_remote',
 
+    'generate_dendrogram_remote':
+        'container.tasks.generate_dendrogram_remote',
+
+    'wake_nlp_jobs': 'container.tasks.wake_nlp_jobs',
+
 }
 
 SCRASYNC_TASKS = {
@@ -24,20 +24,173 @@ EXTRACTXT_FILES_UPLOAD_URL = "{}/upload-files".format(EXTRACTXT_ENDPOINT)
 CONTAINER_ROOT = os.path.join(DATA_ROOT, "container")
 TEXT_FOLDER = "text"
 MATRIX_FOLDER = "matrix"
+# The path to the content-addressed store that holds the texts shared by the
+# text folders of all containers. It has to be on the same file system as
+# CONTAINER_ROOT.
+BLOB_ROOT = os.path.join(DATA_ROOT, "blob")
+
+# The storage used for the texts of new containers: "file" writes one file per
+# Data object to the text folder, "pack" appends texts to segmented pack files
+# in the pack folder.
+STORAGE_FILE = "file"
+STORAGE_PACK = "pack"
+STORAGE_MODE = os.environ.get("STORAGE_MODE", STORAGE_FILE)
+PACK_FOLDER = "pack"
+# the maximum size of a pack segment in bytes
+PACK_SEGMENT_SIZE = 64 * 1024 * 1024
+# a segment is compacted when the ratio of deleted bytes is above this value
+PACK_COMPACT_RATIO = 0.5
+# segments modified less than 10 minutes ago are not compacted
+PACK_COMPACT_GRACE = 10 * 60
+# orphaned text files are removed by the garbage collector 10 minutes after
+# a run first found them
+GC_GRACE = 10 * 60
+
+# Compression of the texts of new containers with zstandard. A dictionary is
+# trained on the texts of a container once it holds ZSTD_DICT_SAMPLES texts.
+# The compressed texts are written to the text folder that nlp and rmxgrep
+# read as plain text: these services must be able to decompress the texts
+# (with the dictionaries of the containers) before COMPRESS_TEXTS is enabled.
+COMPRESS_TEXTS = os.environ.get("COMPRESS_TEXTS", "false").lower() == "true"
+ZSTD_LEVEL = 3
+ZSTD_DICT_SAMPLES = 200
+# the size of a dictionary in bytes
+ZSTD_DICT_SIZE = 110 * 1024
+# the time in seconds before a failed dictionary training can be retried
+ZSTD_DICT_TRAIN_TIMEOUT = 10 * 60
 
 CORPUS_MAX_SIZE = 500
 
+# the size in bits and the number of hash functions of the bloom filter that
+# holds the urls of a container; 2**22 bits hold 400k urls with 1% of false
+# positives.
+BLOOM_FILTER_BITS = 2 ** 22
+BLOOM_FILTER_HASHES = 7
+# the time in seconds after which a build of a bloom filter that didn't
+# complete can be started again
+BLOOM_FILTER_REBUILD_TIMEOUT = 5 * 60
+
+# Boilerplate stripping at ingest. A paragraph is dropped when it appears on
+# more than BOILERPLATE_FREQUENCY of the pages of a host in the container; the
+# frequencies are used once the host has BOILERPLATE_MIN_PAGES pages.
+BOILERPLATE_MIN_PAGES = 5
+BOILERPLATE_FREQUENCY = 0.5
+# the maximum size in bytes of the text of a document; longer texts are cut.
+DOCUMENT_MAX_SIZE = int(os.environ.get("DOCUMENT_MAX_SIZE", 1024 * 1024))
+
+# Near-duplicate detection. Every text gets a 64 bit simhash; texts whose
+# simhashes differ by at most NEAR_DUPLICATE_DISTANCE bits are near-duplicates.
+# The signature is split in 4 bands of 16 bits that are indexed in the
+# database; every pair within a distance of 3 shares a band, larger distances
+# may miss near-duplicates. NEAR_DUPLICATE_ACTION is "flag" to save the page
+# and link it to the page it duplicates, or "skip" to discard it.
+NEAR_DUPLICATE_DISTANCE = 3
+NEAR_DUPLICATE_FLAG = "flag"
+NEAR_DUPLICATE_SKIP = "skip"
+NEAR_DUPLICATE_ACTION = os.environ.get(
+    "NEAR_DUPLICATE_ACTION", NEAR_DUPLICATE_FLAG)
+# the number of words in a shingle
+SIMHASH_SHINGLE_SIZE = 3
+
+# the number of rows inserted by a single query when Data and Link objects are
+# created in bulk
+BULK_CREATE_BATCH_SIZE = 500
+
 # todo(): create a configuration for the connection to the sql database
 
-# monitor the crawl every 5 seconds
-CRAWL_MONITOR_COUNTDOWN = 5
+# Manifest diffs for the integrity checks: the changes of a container since
+# its last check are recorded and sent to nlp. nlp must accept the
+# generation, full and changes arguments of integrity_check before
+# MANIFEST_DIFF is enabled; otherwise nothing is recorded and every check is
+# a full one.
+MANIFEST_DIFF = os.environ.get("MANIFEST_DIFF", "false").lower() == "true"
+# the maximum number of manifest changes sent with an integrity check; nlp
+# checks the whole container when there are more
+MANIFEST_DIFF_MAX = 5000
+
+# integrity checks requested after deletions run once no other request came
+# for this many seconds
+INTEGRITY_CHECK_DEBOUNCE = int(os.environ.get("INTEGRITY_CHECK_DEBOUNCE", 30))
+
+# the end of a crawl is signalled by the expiry of its activity key in redis
+# (see metrics.crawl_activity); monitor_crawl polls every minute as a safety
+# net for missed notifications. Without a running listener of these events
+# (the listen_crawl_events command), it polls every 5 seconds.
+CRAWL_MONITOR_COUNTDOWN = 60
+CRAWL_MONITOR_COUNTDOWN_NO_LISTENER = 5
+# the listener of the crawl events registers itself every 30 seconds
+CRAWL_LISTENER_HEARTBEAT = 30
+# the time in seconds during which the end of a crawl can't be handled twice
+CRAWL_FINISHED_TIMEOUT = 24 * 60 * 60
 # wait 10 s before starting to monitor
 CRAWL_START_MONITOR_COUNTDOWN = 10
 
+# the time in seconds during which the tasks of a container are tracked, and
+# during which a deleted container stays cancelled (see metrics.cancellation)
+CANCELLATION_TIMEOUT = 24 * 60 * 60
+
+# Admission control of the nlp jobs (see metrics.semaphore): the number of jobs
+# of every type that run at once; the time in seconds after which a job that
+# didn't call back frees its place.
+NLP_JOB_LIMITS = {
+    'compute_matrices': int(os.environ.get("COMPUTE_MATRICES_LIMIT", 2)),
+    'factorize_matrices': int(os.environ.get("FACTORIZE_MATRICES_LIMIT", 4)),
+    'compute_dendrogram': int(os.environ.get("COMPUTE_DENDROGRAM_LIMIT", 2)),
+}
+# the job types of the matrices
+MATRIX_JOBS = ('compute_matrices', 'factorize_matrices')
+NLP_JOB_TIMEOUT = 30 * 60
+
+# the time in seconds after which a matrix computation that didn't call back
+# no longer blocks identical requests
+MATRIX_FLIGHT_TIMEOUT = 30 * 60
+
+# The feature numbers computed by the post-crawl pipeline (see
+# container.pipeline), separated by commas; the pipeline is disabled when
+# empty.
+PIPELINE_FEATURES = [
+    int(_) for _ in os.environ.get("PIPELINE_FEATURES", "10").split(",")
+    if _.strip()
+]
+# the time in seconds after which the state of a pipeline that doesn't advance
+# is dropped
+PIPELINE_TIMEOUT = 24 * 60 * 60
+
+# Priority lanes of the tasks (see metrics.lanes). The workers take the
+# messages with the lowest priority first; every lane has a band of priorities
+# and a container moves one step down the band for every LANE_FAIRNESS_QUANTUM
+# tasks it sent in the lane in the last LANE_FAIRNESS_WINDOW seconds.
+PRIORITY_LANES = {
+    'interactive': (0, 2),
+    'background': (3, 5),
+    'bulk': (6, 9),
+}
+LANE_FAIRNESS_WINDOW = 60
+LANE_FAIRNESS_QUANTUM = 10
+# the queues whose workers read the priorities of the lanes. The workers of
+# the other services use the default transport options of kombu; a queue can
+# be added once all its workers read the priority_steps of celery_settings.
+PRIORITY_QUEUES = ('rmxweb',)
+# the number of waiting times kept per lane for the metrics
+LANE_WAIT_SAMPLES = 1000
+
 REQUEST_MAX_RETRIES = 5
 # time to wait in seconds after the last call made inside the crawler.
 # after that the container is set as ready
 SECONDS_AFTER_LAST_CALL = 30
+# Adaptive quiescence of crawls. The mean time between two pages of a crawl is
+# estimated with an exponentially weighted moving average (smoothing factor
+# QUIESCENCE_SMOOTHING). The crawl is finished when no page arrived for
+# mean * ln(1 / QUIESCENCE_ALPHA) seconds, the time after which a Poisson
+# arrival process with that mean would have sent a page with probability
+# 1 - QUIESCENCE_ALPHA. The window is kept between QUIESCENCE_MIN and
+# SECONDS_AFTER_LAST_CALL, which is used until QUIESCENCE_MIN_SAMPLES pages
+# arrived. QUIESCENCE_MIN is also the time waited after scrasync reports the
+# end of a crawl, for the pages still in the queue.
+QUIESCENCE_ALPHA = 0.01
+QUIESCENCE_SMOOTHING = 0.2
+QUIESCENCE_MIN = 5
+QUIESCENCE_MIN_SAMPLES = 5
 
 # =========================================<
 
@@ -48,11 +201,55 @@ SCRASYNC_TASKS = celery_settings.SCRASYNC_TASKS
 NLP_TASKS = celery_settings.NLP_TASKS
 RMXCLUSTER_TASKS = celery_settings.RMXCLUSTER_TASKS
 
+# ETA of the stages of a container (see metrics.eta): the number of durations
+# kept per stage to fit the expected duration against the size of the
+# container; the bounds of the Retry-After of the busy responses (202), and
+# its value when no duration was recorded.
+ETA_SAMPLES = 200
+ETA_RETRY_MIN = 1
+ETA_RETRY_MAX = 60
+ETA_RETRY_DEFAULT = 5
+
+# Timeouts in seconds of the calls to other services that block a request
+# (see rmxweb.remote), per task; REMOTE_CALL_TIMEOUT for the other tasks.
+REMOTE_CALL_TIMEOUT = 10
+REMOTE_CALL_TIMEOUTS = {
+    NLP_TASKS['available_features']: 5,
+    NLP_TASKS['features_and_docs']: 30,
+    NLP_TASKS['retrieve_features']: 10,
+    NLP_TASKS['hierarchical_tree']: 3,
+    RMXGREP_TASK['search_text']: 20,
+}
+# Circuit breakers of the services (see metrics.circuit_breaker): a breaker
+# opens after BREAKER_THRESHOLD failed calls in BREAKER_WINDOW seconds and
+# rejects the calls for BREAKER_COOLDOWN seconds.
+BREAKER_THRESHOLD = 5
+BREAKER_WINDOW = 60
+BREAKER_COOLDOWN = 30
+# The async serving mode: under ASGI (see rmxweb.asgi) the graph, dendrogram,
+# context and feature views are async views that await the results of nlp and
+# rmxgrep on the result backend, instead of holding a thread per request.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '').lower() in ('1', 'true')
+# the maximum number of containers in a request of the batch readiness
+# endpoint (see container.views.ContainerReadiness)
+READINESS_BATCH_LIMIT = 1000
+# The server-sent events of the containers (see container.views.events): a
+# comment keeps the connection alive every SSE_KEEPALIVE seconds; the stream
+# is closed after SSE_MAX_DURATION seconds and the client reconnects after
+# SSE_RETRY milliseconds.
+SSE_KEEPALIVE = 15
+SSE_MAX_DURATION = 60 * 60
+SSE_RETRY = 3000
+
 
 # hexdigest size
 DIGEST_SIZE = 64
 HEXDIGEST_SIZE = 128
 
+# digest size for the urls saved in the url dictionary
+URL_DIGEST_SIZE = 16
+URL_HEXDIGEST_SIZE = 32
+
 
 # the type of data to return to the client
 OUTPUT_TYPE_JSON = os.environ.get("OUTPUT_TYPE_JSON", False)
@@ -0,0 +1,56 @@
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.views import exception_handler
+
+from .config import ETA_RETRY_DEFAULT
+
+
+def retry_after(data: dict = None) -> int:
+    """ Returns the Retry-After of a busy response, from the ETA of its task.
+    """
+    if isinstance(data, dict) and isinstance(data.get('task'), dict):
+        eta = data['task'].get('eta') or {}
+        return eta.get('retry_after') or ETA_RETRY_DEFAULT
+    return ETA_RETRY_DEFAULT
+
+
+def busy_response(data: dict = None) -> JsonResponse:
+    """ The busy response (202) of the async views, with its Retry-After. """
+    response = JsonResponse(data, status=202)
+    response['Retry-After'] = str(retry_after(data))
+    return response
+
+
+class RetryAfterMiddleware(MiddlewareMixin):
+    """Adds Retry-After to the busy responses (202). The value comes from
+       the ETA of the task in the response (see metrics.eta), or defaults to
+       ETA_RETRY_DEFAULT.
+    """
+
+    @staticmethod
+    def process_response(request, response):
+        if response.status_code != 202 or response.has_header('Retry-After'):
+            return response
+        response['Retry-After'] = str(
+            retry_after(getattr(response, 'data', None)))
+        return response
+
+
+class ExceptionMiddleware(MiddlewareMixin):
+    """Returns the errors of the views that are not handled by
+       rest_framework (the async views) as the rest_framework views do: a
+       JSON detail for Http404 and the API exceptions, with Retry-After when
+       a service is unavailable (see rest_framework.views.exception_handler).
+    """
+
+    @staticmethod
+    def process_exception(request, exception):
+        response = exception_handler(exception, {'request': request})
+        if response is None:
+            return None
+        resp = JsonResponse(
+            response.data, status=response.status_code, safe=False)
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                resp[header] = value
+        return resp
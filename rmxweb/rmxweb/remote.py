@@ -0,0 +1,178 @@
+"""
+Blocking calls to the tasks of other services (nlp, rmxgrep, scrasync) made
+in the request path. Every call waits for its result at most
+REMOTE_CALL_TIMEOUTS[task] seconds and goes through the circuit breaker of
+the service (see metrics.circuit_breaker); when the service is unavailable,
+ServiceUnavailable is raised and the client receives a 503 with Retry-After.
+
+The async views await the results with remote_call_async: AwaitableResult
+subscribes to the key of the result in the redis result backend, where celery
+publishes the result when it stores it, so that no thread waits for it.
+"""
+import asyncio
+import typing
+import weakref
+
+from asgiref.sync import sync_to_async
+from celery import states
+from celery.exceptions import TimeoutError
+from kombu.exceptions import OperationalError
+from redis import asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from metrics.circuit_breaker import CircuitBreaker
+from .celery import celery
+from .config import REMOTE_CALL_TIMEOUT, REMOTE_CALL_TIMEOUTS
+
+
+# the asyncio connections to the result backend, one per event loop
+BACKEND_CONNECTIONS = weakref.WeakKeyDictionary()
+
+
+class ServiceUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Service temporarily unavailable, try again later.'
+    default_code = 'service_unavailable'
+
+    def __init__(self, service: str = None, wait: int = None):
+        """
+        :param service: the name of the service
+        :param wait: the time in seconds before retrying (Retry-After)
+        """
+        self.service = service
+        self.wait = wait
+        super().__init__(
+            f'The service "{service}" is temporarily unavailable, try again '
+            f'in {wait} seconds.'
+        )
+
+
+def backend_connection() -> aioredis.Redis:
+    """ The asyncio connection to the result backend of celery. """
+    loop = asyncio.get_running_loop()
+    if loop not in BACKEND_CONNECTIONS:
+        BACKEND_CONNECTIONS[loop] = aioredis.Redis.from_url(
+            celery.conf.result_backend)
+    return BACKEND_CONNECTIONS[loop]
+
+
+class AwaitableResult(object):
+    """
+    The result of a task in the redis result backend, that can be awaited.
+    The key of the result is also the channel where celery publishes it.
+    """
+
+    def __init__(self, task_id: str = None):
+        """
+        :param task_id: the id of the task, e.g. AsyncResult.id
+        """
+        self.task_id = task_id
+        self.backend = celery.backend
+        self.key = self.backend.get_key_for_task(task_id).decode()
+
+    def meta(self, payload: bytes = None) -> typing.Optional[dict]:
+        """ Returns the meta of the task if it is ready, otherwise None. """
+        if not payload:
+            return None
+        meta = self.backend.decode_result(payload)
+        return meta if meta['status'] in states.READY_STATES else None
+
+    async def wait(self) -> dict:
+        """ Returns the meta of the task when it is ready. """
+        redis = backend_connection()
+        pubsub = redis.pubsub()
+        try:
+            # subscribing before reading the key: the result can't be stored
+            # in-between without being received.
+            await pubsub.subscribe(self.key)
+            meta = self.meta(await redis.get(self.key))
+            while meta is None:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=None)
+                if message:
+                    meta = self.meta(message['data'])
+            return meta
+        finally:
+            await pubsub.aclose()
+
+    async def get(self, timeout: float = None) -> typing.Any:
+        """
+        Returns the result of the task.
+
+        :param timeout: the time in seconds to wait for the result
+        :raises TimeoutError: when the result doesn't come in time
+        :raises: the exception of the task if it failed
+        """
+        try:
+            meta = await asyncio.wait_for(self.wait(), timeout)
+        except asyncio.TimeoutError as err:
+            raise TimeoutError(
+                f'The result of {self.task_id} did not come in {timeout} '
+                f'seconds.') from err
+        if meta['status'] in states.PROPAGATE_STATES:
+            raise meta['result']
+        return meta['result']
+
+    def __await__(self):
+        return self.get().__await__()
+
+
+def remote_call(name: str = None, kwargs: dict = None,
+                timeout: float = None, **options) -> typing.Any:
+    """
+    Sends a task to another service and returns its result.
+
+    :param name: the name of the task, e.g. nlp.task.available_features
+    :param kwargs: the keyword arguments of the task
+    :param timeout: the time in seconds to wait for the result; defaults to
+     REMOTE_CALL_TIMEOUTS
+    :param options: the options of send_task
+    :return: the result of the task
+    :raises ServiceUnavailable: when the breaker of the service is open, the
+     broker is unreachable or the result doesn't come in time
+    """
+    service = name.split('.')[0]
+    if timeout is None:
+        timeout = REMOTE_CALL_TIMEOUTS.get(name, REMOTE_CALL_TIMEOUT)
+    breaker = CircuitBreaker(service)
+    wait = breaker.wait(timeout=int(timeout) + 1)
+    if wait:
+        raise ServiceUnavailable(service, wait)
+    try:
+        result = celery.send_task(name, kwargs=kwargs, **options).get(
+            timeout=timeout)
+    except (TimeoutError, OperationalError) as err:
+        breaker.failure(timeout=isinstance(err, TimeoutError))
+        raise ServiceUnavailable(
+            service, breaker.wait() or int(timeout) + 1) from err
+    breaker.success()
+    return result
+
+
+async def remote_call_async(name: str = None, kwargs: dict = None,
+                            timeout: float = None, **options) -> typing.Any:
+    """
+    The async version of remote_call: the result is awaited on the result
+    backend (see AwaitableResult).
+    """
+    service = name.split('.')[0]
+    if timeout is None:
+        timeout = REMOTE_CALL_TIMEOUTS.get(name, REMOTE_CALL_TIMEOUT)
+    breaker = CircuitBreaker(service)
+    wait = await sync_to_async(breaker.wait)(timeout=int(timeout) + 1)
+    if wait:
+        raise ServiceUnavailable(service, wait)
+    try:
+        result = await sync_to_async(celery.send_task)(
+            name, kwargs=kwargs, **options)
+        result = await AwaitableResult(result.id).get(timeout=timeout)
+    except (TimeoutError, OperationalError, RedisConnectionError) as err:
+        await sync_to_async(breaker.failure)(
+            timeout=isinstance(err, TimeoutError))
+        raise ServiceUnavailable(
+            service, await sync_to_async(breaker.wait)() or int(timeout) + 1
+        ) from err
+    await sync_to_async(breaker.success)()
+    return result
@@ -53,6 +53,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'rmxweb.middleware.ExceptionMiddleware',
+    'rmxweb.middleware.RetryAfterMiddleware',
 ]
 
 ROOT_URLCONF = 'rmxweb.urls'
@@ -23,6 +23,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
 
     path('', home_views.home),
+    path('lanes/', home_views.lanes),
+    path('services/', home_views.services),
 
     path('container/', include('container.urls')),
     path('data/', include('data.urls')),
@@ -2,4 +2,19 @@
 
 set -e
 
-gunicorn rmxweb.wsgi:application --bind 0.0.0.0:8000
+# the listener of the crawl events signals the end of the crawls; without it
+# monitor_crawl polls every CRAWL_MONITOR_COUNTDOWN_NO_LISTENER seconds.
+>&2 echo "Starting the listener of the crawl events"
+python3 manage.py listen_crawl_events &
+
+# ASYNC_VIEWS is read as in rmxweb.config: "1" or "true", in any case.
+case "$(echo "$ASYNC_VIEWS" | tr '[:upper:]' '[:lower:]')" in
+    1|true)
+        # the async views, served under ASGI
+        gunicorn rmxweb.asgi:application --bind 0.0.0.0:8000 \
+            -k uvicorn.workers.UvicornWorker
+        ;;
+    *)
+        gunicorn rmxweb.wsgi:application --bind 0.0.0.0:8000
+        ;;
+esac
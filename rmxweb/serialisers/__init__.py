@@ -2,6 +2,7 @@ from .container_serialiser import ContainerCsv
 from .data_list_serialiser import DataListCsv
 from .data_serialiser import DataCsv
 from .dendrogram_serialisers import DendrogramCSV
+from .duplicates_serialiser import DuplicatesCsv
 from .feature_serialiser import FeatureSerialiser
 from .graph_serialisers import GraphCSVSerialiser
 from .searchtext_serialiser import SearchTextCsv
@@ -97,7 +97,7 @@ class DataListCsv(CsvSerialiser):
             'pk': link.pk,
             'created': link.created.isoformat(),
             'url': link.url,
-            'dataid': link.data.id,
+            'dataid': link.data_id,
             'hostname': link.hostname
         }
 
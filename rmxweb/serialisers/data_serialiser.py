@@ -61,7 +61,7 @@ class DataCsv(CsvSerialiser):
             'pk': link.pk,
             'created': link.created.isoformat(),
             'url': link.url,
-            'dataid': link.data.id,
+            'dataid': link.data_id,
             'hostname': link.hostname
         }
 
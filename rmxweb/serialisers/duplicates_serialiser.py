@@ -0,0 +1,83 @@
+"""Serialiser for the near-duplicate clusters of a container."""
+from copy import deepcopy
+
+from .csv_serialiser import CsvSerialiser
+from .serialiser_factory import SerialiserFactory
+
+
+DUPLICATE_COLUMNS = [
+    'cluster', 'pk', 'url', 'title', 'created', 'original', 'distance'
+]
+CONFIG = {
+    'columns': {
+        'duplicate': DUPLICATE_COLUMNS,
+    },
+    'data_type_mapping': {
+        'duplicate': {
+            'cluster': 'integer',
+            'pk': 'integer',
+            'url': 'string',
+            'title': 'string',
+            'created': 'datetime',
+            'original': 'boolean',
+            'distance': 'integer'
+        }
+    }
+}
+
+
+@SerialiserFactory.set_serialiser('duplicates_csv')
+class DuplicatesCsv(CsvSerialiser):
+    """Every cluster is identified by the pk of its original page; the
+    original is listed first and is followed by its near-duplicates.
+    """
+    def __init__(self, *args, **kwargs):
+
+        super(DuplicatesCsv, self).__init__(*args, **kwargs)
+        self.rows = []
+        self.clusters = 0
+        self.iter_docs()
+        self.write_to_zip(
+            self.get_duplicates(),
+            self.get_conf()
+        )
+
+    def iter_docs(self):
+
+        cluster = None
+        for doc in self.data['dataset']:
+            if doc.duplicate_of_id != cluster:
+                cluster = doc.duplicate_of_id
+                self.clusters += 1
+                self.rows.append(
+                    self.serialise_doc(doc.duplicate_of, cluster))
+            self.rows.append(self.serialise_doc(doc, cluster))
+        del self.data['dataset']
+
+    @staticmethod
+    def serialise_doc(doc, cluster):
+
+        return {
+            'cluster': cluster,
+            'pk': doc.pk,
+            'url': doc.url,
+            'title': doc.title,
+            'created': doc.created.isoformat(),
+            'original': doc.pk == cluster,
+            'distance': doc.duplicate_distance
+        }
+
+    def get_duplicates(self):
+        return self.to_csv(
+            rows=self.rows,
+            file_name='duplicate.csv',
+            columns=DUPLICATE_COLUMNS)
+
+    def get_conf(self):
+
+        out = deepcopy(CONFIG)
+        out['count'] = {
+            'duplicate': len(self.rows) - self.clusters,
+            'cluster': self.clusters
+        }
+        return self.to_json(out, 'config.json')